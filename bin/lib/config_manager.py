@@ -212,6 +212,7 @@ class ConfigManager:
             'storage_settings': {
                 'archive_inputs': True,
                 'retention_days': 365,
+                'compress_after_days': 30,
                 'cleanup_temp': True
             }
         }
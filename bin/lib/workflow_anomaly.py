@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Anomaly Detection
+Rolling median/MAD and same-weekday seasonal scores over every daily time series of tabular stage inputs at once.
+"""
+
+import warnings
+import contextlib
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Any
+
+from workflow_correlation import iter_table, scan_files, to_float, is_numeric, NUMERIC_SHARE
+
+try:
+    import numpy as np
+except ImportError:  # optional - without it anomaly stages fall back to simulated work
+    np = None
+
+ANOMALY_METHODS = ('mad', 'seasonal')
+DATE_COLUMNS = ('date', 'day', 'datetime', 'timestamp', 'time', 'period')
+MAD_SCALE = 1.4826  # MAD -> standard deviation for normal data
+MEAN_AD_SCALE = 1.2533  # mean absolute deviation -> standard deviation, used when the MAD is zero
+MIN_RELATIVE_SCALE = 0.05  # a spread below 5% of the baseline is treated as 5%
+# Window values gathered per block of series (float32), bounding memory whatever the series count
+BLOCK_CELLS = 20000000
+
+def anomaly_available() -> bool:
+    """Whether numpy is installed"""
+    return np is not None
+
+@dataclass
+class _SeriesTable:
+    """One file's rows as (series, day, metric values) columns"""
+    name: str
+    date_column: str
+    key_columns: List[str]
+    metrics: List[str]
+    counts: Set[str]  # metrics holding non-negative integers; a missing day means zero
+    keys: Dict[tuple, int] = field(default_factory=dict)
+    rows: int = 0
+    series_ids: List[Any] = field(default_factory=list)
+    days: List[Any] = field(default_factory=list)
+    values: Dict[str, List[Any]] = field(default_factory=dict)
+    first_day: int = 0  # days since 1970-01-01
+    day_count: int = 0
+    
+    def finish(self):
+        """Concatenate the per-chunk arrays"""
+        
+        self.series_ids = np.concatenate(self.series_ids) if self.series_ids else np.zeros(0, np.int32)
+        self.days = np.concatenate(self.days) if self.days else np.zeros(0, np.int32)
+        self.values = {metric: np.concatenate(chunks) if chunks else np.zeros(0, np.float32)
+                       for metric, chunks in self.values.items()}
+        self.first_day = int(self.days.min()) if len(self.days) else 0
+        self.day_count = int(self.days.max()) - self.first_day + 1 if len(self.days) else 0
+        
+    def matrix(self, metric: str):
+        """Dense series x day float32 matrix of a metric
+
+        Duplicate (series, day) rows are summed for count metrics and averaged
+        otherwise. Missing days are zero for counts and NaN for everything else.
+        """
+        
+        values = self.values[metric]
+        present = np.isfinite(values)
+        flat = self.series_ids[present].astype(np.int64) * self.day_count + (self.days[present] - self.first_day)
+        cells = len(self.keys) * self.day_count
+        
+        sums = np.bincount(flat, weights=values[present], minlength=cells)
+        if metric in self.counts:
+            return sums.astype(np.float32).reshape(len(self.keys), self.day_count)
+            
+        observed = np.bincount(flat, minlength=cells)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (sums / observed).astype(np.float32)
+        return means.reshape(len(self.keys), self.day_count)
+        
+    def volume(self) -> Optional[Tuple[str, Any]]:
+        """(column, median daily value per series) of the count metric with the largest total"""
+        
+        if not self.counts:
+            return None
+        column = max(sorted(self.counts), key=lambda metric: float(np.nansum(self.values[metric])))
+        return column, np.median(self.matrix(column), axis=1)
+        
+    def summary(self, anomalies: Dict[str, int], volume_column: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'rows': self.rows,
+            'series': len(self.keys),
+            'days': self.day_count,
+            'first_date': str(np.datetime64(self.first_day, 'D')) if self.day_count else None,
+            'last_date': str(np.datetime64(self.first_day + self.day_count - 1, 'D')) if self.day_count else None,
+            'date_column': self.date_column,
+            'key_columns': self.key_columns,
+            'metrics': self.metrics,
+            'volume_column': volume_column,
+            'anomalies': anomalies
+        }
+
+class AnomalyDetector:
+    """Flags days on which a series leaves its own recent baseline
+
+    Each tabular file with a date column is read as long-format daily data
+    (one row per series and day, e.g. a GSC export by date/query/page): the
+    non-numeric columns identify the series and every numeric column is a
+    metric. A metric becomes one series x day matrix, and each day is scored
+    against a baseline from earlier days of the same series only - the
+    `window` days before it ('mad') or the same weekday over the previous
+    `seasonal_weeks` weeks ('seasonal'). The score is a robust z-score,
+    (value - median) / (1.4826 x MAD), so a spike can't hide in its own
+    baseline. Non-count metrics such as CTR or position are only scored for
+    series whose median daily volume (the busiest count column, e.g.
+    impressions) reaches `min_volume`. Series are scored a block at a time
+    with the baseline windows gathered into one array, so there is no
+    per-series Python work.
+    """
+    
+    def __init__(self, method: str = 'mad', window: int = 28, seasonal_weeks: int = 4, threshold: float = 3.5,
+                 min_history: Optional[int] = None, min_volume: float = 10, max_results: int = 1000,
+                 metrics: Optional[List[str]] = None, chunk_rows: int = 50000):
+        if method not in ANOMALY_METHODS:
+            raise ValueError(f"Unknown anomaly method '{method}' (use {', '.join(ANOMALY_METHODS)})")
+        self.method = method
+        self.window = max(3, int(window))
+        self.seasonal_weeks = max(3, int(seasonal_weeks))
+        self.threshold = threshold
+        # Baseline values a day needs before it is scored; defaults to half the baseline
+        self.min_history = min_history
+        # Ratio-like metrics (CTR, position) of series below this daily volume are noise and not scored
+        self.min_volume = min_volume
+        self.max_results = max(1, int(max_results))
+        self.metrics = metrics
+        self.chunk_rows = max(1, int(chunk_rows))
+        
+    @classmethod
+    def from_config(cls, analysis_config: Dict[str, Any]) -> 'AnomalyDetector':
+        """Build the detector from the analysis configuration section"""
+        
+        min_history = analysis_config.get('anomaly_min_history')
+        return cls(
+            method=analysis_config.get('anomaly_method', 'mad'),
+            window=int(analysis_config.get('anomaly_window', 28)),
+            seasonal_weeks=int(analysis_config.get('anomaly_seasonal_weeks', 4)),
+            threshold=float(analysis_config.get('anomaly_threshold', 3.5)),
+            min_history=int(min_history) if min_history is not None else None,
+            min_volume=float(analysis_config.get('anomaly_min_volume', 10)),
+            max_results=int(analysis_config.get('anomaly_max_results', 1000)),
+            metrics=analysis_config.get('anomaly_metrics'),
+            chunk_rows=int(analysis_config.get('chunk_rows', 50000))
+        )
+        
+    def lags(self):
+        """How many days back each baseline value is"""
+        
+        if self.method == 'seasonal':
+            return 7 * np.arange(1, self.seasonal_weeks + 1)
+        return np.arange(1, self.window + 1)
+        
+    def detect(self, paths: Iterable[Path], token=None, threshold: Optional[float] = None) -> Dict[str, Any]:
+        """Anomaly records ranked by |score| (at most max_results) plus scan stats"""
+        
+        if np is None:
+            raise ValueError("Anomaly detection needs the 'numpy' package (pip install numpy)")
+            
+        threshold = float(threshold if threshold is not None else self.threshold)
+        lags = self.lags()
+        min_history = self.min_history if self.min_history is not None else (len(lags) + 1) // 2
+        
+        candidates = []
+        tables = []
+        stats = {'series': 0, 'points_scored': 0, 'detected': 0}
+        loaded, skipped = scan_files(paths, lambda path: self._load(path, token))
+        for table in loaded:
+            detected = {}
+            volume = table.volume() if set(table.metrics) - table.counts else None
+            for metric in table.metrics:
+                matrix = table.matrix(metric)
+                series_index = None
+                if volume is not None and metric not in table.counts:
+                    series_index = np.nonzero(volume[1] >= self.min_volume)[0]
+                    matrix = matrix[series_index]
+                found, scored, top = _score(matrix, lags, threshold, min_history, metric in table.counts,
+                                            self.max_results, token)
+                del matrix
+                if series_index is not None:
+                    top = [(score, int(series_index[row]), day, value, expected)
+                           for score, row, day, value, expected in top]
+                detected[metric] = found
+                stats['detected'] += found
+                stats['points_scored'] += scored
+                candidates.extend((table, metric) + entry for entry in top)
+                
+            stats['series'] += len(table.keys)
+            tables.append(table.summary(detected, volume[0] if volume else None))
+            
+        candidates.sort(key=lambda candidate: -abs(candidate[2]))
+        keys_by_id = {}
+        anomalies = []
+        for table, metric, score, series, day, value, expected in candidates[:self.max_results]:
+            if id(table) not in keys_by_id:
+                keys_by_id[id(table)] = {index: key for key, index in table.keys.items()}
+            key = keys_by_id[id(table)][series]
+            anomalies.append(_record(table, metric, key, score, day, value, expected))
+            
+        return {
+            'anomalies': anomalies,
+            'tables': tables,
+            'method': self.method,
+            'threshold': threshold,
+            'baseline_days': int(lags.max()),
+            'skipped_files': skipped,
+            **stats
+        }
+        
+    def _load(self, path: Path, token) -> Optional[_SeriesTable]:
+        """Read one file into series/day/value columns; None without a date column and a metric"""
+        
+        table = None
+        for header, raw in iter_table(path, self.chunk_rows):
+            if token is not None:
+                token.raise_if_cancelled()
+            rows = len(next(iter(raw.values()), ()))
+            if not rows:
+                continue
+                
+            if table is None:
+                table = self._layout(path.name, header, raw)
+                if table is None:
+                    return None
+                    
+            days = to_days(raw[table.date_column]) if table.date_column in raw else np.full(rows, np.datetime64('NaT'))
+            valid = ~np.isnat(days)
+            columns = [raw.get(name) or [None] * rows for name in table.key_columns]
+            if columns:
+                ids = np.fromiter((table.keys.setdefault(key, len(table.keys)) for key in zip(*columns)),
+                                  dtype=np.int64, count=rows)
+            else:
+                table.keys.setdefault((), 0)
+                ids = np.zeros(rows, dtype=np.int64)
+                
+            table.rows += int(valid.sum())
+            table.series_ids.append(ids[valid].astype(np.int32))
+            table.days.append(days[valid].astype(np.int32))
+            for metric in table.metrics:
+                values = to_float(raw[metric]) if metric in raw else np.full(rows, np.nan)
+                table.values[metric].append(values[valid].astype(np.float32))
+                
+        if table is None:
+            return None
+        table.finish()
+        return table if table.day_count else None
+        
+    def _layout(self, name: str, header: List[str], raw: Dict[str, tuple]) -> Optional[_SeriesTable]:
+        """Date, series key and metric columns, decided from the first chunk"""
+        
+        parsed = {column: to_float(raw[column]) for column in header if column in raw}
+        numeric = [column for column in header if column in parsed and is_numeric(raw[column], parsed[column])]
+        
+        date_column = next((column for column in header if column.lower() in DATE_COLUMNS and column in raw), None)
+        if date_column is None:
+            date_column = next((column for column in header if column in raw and column not in numeric
+                                and _is_dates(raw[column])), None)
+        if date_column is None:
+            return None
+            
+        metrics = [column for column in numeric if column != date_column]
+        if self.metrics:
+            metrics = [column for column in metrics if column in self.metrics]
+        if not metrics:
+            return None
+            
+        counts = set()
+        for metric in metrics:
+            values = parsed[metric][np.isfinite(parsed[metric])]
+            if len(values) and (values >= 0).all() and (values == np.floor(values)).all():
+                counts.add(metric)
+                
+        key_columns = [column for column in header if column in raw and column != date_column and column not in numeric]
+        return _SeriesTable(name=name, date_column=date_column, key_columns=key_columns, metrics=metrics,
+                            counts=counts, values={metric: [] for metric in metrics})
+
+def _score(matrix, lags, threshold: float, min_history: int, count: bool, keep: int, token) -> Tuple[int, int, list]:
+    """Robust z-scores of every day with a full baseline reach, a block of series at a time
+
+    Returns (anomalies found, days scored, the `keep` strongest as
+    (score, series, day offset, value, expected) tuples).
+    """
+    
+    series_count, day_count = matrix.shape
+    reach = int(lags.max())
+    if day_count <= reach or not series_count:
+        return 0, 0, []
+        
+    scored_days = np.arange(reach, day_count)
+    window = scored_days[:, None] - lags[None, :]  # baseline day offsets of each scored day
+    block = max(1, BLOCK_CELLS // window.size)
+    
+    found = scored = 0
+    top_scores = np.zeros(0, np.float32)
+    top_rows = np.zeros(0, np.int64)
+    top_days = np.zeros(0, np.int64)
+    
+    for start in range(0, series_count, block):
+        if token is not None:
+            token.raise_if_cancelled()
+        rows = matrix[start:start + block]
+        # Sorting the short lag axis beats median/partition several times over; NaNs sort last
+        baseline = np.sort(rows[:, window], axis=2)  # (series, scored day, lag)
+        current = rows[:, reach:]
+        history = np.isfinite(baseline).sum(axis=2)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            median = _sorted_median(baseline, history)
+            deviation = np.sort(np.abs(baseline - median[..., None]), axis=2)
+            spread = _sorted_median(deviation, history) * MAD_SCALE
+            if (history == len(lags)).all():
+                fallback = deviation.sum(axis=2)
+            else:
+                fallback = np.nansum(deviation, axis=2)
+            fallback *= MEAN_AD_SCALE / history
+        del baseline, deviation
+        
+        scale = np.where(spread > 0, spread, fallback)
+        scale = np.maximum(scale, np.abs(median) * MIN_RELATIVE_SCALE)
+        if count:
+            # Counts are at least Poisson-noisy: a quiet series going from 0 to 2 clicks isn't news
+            scale = np.maximum(scale, np.sqrt(np.maximum(median, 1.0)))
+        else:
+            # A flat zero baseline (a CTR of 0 for weeks) has no scale to measure a change against
+            scale[scale == 0] = np.nan
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score = (current - median) / scale
+            
+        valid = np.isfinite(score) & (history >= min_history)
+        hits = valid & (np.abs(score) >= threshold)
+        scored += int(valid.sum())
+        found += int(hits.sum())
+        
+        hit_rows, hit_days = np.nonzero(hits)
+        top_scores = np.concatenate([top_scores, score[hit_rows, hit_days]])
+        top_rows = np.concatenate([top_rows, hit_rows + start])
+        top_days = np.concatenate([top_days, hit_days + reach])
+        if len(top_scores) > keep:
+            strongest = np.argpartition(-np.abs(top_scores), keep - 1)[:keep]
+            top_scores, top_rows, top_days = top_scores[strongest], top_rows[strongest], top_days[strongest]
+            
+    if not len(top_scores):
+        return found, scored, []
+        
+    # Baselines of the survivors only, recomputed from their rows
+    expected = _baseline_median(matrix, top_rows, top_days, lags)
+    values = matrix[top_rows, top_days]
+    return found, scored, [
+        (float(s), int(r), int(d), float(v), float(e))
+        for s, r, d, v, e in zip(top_scores, top_rows, top_days, values, expected)
+    ]
+
+def _sorted_median(values, counts):
+    """Median along the last axis of sorted values with `counts` finite entries each (NaNs last)"""
+    
+    low = np.take_along_axis(values, ((np.maximum(counts, 1) - 1) // 2)[..., None], axis=-1)[..., 0]
+    high = np.take_along_axis(values, (counts // 2)[..., None], axis=-1)[..., 0]
+    return np.where(counts > 0, (low + high) / 2, np.nan).astype(values.dtype)
+
+def _baseline_median(matrix, rows, days, lags):
+    with np.errstate(invalid='ignore'), _quiet_nan_warnings():
+        return np.nanmedian(matrix[rows[:, None], days[:, None] - lags[None, :]], axis=1)
+
+@contextlib.contextmanager
+def _quiet_nan_warnings():
+    """All-NaN baselines are expected (series that started recently) - they just don't get scored"""
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        yield
+
+def _record(table: _SeriesTable, metric: str, key: tuple, score: float, day: int,
+            value: float, expected: float) -> Dict[str, Any]:
+    date = str(np.datetime64(table.first_day + day, 'D'))
+    direction = 'spike' if score > 0 else 'drop'
+    change = (value - expected) / abs(expected) if expected else None
+    series = dict(zip(table.key_columns, key))
+    
+    label = ', '.join(f"{column} '{key_value}'" for column, key_value in series.items()) or table.name
+    if change is not None:
+        amount = f"{abs(change) * 100:.0f}% {'above' if score > 0 else 'below'} normal"
+    else:
+        amount = f"{value:g} against a baseline of {expected:g}"
+        
+    return {
+        'series': series,
+        'metric': metric,
+        'date': date,
+        'value': round(value, 4),
+        'expected': round(expected, 4),
+        'score': round(score, 2),
+        'direction': direction,
+        'change': None if change is None else round(change, 4),
+        'source': table.name,
+        'insight': f"{metric} {direction} {amount} for {label} on {date}"
+    }
+
+def to_days(raw):
+    """Column values as datetime64[D]; ISO dates or timestamps, anything else is NaT"""
+    
+    if isinstance(raw, tuple) and raw and isinstance(raw[0], str):
+        text = np.asarray(raw)
+    else:
+        text = np.asarray(['' if value is None else str(value) for value in raw])
+    text = text.astype('U10')  # drops any time of day
+    
+    try:
+        return text.astype('datetime64[D]')
+    except ValueError:
+        pass
+        
+    days = np.full(len(text), np.datetime64('NaT'), dtype='datetime64[D]')
+    for i, value in enumerate(text):
+        try:
+            days[i] = np.datetime64(value, 'D')
+        except ValueError:
+            pass
+    return days
+
+def _is_dates(raw) -> bool:
+    non_empty = sum(1 for value in raw if value not in ('', None))
+    parsed = int((~np.isnat(to_days(raw))).sum())
+    return parsed >= 3 and parsed >= NUMERIC_SHARE * non_empty
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Streaming Stage Artifacts
+Newline-delimited JSON writer (optionally gzip/zstd compressed) that handlers append records to as they go.
+"""
+
+import io
+import gzip
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Any
+
+try:
+    import zstandard
+except ImportError:  # optional - only needed for compression: zstd
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {None: '.ndjson', 'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst'}
+
+class _HashingFile:
+    """Write-only file wrapper that hashes the bytes that reach the disk"""
+    
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        return self.raw.write(data)
+        
+    def flush(self):
+        self.raw.flush()
+
+class ArtifactWriter:
+    """Appends JSON records to an NDJSON artifact, one line per record
+
+    Records are encoded straight away and written out every `batch_size`
+    records, so memory stays bounded by one batch however many records a stage
+    produces. close() returns the row count and byte sizes for the manifest.
+    """
+    
+    def __init__(self, path: Path, compression: Optional[str] = None, batch_size: int = 1000,
+                 compression_level: Optional[int] = None):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown artifact compression '{compression}' (use gzip, zstd or none)")
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("zstd artifact compression needs the 'zstandard' package (pip install zstandard)")
+            
+        self.path = Path(path)
+        self.compression = compression
+        self.batch_size = max(1, batch_size)
+        self.rows = 0
+        self.raw_bytes = 0
+        self.closed = False
+        self._batch: list = []
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._raw = open(self.path, 'wb')
+        self._file = _HashingFile(self._raw)
+        if compression == 'gzip':
+            self._stream = gzip.GzipFile(filename=self.path.stem, fileobj=self._file, mode='wb',
+                                         compresslevel=compression_level or 6)
+        elif compression == 'zstd':
+            self._stream = zstandard.ZstdCompressor(level=compression_level or 3).stream_writer(self._file, closefd=False)
+        else:
+            self._stream = self._file
+            
+    def append(self, record: Any):
+        """Add one record"""
+        
+        line = json.dumps(record, default=str, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self._lock:
+            if self.closed:
+                raise ValueError(f"Artifact {self.path.name} is already closed")
+            self._batch.append(line)
+            self.rows += 1
+            self.raw_bytes += len(line)
+            if len(self._batch) >= self.batch_size:
+                self._flush_locked()
+                
+    def extend(self, records: Iterable[Any]):
+        """Add every record of an iterable (generators are consumed lazily)"""
+        for record in records:
+            self.append(record)
+            
+    def flush(self):
+        """Write out the current batch"""
+        with self._lock:
+            self._flush_locked()
+            
+    def close(self) -> Dict[str, Any]:
+        """Finish the file and return its stats; safe to call more than once"""
+        
+        with self._lock:
+            if not self.closed:
+                self._flush_locked()
+                if self._stream is not self._file:
+                    self._stream.close()
+                self._raw.close()
+                self.closed = True
+        return self.stats()
+        
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'path': str(self.path),
+            'rows': self.rows,
+            'bytes': self.path.stat().st_size if self.path.exists() else 0,
+            'raw_bytes': self.raw_bytes,
+            'compression': self.compression or 'none',
+            'sha256': self._file.sha256.hexdigest() if self.closed else None
+        }
+        
+    def _flush_locked(self):
+        if self._batch:
+            self._stream.write(b''.join(self._batch))
+            self._batch = []
+            
+    def __enter__(self) -> 'ArtifactWriter':
+        return self
+        
+    def __exit__(self, *exc):
+        self.close()
+
+def artifact_filename(stem: str, compression: Optional[str]) -> str:
+    """File name of a stream artifact for the given compression"""
+    return stem + COMPRESSION_SUFFIXES[compression]
+
+def normalise_compression(value: Optional[str]) -> Optional[str]:
+    """Config value to writer compression ('none', '', None -> None)"""
+    
+    if value is None or str(value).lower() in ('', 'none', 'off', 'false'):
+        return None
+    return str(value).lower()
+
+def zstd_available() -> bool:
+    """Whether zstandard is installed (needed to read or write .zst files)"""
+    return zstandard is not None
+
+def open_compressed(path: Path):
+    """Binary read stream of a file, decompressing .gz and .zst by suffix"""
+    
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.gz':
+        return gzip.open(path, 'rb')
+    if suffix == '.zst':
+        if zstandard is None:
+            raise ValueError("Reading .zst files needs the 'zstandard' package")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True))
+    return open(path, 'rb')
+
+def read_records(path: Path) -> Iterator[Any]:
+    """Iterate the records of an NDJSON artifact, decompressing by file suffix"""
+    
+    with open_compressed(path) as stream:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
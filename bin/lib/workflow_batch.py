@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Batch Workflow Execution
+Runs one parsed workflow for many clients on a shared stage worker pool.
+"""
+
+import copy
+import json
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Any
+
+from config_manager import ConfigManager
+from workflow_executor import WorkflowExecutor, ExecutionResult
+from workflow_parser import WorkflowParser, WorkflowDefinition
+from workflow_ratelimit import MCPRateLimiter
+from workflow_resilience import CircuitBreakerRegistry
+from workflow_resources import ResourceBudget
+from workflow_hedging import MCPHedger, LatencyTracker
+from workflow_cancellation import CancellationToken
+
+def parse_client_list(clients: Optional[str] = None, clients_file: Optional[str] = None) -> List[str]:
+    """Client slugs from a comma-separated list and/or a file (one per line, '#' comments)"""
+    
+    slugs: List[str] = []
+    
+    if clients:
+        slugs.extend(c.strip() for c in clients.split(','))
+        
+    if clients_file:
+        with open(clients_file, 'r') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    slugs.extend(c.strip() for c in line.split(','))
+                    
+    # Keep first-seen order, drop blanks and duplicates
+    return list(dict.fromkeys(slug for slug in slugs if slug))
+
+class BatchExecutor:
+    """Fan one workflow out across clients
+
+    The workflow is parsed once and copied per client. Every client gets its
+    own executor (and so its own output directory under the client's reports
+    tree), but all of them share one stage worker pool, the global MCP rate
+    and concurrency limits, the MCP circuit breakers and the resource budget.
+    A client's own [mcps] limits are not applied (a warning names them).
+    """
+    
+    def __init__(self, config_manager: ConfigManager, config_file: Optional[str] = None, coordinator=None):
+        self.config_manager = config_manager
+        self.config_file = config_file
+        self.exec_config = config_manager.get_execution_config()
+        self.storage_config = config_manager.get_storage_config()
+        self.parser = WorkflowParser(config_manager)
+        
+        self.rate_limiter = MCPRateLimiter(config_manager)
+        self.circuit_breakers = CircuitBreakerRegistry.from_config(self.exec_config)
+        self.resource_budget = ResourceBudget.from_config(self.exec_config)
+        self.mcp_hedger = MCPHedger(self.rate_limiter, LatencyTracker.from_config(self.storage_config))
+        self.max_workers = int(self.exec_config.get('batch_max_workers',
+                                                    self.exec_config.get('max_parallel_tasks', 3) * 2))
+        self.max_clients = int(self.exec_config.get('batch_max_clients', 4))
+        
+        # With a StageCoordinator the pool threads only wait on remote workers, one per leasable stage
+        self.coordinator = coordinator
+        if coordinator is not None:
+            self.max_workers = coordinator.max_in_flight
+        
+        self.executors: Dict[str, WorkflowExecutor] = {}
+        self._lock = threading.Lock()
+        # Parent of every client's run token, so a cancel also reaches runs still in setup (or not yet started)
+        self.cancel_token = CancellationToken()
+        
+    def execute(self, workflow_path: Path, clients: List[str], resume: bool = False,
+                use_cache: bool = True) -> Dict[str, Any]:
+        """Run the workflow for every client and write an aggregated batch summary"""
+        
+        workflow = self.parser.parse_suggested(workflow_path)
+        started = time.time()
+        
+        print(f"📦 BATCH EXECUTION: {workflow.name} for {len(clients)} clients")
+        print(f"   Shared stage workers: {self.max_workers}, concurrent clients: {min(self.max_clients, len(clients))}")
+        
+        stage_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage')
+        client_pool = ThreadPoolExecutor(max_workers=max(1, min(self.max_clients, len(clients))),
+                                         thread_name_prefix='client')
+        results: Dict[str, ExecutionResult] = {}
+        futures = {}
+        interrupted = False
+        self.cancel_token = CancellationToken()
+        
+        try:
+            futures = {
+                client_pool.submit(self._run_client, workflow, slug, stage_pool, resume, use_cache): slug
+                for slug in clients
+            }
+            pending = set(futures)
+            while pending:
+                # Short waits keep the main thread responsive to Ctrl-C
+                done, pending = wait(pending, timeout=0.5)
+                for future in done:
+                    slug = futures[future]
+                    results[slug] = future.result()
+                    status = "✅" if results[slug].success else "❌"
+                    print(f"{status} [{slug}] finished in {results[slug].execution_time:.1f}s")
+                    
+        except KeyboardInterrupt:
+            interrupted = True
+            print("\n⚠️  Batch interrupted - cancelling all client runs")
+            self.cancel_token.cancel('interrupted')
+            for future, slug in futures.items():
+                if future.cancel():
+                    continue
+                try:
+                    results[slug] = future.result(timeout=float(self.exec_config.get('cancel_grace_seconds', 5)) + 1)
+                except Exception:
+                    pass
+                    
+        finally:
+            client_pool.shutdown(wait=not interrupted, cancel_futures=True)
+            stage_pool.shutdown(wait=not interrupted, cancel_futures=True)
+            
+        summary = self._summarise(workflow, clients, results, time.time() - started, interrupted)
+        summary['summary_file'] = str(self._save_summary(workflow, summary))
+        return summary
+        
+    def _run_client(self, workflow: WorkflowDefinition, client_slug: str, stage_pool: ThreadPoolExecutor,
+                    resume: bool, use_cache: bool) -> ExecutionResult:
+        """Execute one client's copy of the workflow"""
+        
+        # Client config (client-configs/<slug>.yaml) layered like a single-client run
+        client_config = ConfigManager(self.config_file, client_slug)
+        ignored = self.rate_limiter.ignored_overrides(client_config)
+        if ignored:
+            print(f"⚠️  [{client_slug}] client [mcps] settings for {', '.join(ignored)} are ignored; "
+                  f"batch runs share the global MCP limits")
+        executor = WorkflowExecutor(client_config, rate_limiter=self.rate_limiter, stage_pool=stage_pool,
+                                    cancel_parent=self.cancel_token, circuit_breakers=self.circuit_breakers,
+                                    resource_budget=self.resource_budget, mcp_hedger=self.mcp_hedger)
+        executor.use_cache = use_cache and executor.use_cache
+        executor.coordinator = self.coordinator
+        
+        with self._lock:
+            self.executors[client_slug] = executor
+            
+        client_workflow = copy.deepcopy(workflow)
+        client_workflow.client_slug = client_slug
+        client_workflow.parameters['client_slug'] = client_slug
+        
+        return executor.execute_definition(client_workflow, resume=resume)
+        
+    def _summarise(self, workflow: WorkflowDefinition, clients: List[str], results: Dict[str, ExecutionResult],
+                   elapsed: float, interrupted: bool) -> Dict[str, Any]:
+        client_entries = []
+        for slug in clients:
+            result = results.get(slug)
+            if result is None:
+                client_entries.append({'client_slug': slug, 'status': 'not_run'})
+                continue
+            client_entries.append({
+                'client_slug': slug,
+                'status': 'completed' if result.success else 'failed',
+                'execution_time': result.execution_time,
+                'stages_completed': result.stages_completed,
+                'total_stages': result.total_stages,
+                'correlations_found': len(result.correlations_found),
+                'output_directory': str(result.output_directory) if result.output_directory else None,
+                'error_message': result.error_message
+            })
+            
+        succeeded = sum(1 for entry in client_entries if entry['status'] == 'completed')
+        return {
+            'workflow_name': workflow.name,
+            'completed': datetime.now().isoformat(),
+            'total_clients': len(clients),
+            'succeeded': succeeded,
+            'failed': len(clients) - succeeded,
+            'interrupted': interrupted,
+            'wall_time': elapsed,
+            'client_time': sum(entry.get('execution_time', 0.0) for entry in client_entries),
+            'mcp_wait_time': dict(self.rate_limiter.wait_time),
+            'mcp_hedging': self.mcp_hedger.summary(),
+            'circuit_breakers': self.circuit_breakers.states(),
+            'clients': client_entries
+        }
+        
+    def _save_summary(self, workflow: WorkflowDefinition, summary: Dict[str, Any]) -> Path:
+        """Write the batch summary under <reports_base_dir>/batches/"""
+        
+        batch_dir = Path(self.storage_config['reports_base_dir']) / 'batches'
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        
+        summary_file = batch_dir / f"{workflow.name}_{datetime.now().strftime('%Y_%m_%d_%H%M%S')}.json"
+        with open(summary_file, 'w') as f:
+            json.dump(summary, f, indent=2, default=str)
+        return summary_file
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Input Blob Store
+Content-addressed store of archived input files, linked into run directories instead of copied.
+"""
+
+import os
+import json
+import time
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from workflow_manifest import hash_file
+
+DIGEST_CACHE_FILE = '.digests.json'
+MAX_DIGEST_ENTRIES = 10000
+# gc leaves blobs touched more recently than this alone (a run may be between store() and link_into())
+BLOB_SWEEP_GRACE = 3600
+
+# Linux FICLONE ioctl: copy-on-write clone on btrfs/XFS/overlay filesystems that support it
+FICLONE = 0x40049409
+
+class BlobStore:
+    """Stores each distinct input once under <root>/<aa>/<sha256>
+
+    Run directories get a hardlink to the blob, or a reflink when the run
+    directory is on another filesystem, or a plain copy as a last resort.
+    Blobs are read-only so an archived input can't be modified through one of
+    its links. Digests are cached per (device, inode, size, mtime), which also
+    makes re-hashing a linked archive copy free.
+    """
+    
+    def __init__(self, root: Path, link_mode: str = 'link'):
+        self.root = Path(root)
+        self.link_mode = link_mode
+        self._lock = threading.Lock()
+        self._digests: Optional[Dict[str, list]] = None
+        self._dirty = False
+        
+    @classmethod
+    def from_config(cls, storage_config: Dict) -> 'BlobStore':
+        """Build the store from the storage configuration section"""
+        
+        root = storage_config.get('blob_dir') or Path(storage_config['reports_base_dir']) / '.blobs'
+        return cls(Path(root), storage_config.get('input_archive_mode', 'link'))
+        
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+        
+    def digest(self, path: Path) -> str:
+        """SHA-256 of a file, reusing the cached value while the file is unchanged"""
+        
+        stat = os.stat(path)
+        key = f'{stat.st_dev}:{stat.st_ino}'
+        
+        with self._lock:
+            cached = self._load_digests().get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+            
+        digest = hash_file(path)
+        self._remember(stat, digest)
+        return digest
+        
+    def store(self, source: Path) -> str:
+        """Add a file to the store (a no-op if its content is already there); returns its digest"""
+        
+        digest = self.digest(source)
+        blob = self.blob_path(digest)
+        
+        if blob.exists():
+            # Refreshes the blob's ctime (not its mtime, which the digest cache keys on) so gc spares it
+            os.chmod(blob, 0o444)
+        else:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = blob.with_name(f'{digest}.{os.getpid()}.{threading.get_ident()}.tmp')
+            # Never hardlink the source itself: an in-place edit of the client's input would change the blob
+            if not _reflink(source, tmp_path):
+                shutil.copy2(source, tmp_path)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, blob)
+            # Hardlinks share the blob's inode, so hashing run directories later is a cache hit
+            self._remember(os.stat(blob), digest)
+            
+        return digest
+        
+    def archive(self, source: Path, dest: Path) -> Tuple[str, str]:
+        """Store `source` and place it at `dest`; returns (digest, method used)"""
+        
+        digest = self.store(source)
+        method = self.link_into(digest, dest)
+        return digest, method
+        
+    def link_into(self, digest: str, dest: Path) -> str:
+        """Materialise a blob at `dest` via hardlink, reflink or copy; returns the method used"""
+        
+        blob = self.blob_path(digest)
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        
+        if dest.exists():
+            if os.path.samefile(blob, dest):
+                return 'linked'
+            dest.unlink()
+            
+        if self.link_mode == 'link':
+            try:
+                os.link(blob, dest)
+                return 'linked'
+            except OSError:
+                pass  # different filesystem, or links unsupported - fall through
+                
+            if _reflink(blob, dest):
+                return 'reflinked'
+                
+        shutil.copy2(blob, dest)
+        return 'copied'
+        
+    def sweep(self, keep: Set[str], grace: float = BLOB_SWEEP_GRACE, dry_run: bool = False) -> Tuple[int, int]:
+        """Delete blobs nothing refers to any more; returns (blobs, bytes) deleted
+        
+        A blob linked into a run directory has more than one link. Blobs of
+        compacted runs have only the store's own link, so their digests
+        come in as `keep`. Blobs whose inode changed within `grace` seconds
+        are left alone.
+        """
+        
+        deleted = size = 0
+        cutoff = time.time() - grace
+        shards = [shard for shard in self.root.iterdir() if shard.is_dir() and len(shard.name) == 2] \
+            if self.root.is_dir() else []
+            
+        for shard in shards:
+            for blob in shard.iterdir():
+                if '.' in blob.name or blob.name in keep:
+                    continue  # temp files of a store() in progress, or still referenced
+                try:
+                    stat = blob.stat()
+                except OSError:
+                    continue
+                if stat.st_nlink > 1 or stat.st_ctime >= cutoff:
+                    continue
+                if not dry_run:
+                    try:
+                        blob.unlink()
+                    except OSError:
+                        continue
+                deleted += 1
+                size += stat.st_size
+                
+        return deleted, size
+        
+    def save(self):
+        """Persist the digest cache if it changed"""
+        
+        with self._lock:
+            if not self._dirty or self._digests is None:
+                return
+            # Dicts keep insertion order and digest() re-inserts on refresh, so the oldest go first
+            overflow = len(self._digests) - MAX_DIGEST_ENTRIES
+            for key in list(self._digests)[:max(0, overflow)]:
+                del self._digests[key]
+            snapshot = dict(self._digests)
+            self._dirty = False
+            
+        path = self.root / DIGEST_CACHE_FILE
+        tmp_path = path.with_name(f'{DIGEST_CACHE_FILE}.{os.getpid()}.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except IOError as e:
+            print(f"Warning: Could not save blob digest cache: {e}")
+            
+    def _remember(self, stat: os.stat_result, digest: str):
+        with self._lock:
+            digests = self._load_digests()
+            key = f'{stat.st_dev}:{stat.st_ino}'
+            digests.pop(key, None)
+            digests[key] = [stat.st_size, stat.st_mtime_ns, digest]
+            self._dirty = True
+            
+    def _load_digests(self) -> Dict[str, list]:
+        # Caller holds self._lock
+        if self._digests is None:
+            try:
+                with open(self.root / DIGEST_CACHE_FILE, 'r') as f:
+                    self._digests = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError, IOError):
+                self._digests = {}
+        return self._digests
+
+def _reflink(source: Path, dest: Path) -> bool:
+    """Copy-on-write clone of source at dest; False where the platform or filesystem can't"""
+    
+    try:
+        import fcntl
+    except ImportError:
+        return False
+        
+    try:
+        with open(source, 'rb') as src, open(dest, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        try:
+            os.unlink(dest)
+        except FileNotFoundError:
+            pass
+        return False
+        
+    shutil.copystat(source, dest)
+    return True
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Stage Result Cache
+Content-addressed, size-bounded LRU cache of stage outputs shared across runs.
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+from workflow_manifest import hash_data
+
+class StageResultCache:
+    """Persistent stage result cache keyed by stage definition, parameters and input bytes"""
+    
+    def __init__(self, cache_dir: Path, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None  # computed lazily on first write
+        
+    @classmethod
+    def from_config(cls, storage_config: Dict) -> 'StageResultCache':
+        """Build the cache from the storage configuration section"""
+        
+        cache_dir = storage_config.get('cache_dir') or Path(storage_config['reports_base_dir']) / '.stage-cache'
+        max_mb = float(storage_config.get('cache_max_mb', 512))
+        return cls(Path(cache_dir), int(max_mb * 1024 * 1024))
+        
+    @staticmethod
+    def key_for(stage, parameters: Dict[str, Any], input_hashes: Dict[str, str], client_slug: Optional[str]) -> str:
+        """Cache key: client + stage definition + workflow parameters + archived input bytes
+        
+        The client is part of the key itself, so one client's results are never
+        served to another even when its slug is missing from the parameters.
+        """
+        return hash_data({
+            'client': client_slug or '',
+            'stage': {
+                'name': stage.name,
+                'agents': stage.recommended_agents,
+                'mcps': stage.suggested_mcps,
+                'description': stage.description,
+                'handler': stage.handler
+            },
+            'parameters': parameters,
+            'inputs': input_hashes
+        })
+        
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.json'
+        
+    def _entries(self) -> List[Path]:
+        if not self.cache_dir.exists():
+            return []
+        return list(self.cache_dir.glob('*/*.json'))
+        
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached stage result, refreshing its LRU position"""
+        
+        path = self._entry_path(key)
+        
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            os.utime(path)  # mtime doubles as last-access time for LRU eviction
+            return entry.get('result')
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, IOError):
+            # Corrupt entry - drop it and treat as a miss
+            self._remove(path)
+            return None
+            
+    def put(self, key: str, result: Dict[str, Any], workflow_name: str, stage_name: str):
+        """Store a stage result and evict least recently used entries over the size limit"""
+        
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        
+        entry = {
+            'key': key,
+            'workflow_name': workflow_name,
+            'stage_name': stage_name,
+            'created': datetime.now().isoformat(),
+            'result': result
+        }
+        
+        tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, default=str)
+            
+        with self._lock:
+            previous_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            
+            if self._total_bytes is None:
+                self._total_bytes = sum(self._size(p) for p in self._entries())
+            else:
+                self._total_bytes += path.stat().st_size - previous_size
+                
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+                
+    def _evict_locked(self):
+        """Remove oldest-accessed entries until the cache fits its size budget"""
+        
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+            except FileNotFoundError:
+                continue
+                
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            
+        self._total_bytes = total
+        
+    def invalidate(self, workflow_name: Optional[str] = None, stage_name: Optional[str] = None) -> int:
+        """Remove cached results (all, or those of one workflow/stage); returns the count removed"""
+        
+        removed = 0
+        
+        with self._lock:
+            for path in self._entries():
+                if workflow_name or stage_name:
+                    try:
+                        with open(path, 'r') as f:
+                            entry = json.load(f)
+                    except (json.JSONDecodeError, IOError):
+                        entry = {}
+                    if workflow_name and entry.get('workflow_name') != workflow_name:
+                        continue
+                    if stage_name and entry.get('stage_name') != stage_name:
+                        continue
+                self._remove(path)
+                removed += 1
+                
+            self._total_bytes = None
+            
+        return removed
+        
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and total size for diagnostics"""
+        
+        entries = self._entries()
+        return {
+            'cache_dir': str(self.cache_dir),
+            'entries': len(entries),
+            'total_bytes': sum(self._size(p) for p in entries),
+            'max_bytes': self.max_bytes
+        }
+        
+    def _size(self, path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+            
+    def _remove(self, path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Cooperative Cancellation
+Cancellation tokens passed to stage handlers so timeouts and Ctrl-C stop work cleanly.
+"""
+
+import weakref
+import threading
+from typing import Optional
+
+class StageCancelled(Exception):
+    """Raised inside a stage handler when its token has been cancelled"""
+    pass
+
+class CancellationToken:
+    """Thread-safe cancellation flag with an optional parent token"""
+    
+    def __init__(self, parent: Optional['CancellationToken'] = None, clock=None):
+        self._event = threading.Event()
+        # Virtual clocks (simulated runs) make sleep() advance time instead of blocking
+        self.clock = clock if clock is not None else (parent.clock if parent is not None else None)
+        # Weak, so the run token of a batch or daemon executor doesn't keep every finished stage's token alive
+        self._children: 'weakref.WeakSet[CancellationToken]' = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.reason: Optional[str] = None
+        
+        if parent is not None:
+            parent._add_child(self)
+            
+    def _add_child(self, child: 'CancellationToken'):
+        with self._lock:
+            self._children.add(child)
+            cancelled = self._event.is_set()
+        if cancelled:
+            child.cancel(self.reason)
+            
+    def child(self) -> 'CancellationToken':
+        """Create a token that is cancelled whenever this one is"""
+        return CancellationToken(parent=self)
+        
+    def cancel(self, reason: Optional[str] = None):
+        """Cancel this token and every child token"""
+        
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason or 'cancelled'
+            self._event.set()
+            children = list(self._children)
+            
+        for child in children:
+            child.cancel(self.reason)
+            
+    @property
+    def cancelled(self) -> bool:
+        """True once cancel() has been called"""
+        return self._event.is_set()
+        
+    def wait(self, seconds: float) -> bool:
+        """Block for up to `seconds`; return True early if cancelled"""
+        return self._event.wait(max(0.0, seconds))
+        
+    def sleep(self, seconds: float):
+        """Cancellable replacement for time.sleep inside stage handlers"""
+        if self.clock is not None and self.clock.virtual:
+            self.clock.sleep(seconds)
+            self.raise_if_cancelled()
+        elif self.wait(seconds):
+            raise StageCancelled(self.reason)
+            
+    def raise_if_cancelled(self):
+        """Raise StageCancelled if the token has been cancelled"""
+        if self.cancelled:
+            raise StageCancelled(self.reason)
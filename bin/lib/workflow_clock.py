@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Execution Clocks
+Wall clock used by default, and a virtual clock plus inline worker pool for simulated runs.
+"""
+
+import time
+import heapq
+import random
+import itertools
+from concurrent.futures import Future, FIRST_COMPLETED, ALL_COMPLETED
+from typing import Callable, Iterable, List, Optional, Set, Tuple, Any
+
+class Clock:
+    """Real time - what the executor, scheduler and cancellation tokens use unless told otherwise"""
+    
+    virtual = False
+    
+    def time(self) -> float:
+        return time.time()
+        
+    def monotonic(self) -> float:
+        return time.monotonic()
+        
+    def sleep(self, seconds: float):
+        time.sleep(max(0.0, seconds))
+
+SYSTEM_CLOCK = Clock()
+
+class VirtualClock(Clock):
+    """Simulated time: sleeping moves the clock forward instead of blocking
+
+    Stage work runs inside run_task(), where sleeps accumulate on the task's
+    own timeline (task start + time slept so far) so that time() read by the
+    stage, its spans and its result matches when it would have happened.
+    `jitter` scales each task sleep by a seeded log-normal factor to give
+    realistic spread between otherwise identical stages.
+    """
+    
+    virtual = True
+    
+    def __init__(self, start: Optional[float] = None, jitter: float = 0.0, seed: Optional[int] = None):
+        self._now = time.time() if start is None else start
+        self._task_elapsed: Optional[float] = None
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        
+    def time(self) -> float:
+        return self._now + (self._task_elapsed or 0.0)
+        
+    def monotonic(self) -> float:
+        return self.time()
+        
+    def sleep(self, seconds: float):
+        seconds = max(0.0, seconds)
+        if self._task_elapsed is None:
+            self._now += seconds
+            return
+        if self.jitter:
+            seconds *= self._random.lognormvariate(0.0, self.jitter)
+        self._task_elapsed += seconds
+        
+    def advance_to(self, timestamp: float):
+        """Move the clock forward (never back) to `timestamp`"""
+        self._now = max(self._now, timestamp)
+        
+    def run_task(self, func: Callable[[], Any]) -> Tuple[Any, Optional[BaseException], float]:
+        """Run `func` starting now on its own timeline; returns (result, exception, virtual duration)"""
+        
+        self._task_elapsed = 0.0
+        try:
+            return func(), None, self._task_elapsed
+        except BaseException as e:
+            return None, e, self._task_elapsed
+        finally:
+            self._task_elapsed = None
+
+class InlinePool:
+    """Executor-like pool that runs tasks on a VirtualClock instead of threads
+
+    Submitted tasks queue until a virtual worker is free; each runs to
+    completion inline the moment it starts, but its future only resolves when
+    the clock reaches start + its virtual duration. wait() advances the clock
+    event by event, so completions arrive in simulated-time order and a
+    StageScheduler driving this pool behaves as it would with real workers.
+    Everything happens on the calling thread.
+    """
+    
+    def __init__(self, clock: VirtualClock, max_workers: int = 3):
+        self.clock = clock
+        self.max_workers = max(1, int(max_workers))
+        self._pending: List[Tuple[Future, Callable, tuple, dict]] = []
+        self._running: List[Tuple[float, int, Future, Any, Optional[BaseException]]] = []  # heap by finish time
+        self._sequence = itertools.count()
+        
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        self._pending.append((future, fn, args, kwargs))
+        return future
+        
+    def wait(self, fs: Iterable[Future], timeout: Optional[float] = None,
+             return_when: str = ALL_COMPLETED) -> Tuple[Set[Future], Set[Future]]:
+        """concurrent.futures.wait() in virtual time"""
+        
+        fs = set(fs)
+        if not fs:
+            return set(), set()
+        deadline = None if timeout is None else self.clock.time() + timeout
+        # Futures only resolve inside this loop, so one scan up front is enough
+        done = {f for f in fs if f.done()}
+        
+        while True:
+            if done and (return_when == FIRST_COMPLETED or done == fs):
+                return done, fs - done
+                
+            if self._start_ready() and return_when == FIRST_COMPLETED:
+                # Hand control back so the scheduler can arm the new stages' timeouts
+                return done, fs - done
+            if not self._running:
+                if deadline is not None:
+                    self.clock.advance_to(deadline)
+                return done, fs - done
+                
+            finish_at = self._running[0][0]
+            if deadline is not None and finish_at > deadline:
+                self.clock.advance_to(deadline)
+                return done, fs - done
+                
+            _, _, future, result, error = heapq.heappop(self._running)
+            self.clock.advance_to(finish_at)
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+            if future in fs:
+                done.add(future)
+                
+    def _start_ready(self) -> int:
+        """Start queued tasks on free virtual workers at the current time; returns how many started"""
+        
+        started_count = 0
+        while self._pending and len(self._running) < self.max_workers:
+            future, fn, args, kwargs = self._pending.pop(0)
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = self.clock.time()
+            result, error, duration = self.clock.run_task(lambda: fn(*args, **kwargs))
+            heapq.heappush(self._running, (started + duration, next(self._sequence), future, result, error))
+            started_count += 1
+        return started_count
+            
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        if cancel_futures:
+            for future, _, _, _ in self._pending:
+                future.cancel()
+            self._pending = []
+        if wait:
+            self.wait([entry[2] for entry in self._running])
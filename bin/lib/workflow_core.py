@@ -17,6 +17,8 @@ from workflow_parser import WorkflowParser
 from workflow_interview import WorkflowInterview
 from workflow_validator import WorkflowValidator
 from workflow_executor import WorkflowExecutor
+from workflow_batch import BatchExecutor
+from workflow_distributed import StageCoordinator
 from config_manager import ConfigManager
 
 @dataclass
@@ -35,6 +37,7 @@ class WorkflowSystem:
     def __init__(self, config_file: Optional[str] = None, client_slug: Optional[str] = None, verbose: bool = False):
         self.verbose = verbose
         self.client_slug = client_slug
+        self.config_file = config_file
         
         # Get CCC root directory
         self.ccc_root = Path(__file__).parent.parent.parent
@@ -181,8 +184,9 @@ class WorkflowSystem:
                 traceback.print_exc()
             return False
             
-    def execute_workflow(self, workflow_name: str, dry_run: bool = False):
-        """Execute an active workflow"""
+    def execute_workflow(self, workflow_name: str, dry_run: bool = False, resume: bool = False,
+                         use_cache: bool = True, listen: Optional[str] = None):
+        """Execute an active workflow (leasing its stages to remote workers when `listen` is given)"""
         
         active_path = self.workflows_dir / 'active' / f'{workflow_name}.md'
         
@@ -196,8 +200,17 @@ class WorkflowSystem:
             
         self._log(f"Executing workflow: {active_path}")
         
+        coordinator = self._start_coordinator(listen) if listen and not dry_run else None
+        
         try:
-            execution_result = self.executor.execute_workflow(active_path, dry_run=dry_run)
+            self.executor.use_cache = use_cache and self.executor.use_cache
+            self.executor.coordinator = coordinator
+            try:
+                execution_result = self.executor.execute_workflow(active_path, dry_run=dry_run, resume=resume)
+            finally:
+                if coordinator:
+                    coordinator.shutdown()
+                    self.executor.coordinator = None
             
             if execution_result.success:
                 if not dry_run:
@@ -216,7 +229,7 @@ class WorkflowSystem:
                 else:
                     print(f"✅ Dry run completed - workflow appears executable")
                     print(f"📋 Planned stages: {execution_result.total_stages}")
-                    print(f"⏱️  Estimated time: {execution_result.estimated_time:.1f} seconds")
+                    print(f"⏱️  Estimated time: {execution_result.estimated_time:.1f} minutes")
                     
                 return True
             else:
@@ -300,6 +313,112 @@ class WorkflowSystem:
             print(f"Error archiving workflow: {e}")
             return False
             
+    def execute_batch(self, workflow_name: str, clients: List[str], resume: bool = False,
+                      use_cache: bool = True, listen: Optional[str] = None):
+        """Execute an active workflow for several clients on a shared worker pool (or remote workers)"""
+        
+        active_path = self.workflows_dir / 'active' / f'{workflow_name}.md'
+        
+        if not active_path.exists():
+            print(f"Error: Active workflow not found: {active_path}")
+            print(f"Use 'workflow-system validate {workflow_name}' first")
+            return False
+            
+        if not clients:
+            print("Error: no client slugs given for batch execution")
+            return False
+            
+        self._log(f"Batch executing workflow: {active_path} for {', '.join(clients)}")
+        
+        coordinator = self._start_coordinator(listen) if listen else None
+        
+        try:
+            batch = BatchExecutor(self.config_manager, self.config_file, coordinator=coordinator)
+            try:
+                summary = batch.execute(active_path, clients, resume=resume, use_cache=use_cache)
+            finally:
+                if coordinator:
+                    coordinator.shutdown()
+            
+            print(f"\n📦 Batch complete: {summary['succeeded']}/{summary['total_clients']} clients succeeded")
+            print(f"📊 Wall time: {summary['wall_time']:.1f}s (sum of client run times: {summary['client_time']:.1f}s)")
+            for entry in summary['clients']:
+                if entry['status'] != 'completed':
+                    print(f"   ❌ {entry['client_slug']}: {entry.get('error_message') or entry['status']}")
+            print(f"📁 Batch summary: {summary['summary_file']}")
+            
+            return summary['failed'] == 0
+            
+        except Exception as e:
+            print(f"Error executing batch: {e}")
+            if self.verbose:
+                import traceback
+                traceback.print_exc()
+            return False
+            
+    def _start_coordinator(self, listen: str) -> StageCoordinator:
+        """Stage coordinator for `execute --listen`; workers connect with `workflow-system worker`"""
+        
+        coordinator = StageCoordinator.from_config(self.config_manager.get('distributed', {}) or {}, address=listen)
+        coordinator.start()
+        print(f"💡 Start workers with: workflow-system worker --connect {coordinator.address}")
+        return coordinator
+        
+    def simulate_workflow(self, workflow_name: Optional[str] = None, synthetic: Optional[int] = None,
+                          workers: Optional[int] = None, seed: int = 0):
+        """Run an active workflow (or a synthetic one) on a virtual clock and report engine overhead"""
+        
+        from workflow_simulation import simulate_workflow, synthetic_workflow
+        
+        if synthetic:
+            workflow = synthetic_workflow(synthetic, seed=seed)
+        else:
+            active_path = self.workflows_dir / 'active' / f'{workflow_name}.md'
+            if not active_path.exists():
+                print(f"Error: Active workflow not found: {active_path}")
+                print(f"Use 'workflow-system validate {workflow_name}' first")
+                return False
+            workflow = self.parser.parse_suggested(active_path)
+            
+        self._log(f"Simulating workflow: {workflow.name} ({len(workflow.stages)} stages)")
+        
+        try:
+            stats = simulate_workflow(self.config_manager, workflow, workers=workers, seed=seed,
+                                      quiet=not self.verbose)
+            
+            status = "✅" if stats['success'] else "❌"
+            print(f"{status} Simulated {stats['stages_completed']}/{stats['stages']} stages on {stats['workers']} workers")
+            if stats['error_message']:
+                print(f"Error: {stats['error_message']}")
+            print(f"⏱️  Simulated time: {stats['simulated_time']:.1f}s "
+                  f"(model: {stats['estimated_makespan']:.1f}s, critical path: {stats['critical_path']:.1f}s, "
+                  f"sequential: {stats['sequential_time']:.1f}s)")
+            print(f"⚙️  Real time: {stats['wall_time']:.2f}s, engine overhead {stats['overhead_per_stage_ms']:.2f} ms/stage")
+            if stats['output_directory']:
+                print(f"📁 Simulated trace: {stats['output_directory']}")
+                
+            return stats['success']
+            
+        except Exception as e:
+            print(f"Error simulating workflow: {e}")
+            if self.verbose:
+                import traceback
+                traceback.print_exc()
+            return False
+            
+    def clear_cache(self, workflow_name: Optional[str] = None):
+        """Invalidate cached stage results (all, or one workflow's)"""
+        
+        try:
+            removed = self.executor.stage_cache.invalidate(workflow_name=workflow_name)
+            scope = f"workflow '{workflow_name}'" if workflow_name else "all workflows"
+            print(f"🧹 Removed {removed} cached stage results for {scope}")
+            return True
+            
+        except Exception as e:
+            print(f"Error clearing stage cache: {e}")
+            return False
+            
     def show_status(self):
         """Show system status and configuration"""
         
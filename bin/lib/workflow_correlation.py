@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Correlation Discovery
+Chunked, vectorised Pearson/Spearman correlation of tabular stage inputs with multiple-comparison correction.
+"""
+
+import io
+import csv
+import json
+import math
+import zlib
+import warnings
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Any
+
+from workflow_artifacts import read_records, open_compressed, zstd_available
+
+try:
+    import numpy as np
+except ImportError:  # optional - without it the analysis stage keeps its simulated findings
+    np = None
+
+TABULAR_SUFFIXES = ('.csv', '.tsv', '.ndjson', '.jsonl', '.json')
+NUMERIC_SHARE = 0.8  # share of non-empty values that must parse as numbers for a column to count
+EXACT_DF_LIMIT = 200  # beyond this many degrees of freedom p-values use a normal approximation
+# Wide tables get proportionally fewer rows per chunk / in the Spearman sample, bounding memory by cells
+CHUNK_CELLS = 2000000
+SAMPLE_CELLS = 5000000
+# A file failing with one of these is skipped (and reported) rather than failing the whole stage
+UNREADABLE_ERRORS = (ValueError, csv.Error, OSError, EOFError, zlib.error)
+
+def correlation_available() -> bool:
+    """Whether numpy is installed"""
+    return np is not None
+
+def is_tabular(path: Path) -> bool:
+    """CSV/TSV/NDJSON/JSON file, optionally .gz (or, with zstandard installed, .zst) compressed"""
+    
+    name = Path(path).name.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    elif name.endswith('.zst'):
+        if not zstd_available():
+            return False
+        name = name[:-4]
+    return name.endswith(TABULAR_SUFFIXES)
+
+def scan_files(paths: Iterable[Path], scan) -> Tuple[List[Any], List[Dict[str, str]]]:
+    """`scan(path)` for every file; returns the non-empty results and the files skipped as unreadable"""
+    
+    results, skipped = [], []
+    for path in paths:
+        path = Path(path)
+        try:
+            result = scan(path)
+        except UNREADABLE_ERRORS as e:
+            skipped.append({'source': path.name, 'error': f"{type(e).__name__}: {e}"})
+            continue
+        if result is not None:
+            results.append(result)
+    return results, skipped
+
+class CorrelationEngine:
+    """Finds significant correlations between the numeric columns of tabular files
+
+    Every file is its own table (a GSC export's rows are not a crawl's rows),
+    read `chunk_rows` rows at a time so memory is bounded by one chunk and the
+    per-table accumulators whatever the file size. Pearson r comes from
+    running pairwise-complete sums and is exact; Spearman rho is computed on a
+    uniform reservoir sample of up to `spearman_rows` rows per table, so it is
+    exact for tables that fit. p-values test Pearson r (t test, pairwise n)
+    and are corrected across every test of every table.
+    """
+    
+    def __init__(self, min_correlation: float = 0.3, alpha: float = 0.05, correction: str = 'bh',
+                 max_results: int = 20, chunk_rows: int = 50000, spearman_rows: int = 100000,
+                 max_columns: int = 500, seed: int = 0):
+        self.min_correlation = min_correlation
+        self.alpha = alpha
+        self.correction = correction
+        self.max_results = max_results
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.spearman_rows = max(0, int(spearman_rows))
+        self.max_columns = max(2, int(max_columns))
+        self.seed = seed
+        
+    @classmethod
+    def from_config(cls, analysis_config: Dict[str, Any]) -> 'CorrelationEngine':
+        """Build the engine from the analysis configuration section"""
+        
+        return cls(
+            min_correlation=float(analysis_config.get('correlation_min', 0.3)),
+            alpha=float(analysis_config.get('correlation_alpha', 0.05)),
+            correction=analysis_config.get('correlation_correction', 'bh'),
+            max_results=int(analysis_config.get('correlation_max_results', 20)),
+            chunk_rows=int(analysis_config.get('chunk_rows', 50000)),
+            spearman_rows=int(analysis_config.get('spearman_sample_rows', 100000)),
+            max_columns=int(analysis_config.get('max_columns', 500)),
+            seed=analysis_config.get('seed', 0)
+        )
+        
+    def discover(self, paths: Iterable[Path], token=None) -> Dict[str, Any]:
+        """Correlation records ({'variables', 'correlation', 'significance', 'insight', ...}) plus scan stats"""
+        
+        if np is None:
+            raise ValueError("Correlation discovery needs the 'numpy' package (pip install numpy)")
+            
+        rng = np.random.default_rng(self.seed)
+        tables, skipped = scan_files(paths, lambda path: self._scan(path, rng, token))
+        
+        candidates = []
+        for table in tables:
+            pearson, counts = table.pearson.correlation()
+            spearman = table.spearman()
+            upper = np.triu_indices(len(table.columns), 1)
+            r, n = pearson[upper], counts[upper]
+            testable = np.isfinite(r) & (n >= 3)
+            for i, j, r_ij, n_ij in zip(upper[0][testable], upper[1][testable], r[testable], n[testable]):
+                rho = spearman[i, j] if spearman is not None else float('nan')
+                candidates.append((table, int(i), int(j), float(r_ij), float(rho), int(n_ij)))
+                
+        if candidates:
+            p_values = correlation_pvalues(np.array([c[3] for c in candidates]), np.array([c[5] for c in candidates]))
+            adjusted = adjust_pvalues(p_values, self.correction)
+        else:
+            p_values = adjusted = np.array([])
+            
+        significant = [
+            (abs(candidate[3]), index) for index, candidate in enumerate(candidates)
+            if adjusted[index] <= self.alpha and abs(candidate[3]) >= self.min_correlation
+        ]
+        significant.sort(reverse=True)
+        
+        correlations = []
+        for _, index in significant[:self.max_results]:
+            table, i, j, r, rho, n = candidates[index]
+            a, b = table.columns[i], table.columns[j]
+            correlations.append({
+                'variables': [a, b],
+                'correlation': round(r, 4),
+                'significance': float(adjusted[index]),
+                'insight': _insight(a, b, r, rho),
+                'spearman': None if math.isnan(rho) else round(rho, 4),
+                'p_value': float(p_values[index]),
+                'samples': n,
+                'source': table.name
+            })
+            
+        return {
+            'correlations': correlations,
+            'tables': [table.summary() for table in tables],
+            'skipped_files': skipped,
+            'tests': len(candidates),
+            'significant': len(significant),
+            'correction': self.correction,
+            'alpha': self.alpha
+        }
+        
+    def _scan(self, path: Path, rng, token) -> Optional['_TableStats']:
+        """Accumulate one file chunk by chunk; None when it has fewer than two numeric columns"""
+        
+        table = None
+        for header, raw in iter_table(path, self.chunk_rows):
+            if token is not None:
+                token.raise_if_cancelled()
+            rows = len(next(iter(raw.values()), ()))
+            if not rows:
+                continue
+                
+            if table is None:
+                # The first chunk decides which columns are numeric
+                arrays = {name: to_float(raw[name]) for name in header if name in raw}
+                columns = [name for name in header if name in arrays and is_numeric(raw[name], arrays[name])]
+                if len(columns) < 2:
+                    return None
+                columns = columns[:self.max_columns]
+                sample_rows = min(self.spearman_rows, SAMPLE_CELLS // len(columns))
+                table = _TableStats(path.name, columns, sample_rows, rng)
+            else:
+                arrays = {}
+                
+            chunk = np.column_stack([
+                arrays[name] if name in arrays else to_float(raw[name]) if name in raw else np.full(rows, np.nan)
+                for name in table.columns
+            ])
+            table.add(chunk)
+            
+        return table
+
+class _PairwiseMoments:
+    """Running pairwise-complete sums giving Pearson r for every column pair"""
+    
+    def __init__(self, width: int):
+        self.shift = None
+        self.n = np.zeros((width, width))
+        self.sx = np.zeros((width, width))  # sx[i, j]: sum of column i over rows where i and j are present
+        self.sxx = np.zeros((width, width))
+        self.sxy = np.zeros((width, width))
+        
+    def update(self, X):
+        if self.shift is None:
+            # Centring on the first chunk's means keeps the raw sums from losing precision
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                self.shift = np.nan_to_num(np.nanmean(X, axis=0))
+        X = X - self.shift
+        present = ~np.isnan(X)
+        
+        if present.all():
+            self.n += len(X)
+            self.sx += X.sum(axis=0)[:, None]
+            self.sxx += np.einsum('ij,ij->j', X, X)[:, None]
+            self.sxy += X.T @ X
+        else:
+            mask = present.astype(np.float64)
+            X = np.where(present, X, 0.0)
+            self.n += mask.T @ mask
+            self.sx += X.T @ mask
+            self.sxx += (X * X).T @ mask
+            self.sxy += X.T @ X
+            
+    def correlation(self) -> Tuple[Any, Any]:
+        """(r matrix, pairwise sample counts); r is NaN where a column is constant"""
+        
+        n, sx, sxx = self.n, self.sx, self.sxx
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = (n * self.sxy - sx * sx.T) / np.sqrt((n * sxx - sx ** 2) * (n * sxx.T - sx.T ** 2))
+        r[~np.isfinite(r)] = np.nan
+        return np.clip(r, -1.0, 1.0), n
+
+class _TableStats:
+    """Per-table Pearson accumulator plus the reservoir sample Spearman is computed from"""
+    
+    def __init__(self, name: str, columns: List[str], sample_rows: int, rng):
+        self.name = name
+        self.columns = columns
+        self.rows = 0
+        self.pearson = _PairwiseMoments(len(columns))
+        self.sample_rows = sample_rows
+        self.sample = np.empty((0, len(columns)))
+        self.rng = rng
+        
+    def add(self, chunk):
+        self.pearson.update(chunk)
+        
+        # Algorithm R: row t (0-based) replaces a random sample row with probability k/(t+1)
+        fill = min(self.sample_rows - len(self.sample), len(chunk))
+        if fill > 0:
+            self.sample = np.vstack([self.sample, chunk[:fill]])
+        rest = chunk[max(fill, 0):]
+        if len(rest) and self.sample_rows:
+            positions = self.rows + max(fill, 0) + np.arange(len(rest))
+            slots = (self.rng.random(len(rest)) * (positions + 1)).astype(np.int64)
+            keep = slots < self.sample_rows
+            self.sample[slots[keep]] = rest[keep]
+            
+        self.rows += len(chunk)
+        
+    def spearman(self):
+        """Spearman rho matrix from the sample (columns ranked over their own non-missing values)"""
+        
+        if len(self.sample) < 3:
+            return None
+        ranks = np.full(self.sample.shape, np.nan)
+        for j in range(self.sample.shape[1]):
+            present = ~np.isnan(self.sample[:, j])
+            _, inverse, counts = np.unique(self.sample[present, j], return_inverse=True, return_counts=True)
+            # Tied values share the average of the ranks they span
+            ranks[present, j] = (np.cumsum(counts) - (counts - 1) / 2.0)[inverse]
+        moments = _PairwiseMoments(len(self.columns))
+        moments.update(ranks)
+        return moments.correlation()[0]
+        
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'source': self.name,
+            'rows': self.rows,
+            'numeric_columns': len(self.columns),
+            'spearman_rows': len(self.sample)
+        }
+
+def correlation_pvalues(r, n):
+    """Two-sided p-values for Pearson r over n samples (t test with n - 2 degrees of freedom)"""
+    
+    r = np.asarray(r, dtype=np.float64)
+    df = np.asarray(n, dtype=np.float64) - 2
+    p = np.full(r.shape, np.nan)
+    
+    valid = (df > 0) & np.isfinite(r)
+    r2, dof = np.minimum(r[valid] ** 2, 1.0), df[valid]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t2 = dof * r2 / (1.0 - r2)
+        
+    values = np.zeros(r2.shape)  # |r| = 1 stays at p = 0
+    finite = np.isfinite(t2)
+    exact = finite & (dof <= EXACT_DF_LIMIT)
+    # P(|T| >= t) = I_{df / (df + t^2)}(df / 2, 1 / 2)
+    values[exact] = betainc(dof[exact] / 2, 0.5, dof[exact] / (dof[exact] + t2[exact]))
+    
+    approx = finite & ~exact
+    t, d = np.sqrt(t2[approx]), dof[approx]
+    # t -> z transformation, accurate to a few parts in a thousand once df is in the hundreds
+    z = t * (1 - 1 / (4 * d)) / np.sqrt(1 + t2[approx] / (2 * d))
+    values[approx] = _erfc(z / math.sqrt(2))
+    
+    p[valid] = values
+    return p
+
+def adjust_pvalues(p_values, method: str = 'bh'):
+    """Multiple-comparison correction: 'bh' (Benjamini-Hochberg FDR), 'bonferroni' or 'none'"""
+    
+    p = np.asarray(p_values, dtype=np.float64)
+    m = len(p)
+    method = (method or 'none').lower()
+    
+    if method == 'none' or m == 0:
+        return p.copy()
+    if method == 'bonferroni':
+        return np.minimum(p * m, 1.0)
+    if method not in ('bh', 'fdr_bh', 'benjamini-hochberg'):
+        raise ValueError(f"Unknown p-value correction '{method}' (use bh, bonferroni or none)")
+        
+    order = np.argsort(p)
+    scaled = p[order] * m / np.arange(1, m + 1)
+    # q_(i) = min over j >= i of p_(j) * m / j
+    scaled = np.minimum.accumulate(scaled[::-1])[::-1]
+    adjusted = np.empty(m)
+    adjusted[order] = np.minimum(scaled, 1.0)
+    return adjusted
+
+def betainc(a, b, x):
+    """Regularised incomplete beta function I_x(a, b), element-wise"""
+    
+    a, b, x = (np.asarray(v, dtype=np.float64) for v in np.broadcast_arrays(a, b, x))
+    result = np.where(x <= 0, 0.0, 1.0)
+    inside = (x > 0) & (x < 1)
+    if not inside.any():
+        return result
+        
+    a, b, x = a[inside], b[inside], x[inside]
+    log_front = _lgamma(a + b) - _lgamma(a) - _lgamma(b) + a * np.log(x) + b * np.log1p(-x)
+    # The continued fraction converges quickly below (a + 1) / (a + b + 2); use symmetry above it
+    swap = x > (a + 1) / (a + b + 2)
+    fraction = _betacf(np.where(swap, b, a), np.where(swap, a, b), np.where(swap, 1 - x, x))
+    front = np.exp(log_front)
+    result[inside] = np.where(swap, 1 - front * fraction / b, front * fraction / a)
+    return result
+
+def _betacf(a, b, x, max_iterations: int = 300, eps: float = 3e-14):
+    """Continued fraction of the incomplete beta function (modified Lentz), element-wise"""
+    
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1, a - 1
+    c = np.ones_like(x)
+    d = 1 - qab * x / qap
+    d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+    h = d.copy()
+    
+    for m in range(1, max_iterations + 1):
+        m2 = 2 * m
+        for coefficient in (m * (b - m) * x / ((qam + m2) * (a + m2)),
+                            -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1 + coefficient * d
+            d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+            c = 1 + coefficient / c
+            c = np.where(np.abs(c) < tiny, tiny, c)
+            delta = d * c
+            h = h * delta
+        if np.all(np.abs(delta - 1) < eps):
+            break
+            
+    return h
+
+def _lgamma(values):
+    return np.array([math.lgamma(v) for v in values.ravel()]).reshape(values.shape)
+
+def _erfc(values):
+    return np.array([math.erfc(v) for v in values.ravel()]).reshape(values.shape)
+
+def _insight(a: str, b: str, r: float, rho: float) -> str:
+    strength = 'Strong' if abs(r) >= 0.7 else 'Moderate' if abs(r) >= 0.4 else 'Weak'
+    direction = 'positive' if r > 0 else 'negative'
+    insight = f"{strength} {direction} relationship: higher {a} goes with {'higher' if r > 0 else 'lower'} {b}"
+    
+    if not math.isnan(rho):
+        if abs(rho) - abs(r) > 0.2:
+            insight += " (monotonic but non-linear)"
+        elif abs(r) - abs(rho) > 0.2:
+            insight += " (driven by extreme values)"
+    return insight
+
+def is_numeric(raw: List[Any], values) -> bool:
+    """Whether a column's parsed values make it numeric (NUMERIC_SHARE of its non-empty values)"""
+    non_empty = sum(1 for value in raw if value not in ('', None))
+    numeric = int(np.isfinite(values).sum())
+    return numeric >= 3 and numeric >= NUMERIC_SHARE * non_empty
+
+def to_float(raw) -> Any:
+    """Column values as float64, with blanks and non-numeric values as NaN"""
+    
+    try:
+        return np.asarray(raw, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+        
+    if isinstance(raw, tuple) and raw and isinstance(raw[0], str):
+        # Delimited text: blanks (or percentages, as in GSC's CTR column) are the usual reason the fast path failed
+        text = np.char.strip(np.asarray(raw))
+        percent = np.char.endswith(text, '%')
+        try:
+            values = np.where(text == '', 'nan', np.char.rstrip(text, '%')).astype(np.float64)
+            return np.where(percent, values / 100, values)
+        except ValueError:
+            pass
+            
+    values = np.full(len(raw), np.nan)
+    for i, value in enumerate(raw):
+        try:
+            values[i] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return values
+
+def iter_table(path: Path, chunk_rows: int) -> Iterator[Tuple[List[str], Dict[str, tuple]]]:
+    """(header, {column: values}) chunks of a tabular file"""
+    
+    name = path.name.lower()
+    plain = name[:-3] if name.endswith('.gz') else name[:-4] if name.endswith('.zst') else name
+    
+    if plain.endswith(('.csv', '.tsv')):
+        yield from _iter_delimited(path, '\t' if plain.endswith('.tsv') else ',', chunk_rows)
+    elif plain.endswith('.json'):
+        with io.TextIOWrapper(open_compressed(path), encoding='utf-8') as f:
+            data = json.load(f)
+        # A list of row objects, or an export wrapping one ({"rows": [...]})
+        if isinstance(data, dict):
+            data = next((value for value in data.values() if isinstance(value, list)), [])
+        yield from _iter_records(data, chunk_rows)
+    else:
+        yield from _iter_records(read_records(path), chunk_rows)
+
+def _iter_delimited(path: Path, delimiter: str, chunk_rows: int):
+    with io.TextIOWrapper(open_compressed(path), encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if not header:
+            return
+        width = len(header)
+        chunk_rows = _rows_per_chunk(chunk_rows, width)
+        rows = []
+        for row in reader:
+            if len(row) != width:
+                row = (row + [''] * width)[:width]
+            rows.append(row)
+            if len(rows) >= chunk_rows:
+                yield header, dict(zip(header, zip(*rows)))
+                rows = []
+        if rows:
+            yield header, dict(zip(header, zip(*rows)))
+
+def _iter_records(records: Iterable[Any], chunk_rows: int):
+    header: Dict[str, None] = {}
+    chunk = []
+    for record in records:
+        if isinstance(record, dict):
+            chunk.append(record)
+            if len(chunk) >= _rows_per_chunk(chunk_rows, len(header) or len(record)):
+                yield _record_columns(chunk, header)
+                chunk = []
+    if chunk:
+        yield _record_columns(chunk, header)
+
+def _rows_per_chunk(chunk_rows: int, width: int) -> int:
+    return max(100, min(chunk_rows, CHUNK_CELLS // max(1, width)))
+
+def _record_columns(chunk: List[Dict[str, Any]], header: Dict[str, None]):
+    for record in chunk:
+        for key in record:
+            header.setdefault(key)
+    return list(header), {key: [record.get(key) for record in chunk] for key in header}
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Workflow Worker Daemon
+Long-lived process that runs queued workflow jobs with warm configuration and workflow caches.
+"""
+
+import os
+import copy
+import time
+import signal
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Any, Tuple
+
+from config_manager import ConfigManager
+from workflow_executor import WorkflowExecutor, ExecutionResult
+from workflow_handlers import CommandCache
+from workflow_parser import WorkflowParser, WorkflowDefinition
+from workflow_ratelimit import MCPRateLimiter
+from workflow_resilience import CircuitBreakerRegistry
+from workflow_resources import ResourceBudget
+from workflow_hedging import MCPHedger, LatencyTracker
+from workflow_cancellation import CancellationToken
+from workflow_jobs import JobQueue, default_queue_dir
+from workflow_retention import RetentionService
+from workflow_events import EventStreamServer
+
+PID_FILE = 'daemon.pid'
+
+class WorkflowDaemon:
+    """Claims jobs from the SQLite queue and executes them
+
+    Configuration per client, parsed workflows and imported template
+    commands (both keyed by file mtime) are kept in memory between jobs.
+    Like batch runs, all jobs share one stage worker pool, the MCP rate
+    limiter, the circuit breakers and the resource budget; a client's own
+    [mcps] limits are not applied (a warning names them).
+    """
+    
+    def __init__(self, config_file: Optional[str] = None, workers: Optional[int] = None,
+                 poll_interval: float = 0.5, events_port: Optional[int] = None):
+        self.config_file = config_file
+        self.config_manager = ConfigManager(config_file)
+        self.exec_config = self.config_manager.get_execution_config()
+        self.storage_config = self.config_manager.get_storage_config()
+        self.ccc_root = Path(__file__).parent.parent.parent
+        self.active_dir = self.ccc_root / 'workflows' / 'active'
+        
+        self.queue = JobQueue.from_config(self.storage_config)
+        self.pid_file = default_queue_dir(self.storage_config) / PID_FILE
+        self.workers = int(workers or self.exec_config.get('daemon_workers', 2))
+        self.poll_interval = poll_interval
+        
+        # Live SSE feed of every job's progress (events.port, or --port; off when neither is set)
+        self.events_config = self.config_manager.get('events', {}) or {}
+        self.events_port = events_port if events_port is not None else self.events_config.get('port')
+        self.event_server: Optional[EventStreamServer] = None
+        
+        # Periodic retention/compaction of the reports tree (storage.gc_interval_hours, 0 = off)
+        self.gc_interval = float(self.storage_config.get('gc_interval_hours', 0)) * 3600
+        self._next_gc = time.monotonic() + min(self.gc_interval, 60)
+        self._gc_thread: Optional[threading.Thread] = None
+        
+        # Shared across jobs for the life of the daemon
+        self.rate_limiter = MCPRateLimiter(self.config_manager)
+        self.circuit_breakers = CircuitBreakerRegistry.from_config(self.exec_config)
+        self.resource_budget = ResourceBudget.from_config(self.exec_config)
+        self.mcp_hedger = MCPHedger(self.rate_limiter, LatencyTracker.from_config(self.storage_config))
+        self.stage_pool = ThreadPoolExecutor(
+            max_workers=int(self.exec_config.get('batch_max_workers', self.exec_config.get('max_parallel_tasks', 3) * 2)),
+            thread_name_prefix='stage'
+        )
+        
+        # Warm caches
+        self._configs: Dict[str, ConfigManager] = {}
+        self._workflows: Dict[str, Tuple[float, WorkflowDefinition]] = {}
+        self.command_cache = CommandCache()
+        self._cache_lock = threading.Lock()
+        
+        self._running: Dict[int, WorkflowExecutor] = {}
+        # Per-job parent of the run token, created before the job starts so an early cancel is never lost
+        self._cancel_tokens: Dict[int, CancellationToken] = {}
+        self._threads: Dict[int, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        
+    def config_for(self, client_slug: str) -> ConfigManager:
+        """ConfigManager for a client, loaded once"""
+        
+        with self._cache_lock:
+            if client_slug not in self._configs:
+                self._configs[client_slug] = ConfigManager(self.config_file, client_slug or None)
+            return self._configs[client_slug]
+            
+    def workflow_for(self, workflow_name: str) -> WorkflowDefinition:
+        """Parsed active workflow, re-parsed only when its file changes"""
+        
+        path = self.active_dir / f'{workflow_name}.md'
+        mtime = path.stat().st_mtime
+        
+        with self._cache_lock:
+            cached = self._workflows.get(workflow_name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+                
+        workflow = WorkflowParser(self.config_manager).parse_suggested(path)
+        with self._cache_lock:
+            self._workflows[workflow_name] = (mtime, workflow)
+        return workflow
+        
+    def serve(self):
+        """Run until SIGTERM/SIGINT, then requeue unfinished jobs so they resume next time"""
+        
+        self._write_pid()
+        recovered = self.queue.recover_stale()
+        if recovered:
+            print(f"♻️  Requeued {len(recovered)} jobs left running by a previous daemon: {recovered}")
+            
+        signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+        print(f"🛠️  Workflow daemon started (pid {os.getpid()}, {self.workers} job workers)")
+        print(f"   Queue: {self.queue.db_path}")
+        
+        if self.events_port:
+            self.event_server = EventStreamServer.from_config(self.events_config, self.storage_config,
+                                                              port=int(self.events_port))
+            self.event_server.start()
+            print(f"   Events: {self.event_server.url}")
+        
+        try:
+            while not self._stop.is_set():
+                self._reap()
+                self._apply_cancellations()
+                
+                while len(self._threads) < self.workers:
+                    job = self.queue.claim_next()
+                    if job is None:
+                        break
+                    self._start(job)
+                    
+                self._maybe_collect()
+                self._stop.wait(self.poll_interval)
+                
+        except KeyboardInterrupt:
+            pass
+            
+        finally:
+            self._shutdown()
+            
+    def _start(self, job: Dict[str, Any]):
+        thread = threading.Thread(target=self._run_job, args=(job,), name=f"job-{job['id']}", daemon=True)
+        with self._lock:
+            self._threads[job['id']] = thread
+            self._cancel_tokens[job['id']] = CancellationToken()
+        thread.start()
+        
+    def _run_job(self, job: Dict[str, Any]):
+        """Execute one job and record its outcome"""
+        
+        job_id = job['id']
+        label = f"#{job_id} {job['workflow_name']}" + (f" [{job['client_slug']}]" if job['client_slug'] else '')
+        print(f"▶️  Job {label} started")
+        with self._lock:
+            cancel_token = self._cancel_tokens[job_id]
+            
+        try:
+            workflow = copy.deepcopy(self.workflow_for(job['workflow_name']))
+            if job['client_slug']:
+                workflow.client_slug = job['client_slug']
+                workflow.parameters['client_slug'] = job['client_slug']
+                
+            client_config = self.config_for(job['client_slug'])
+            ignored = self.rate_limiter.ignored_overrides(client_config)
+            if ignored:
+                print(f"⚠️  Job {label}: client [mcps] settings for {', '.join(ignored)} are ignored; "
+                      f"daemon jobs share the global MCP limits")
+            executor = WorkflowExecutor(client_config, rate_limiter=self.rate_limiter, stage_pool=self.stage_pool,
+                                        cancel_parent=cancel_token, command_cache=self.command_cache,
+                                        circuit_breakers=self.circuit_breakers,
+                                        resource_budget=self.resource_budget, mcp_hedger=self.mcp_hedger)
+            executor.use_cache = job['options'].get('use_cache', True) and executor.use_cache
+            
+            with self._lock:
+                self._running[job_id] = executor
+                
+            result = executor.execute_definition(workflow, resume=job['options'].get('resume', False))
+            
+        except Exception as e:
+            self.queue.finish(job_id, 'failed', error=str(e))
+            print(f"❌ Job {label} failed: {e}")
+            return
+            
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+                self._cancel_tokens.pop(job_id, None)
+                
+        if self._stop.is_set() and not result.success:
+            # Interrupted by shutdown - picked up again (resuming) by the next daemon
+            self.queue.requeue(job_id, {'resume': True})
+            print(f"⏸️  Job {label} requeued")
+            return
+            
+        cancelled = cancel_token.cancelled
+        status = 'completed' if result.success else ('cancelled' if cancelled else 'failed')
+        self.queue.finish(job_id, status, result=self._result_dict(result), error=result.error_message)
+        print(f"{'✅' if result.success else '❌'} Job {label} {status} in {result.execution_time:.1f}s")
+        
+    def _maybe_collect(self):
+        """Start a background gc pass when one is due"""
+        
+        if not self.gc_interval or time.monotonic() < self._next_gc:
+            return
+        if self._gc_thread and self._gc_thread.is_alive():
+            return
+            
+        self._next_gc = time.monotonic() + self.gc_interval
+        self._gc_thread = threading.Thread(target=self._collect, name='gc', daemon=True)
+        self._gc_thread.start()
+        
+    def _collect(self):
+        try:
+            stats = RetentionService(self.config_file).collect()
+            if stats['compressed'] or stats['deleted']:
+                print(f"🧹 gc: compressed {stats['compressed']} runs, deleted {stats['deleted']} "
+                      f"({(stats['bytes_before'] - stats['bytes_after'] + stats['bytes_deleted']) / 1e6:.1f} MB freed)")
+        except Exception as e:
+            print(f"Warning: gc pass failed: {e}")
+            
+    def _reap(self):
+        with self._lock:
+            for job_id, thread in list(self._threads.items()):
+                if not thread.is_alive():
+                    del self._threads[job_id]
+                    
+    def _apply_cancellations(self):
+        for job_id in self.queue.cancel_requested():
+            with self._lock:
+                token = self._cancel_tokens.get(job_id)
+            if token and not token.cancelled:
+                print(f"🛑 Cancelling job #{job_id}")
+                token.cancel('cancelled')
+                
+    def _shutdown(self):
+        print("\n🛑 Stopping workflow daemon...")
+        self._stop.set()
+        
+        with self._lock:
+            tokens = list(self._cancel_tokens.values())
+            threads = list(self._threads.values())
+        for token in tokens:
+            token.cancel('interrupted')
+            
+        grace = float(self.exec_config.get('cancel_grace_seconds', 5)) + 1
+        deadline = time.monotonic() + grace
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+            
+        self.stage_pool.shutdown(wait=False, cancel_futures=True)
+        if self.event_server:
+            self.event_server.shutdown()
+        try:
+            self.pid_file.unlink()
+        except FileNotFoundError:
+            pass
+            
+    def _write_pid(self):
+        self.pid_file.parent.mkdir(parents=True, exist_ok=True)
+        self.pid_file.write_text(str(os.getpid()))
+        
+    def _result_dict(self, result: ExecutionResult) -> Dict[str, Any]:
+        return {
+            'success': result.success,
+            'execution_time': result.execution_time,
+            'stages_completed': result.stages_completed,
+            'total_stages': result.total_stages,
+            'output_directory': str(result.output_directory) if result.output_directory else None,
+            'correlations_found': len(result.correlations_found),
+            'finished': datetime.now().isoformat()
+        }
+
+def daemon_pid(storage_config: Dict) -> Optional[int]:
+    """PID of a running daemon, or None"""
+    
+    pid_file = default_queue_dir(storage_config) / PID_FILE
+    try:
+        pid = int(pid_file.read_text().strip())
+        os.kill(pid, 0)
+        return pid
+    except (FileNotFoundError, ValueError, ProcessLookupError):
+        return None
+    except PermissionError:
+        return pid
@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+"""
+Distributed Stage Execution
+A coordinator leases ready stages to worker processes on other hosts that share the reports filesystem.
+"""
+
+import os
+import hmac
+import json
+import ipaddress
+import time
+import uuid
+import socket
+import signal
+import threading
+import socketserver
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+from config_manager import ConfigManager
+from workflow_parser import WorkflowDefinition, WorkflowStage
+from workflow_scheduler import StageGraph
+from workflow_cancellation import CancellationToken
+from workflow_ratelimit import MCPRateLimiter
+from workflow_resilience import CircuitBreakerRegistry
+from workflow_resources import ResourceBudget
+from workflow_hedging import MCPHedger, LatencyTracker
+from workflow_events import EventBus
+from workflow_executor import WorkflowExecutor
+
+DEFAULT_ADDRESS = '127.0.0.1:8766'
+LEASE_POLL_SECONDS = 10.0
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+WORKER_RUN_CACHE = 16
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """'host:port' or 'unix:/path/to.sock' -> (socket family, socket address)"""
+    
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    if not port.isdigit():
+        raise ValueError(f"Invalid coordinator address '{address}' (use host:port or unix:/path)")
+    return socket.AF_INET, (host or '0.0.0.0', int(port))
+
+def is_loopback(host: str) -> bool:
+    """True for localhost and loopback IP addresses"""
+    
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+        
+def request(address: str, message: Dict[str, Any], timeout: float = 30.0) -> Dict[str, Any]:
+    """Send one newline-delimited JSON message and return the coordinator's reply"""
+    
+    family, target = parse_address(address)
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(target)
+        sock.sendall(json.dumps(message, default=str).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as reader:
+            line = reader.readline(MAX_MESSAGE_BYTES)
+    if not line:
+        raise ConnectionError(f"Coordinator at {address} closed the connection")
+    reply = json.loads(line)
+    if 'error' in reply:
+        raise RuntimeError(f"Coordinator error: {reply['error']}")
+    return reply
+
+def workflow_from_dict(data: Dict[str, Any]) -> WorkflowDefinition:
+    """Rebuild a WorkflowDefinition sent over the wire"""
+    return WorkflowDefinition(**{**data, 'stages': [WorkflowStage(**stage) for stage in data['stages']]})
+
+@dataclass
+class _Lease:
+    """One stage attempt waiting for, or running on, a worker"""
+    lease_id: str
+    run_id: str
+    executor: Any
+    stage_num: int
+    token: CancellationToken
+    done: threading.Event = field(default_factory=threading.Event)
+    worker: Optional[str] = None
+    expires: float = 0.0
+    dispatches: int = 0
+    result: Optional[Dict[str, Any]] = None
+    files: List[List[Any]] = field(default_factory=list)
+
+class StageCoordinator:
+    """Leases ready stages of this process's runs to remote workers
+
+    The executors keep their scheduler, manifest and events; only the stage
+    handlers run elsewhere. `run_stage` stands in for the executor's own
+    stage call: it queues the stage and blocks until a worker returns its
+    result. Workers poll for leases, heartbeat while they run them and
+    report the result plus the files they registered. A lease whose worker
+    misses heartbeats for `lease_ttl` seconds (crashed host, lost network)
+    goes back to the front of the queue, up to `max_dispatches` times.
+    Workers and coordinator must see the reports tree at the same path.
+    Stage timeouts include the time a stage waits for a free worker slot.
+    """
+    
+    def __init__(self, address: str = DEFAULT_ADDRESS, lease_ttl: float = 15.0, heartbeat_interval: float = 5.0,
+                 max_in_flight: int = 32, max_dispatches: int = 3, token: Optional[str] = None):
+        self.address = address
+        self.lease_ttl = float(lease_ttl)
+        self.heartbeat_interval = float(heartbeat_interval)
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_dispatches = max(1, int(max_dispatches))
+        self.token = token
+        
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self._run_ids: Dict[int, str] = {}  # id(executor) -> current run
+        self._queue: deque = deque()
+        self._leases: Dict[str, _Lease] = {}
+        self._cancelled: Dict[str, str] = {}  # lease id -> reason, until its worker has been told
+        self.workers: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads: List[threading.Thread] = []
+        
+    @classmethod
+    def from_config(cls, distributed_config: Dict[str, Any], address: Optional[str] = None) -> 'StageCoordinator':
+        """Build the coordinator from the distributed configuration section"""
+        
+        return cls(address or distributed_config.get('listen', DEFAULT_ADDRESS),
+                   lease_ttl=distributed_config.get('lease_ttl_seconds', 15),
+                   heartbeat_interval=distributed_config.get('heartbeat_seconds', 5),
+                   max_in_flight=distributed_config.get('max_in_flight', 32),
+                   max_dispatches=distributed_config.get('max_dispatches', 3),
+                   token=distributed_config.get('token'))
+                   
+    def start(self):
+        """Listen for workers and expire leases on background threads"""
+        
+        family, target = parse_address(self.address)
+        if family != socket.AF_UNIX and not self.token and not is_loopback(target[0]):
+            # Workers receive whole workflow definitions and write into the reports tree
+            raise ValueError(f"Refusing to listen on {self.address} without a token; "
+                             f"set [distributed] token or listen on a loopback address")
+        if family == socket.AF_UNIX:
+            if os.path.exists(target):
+                os.unlink(target)  # left behind by a coordinator that did not shut down
+            self._server = _UnixServer(target, _CoordinatorHandler)
+        else:
+            self._server = _TCPServer(target, _CoordinatorHandler)
+            if target[1] == 0:
+                self.address = f"{target[0]}:{self._server.server_address[1]}"
+        self._server.coordinator = self
+        
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.5},
+                             name='coordinator', daemon=True),
+            threading.Thread(target=self._expire_leases, name='lease-reaper', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"🖧 Stage coordinator listening on {self.address} (lease {self.lease_ttl:g}s)")
+        
+    def shutdown(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            family, target = parse_address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(target):
+                os.unlink(target)
+                
+    def open_run(self, executor, workflow: WorkflowDefinition):
+        """Register an executor's run so workers can fetch its definition"""
+        
+        run_id = uuid.uuid4().hex[:12]
+        with self._cond:
+            self._run_ids[id(executor)] = run_id
+            self.runs[run_id] = {
+                'run_id': run_id,
+                'workflow': asdict(workflow),
+                'client_slug': workflow.client_slug,
+                'output_dir': str(executor.output_dir),
+                'input_hashes': executor.input_hashes,
+                'use_cache': executor.use_cache
+            }
+            
+    def close_run(self, executor):
+        with self._cond:
+            run_id = self._run_ids.pop(id(executor), None)
+            self.runs.pop(run_id, None)
+            # Nobody waits for these any more; workers holding one are told 'lease_lost' on their next heartbeat
+            self._queue = deque(lease for lease in self._queue if lease.run_id != run_id)
+            for lease_id in [lease_id for lease_id, lease in self._leases.items() if lease.run_id == run_id]:
+                del self._leases[lease_id]
+            
+    def run_stage(self, executor, workflow: WorkflowDefinition, stage_num: int,
+                  token: CancellationToken) -> Dict[str, Any]:
+        """Queue a stage for the workers and wait for its result (called on a scheduler thread)"""
+        
+        lease = _Lease(uuid.uuid4().hex, self._run_ids[id(executor)], executor, stage_num, token)
+        queued_at = time.monotonic()
+        with self._cond:
+            self._queue.append(lease)
+            self._cond.notify()
+            
+        while not lease.done.wait(0.25):
+            if token.cancelled:
+                with self._cond:
+                    if lease.done.is_set():
+                        break
+                    if lease in self._queue:
+                        self._queue.remove(lease)
+                    if self._leases.pop(lease.lease_id, None) is not None:
+                        self._cancelled[lease.lease_id] = token.reason
+                return {
+                    'success': False,
+                    'error': f"Stage cancelled ({token.reason})",
+                    'cancelled': True,
+                    'stage_num': stage_num,
+                    'execution_time': time.monotonic() - queued_at
+                }
+                
+        # Files the worker registered land in this run's manifest (and events) as if written here
+        for relative_path, size, sha256 in lease.files:
+            executor._record_output(executor.output_dir / relative_path, size, sha256, stage_num)
+        return lease.result
+        
+    def _lease(self, worker: str, wait: float) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + min(wait, LEASE_POLL_SECONDS * 3)
+        with self._cond:
+            self._seen(worker)
+            while True:
+                while not self._queue:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._stop.is_set():
+                        return None
+                    self._cond.wait(remaining)
+                    
+                lease = self._queue.popleft()
+                if lease.run_id in self.runs:
+                    break
+                # Its run was closed while the lease sat in the queue - drop it
+                
+            lease.worker = worker
+            lease.expires = time.monotonic() + self.lease_ttl
+            lease.dispatches += 1
+            self._leases[lease.lease_id] = lease
+            
+            # Read the run's state while close_run() can't tear it down
+            executor = lease.executor
+            stage = executor.current_workflow.stages[lease.stage_num - 1]
+            # Upstream manifest entries, so handlers can find their dependencies' streamed records
+            dependencies = {dep: executor.manifest.stage(dep)
+                            for dep in executor.stage_graph.dependencies[lease.stage_num]}
+            payload = {'lease_id': lease.lease_id, 'run_id': lease.run_id, 'stage_num': lease.stage_num,
+                       'dependencies': dependencies, 'demand': executor.stage_demand(stage),
+                       'lease_ttl': self.lease_ttl, 'heartbeat_interval': self.heartbeat_interval}
+                       
+        print(f"   🖧 Stage {lease.stage_num}: {stage.name} leased to {worker}")
+        executor.events.emit('stage_started', stage=lease.stage_num, name=stage.name, worker=worker,
+                             dispatch=lease.dispatches)
+        return payload
+                
+    def _heartbeat(self, worker: str, lease_ids: List[str]) -> Dict[str, str]:
+        """Extend a worker's leases; returns the ones it must stop, with the reason"""
+        
+        cancel = {}
+        with self._cond:
+            self._seen(worker)
+            for lease_id in lease_ids:
+                lease = self._leases.get(lease_id)
+                if lease is not None and lease.worker == worker:
+                    lease.expires = time.monotonic() + self.lease_ttl
+                else:
+                    cancel[lease_id] = self._cancelled.pop(lease_id, 'lease_lost')
+        return cancel
+        
+    def _complete(self, worker: str, lease_id: str, result: Dict[str, Any], files: List[List[Any]]) -> bool:
+        with self._cond:
+            self._cancelled.pop(lease_id, None)
+            lease = self._leases.get(lease_id)
+            if lease is None or lease.worker != worker:
+                return False  # expired and re-dispatched, or cancelled - a late result is dropped
+            del self._leases[lease_id]
+            lease.result, lease.files = result, files
+        lease.done.set()
+        return True
+        
+    def _release(self, worker: str, lease_ids: List[str]):
+        """A worker shutting down hands its leases back for immediate re-dispatch"""
+        
+        with self._cond:
+            for lease_id in lease_ids:
+                lease = self._leases.get(lease_id)
+                if lease is not None and lease.worker == worker:
+                    del self._leases[lease_id]
+                    lease.dispatches -= 1
+                    self._queue.appendleft(lease)
+            self.workers.pop(worker, None)
+            self._cond.notify_all()
+        print(f"   🖧 Worker {worker} left, {len(lease_ids)} stage(s) re-queued")
+        
+    def _expire_leases(self):
+        while not self._stop.wait(min(1.0, self.lease_ttl / 4)):
+            now = time.monotonic()
+            lost = []
+            with self._cond:
+                for lease in [l for l in self._leases.values() if l.expires < now]:
+                    del self._leases[lease.lease_id]
+                    if lease.dispatches < self.max_dispatches:
+                        print(f"   ⚠️  Lease on Stage {lease.stage_num} expired (worker {lease.worker}) - re-dispatching")
+                        self._queue.appendleft(lease)
+                        self._cond.notify()
+                    else:
+                        lost.append(lease)
+                        
+            for lease in lost:
+                print(f"   ❌ Stage {lease.stage_num} lost {lease.dispatches} workers - giving up")
+                lease.result = {
+                    'success': False,
+                    'error': f"Lease expired on {lease.dispatches} workers (last: {lease.worker})",
+                    'stage_num': lease.stage_num,
+                    'execution_time': 0.0
+                }
+                lease.done.set()
+                
+    def _seen(self, worker: str):
+        if worker not in self.workers:
+            print(f"   🖧 Worker {worker} connected")
+        self.workers[worker] = {'last_seen': time.time()}
+        
+    def handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Dispatch one worker request"""
+        
+        if self.token and not hmac.compare_digest(str(message.get('token', '')), str(self.token)):
+            return {'error': 'invalid token'}
+            
+        op, worker = message.get('op'), str(message.get('worker', ''))
+        if op == 'lease':
+            return {'lease': self._lease(worker, float(message.get('wait', LEASE_POLL_SECONDS)))}
+        if op == 'run':
+            with self._cond:
+                run = self.runs.get(message.get('run_id'))
+            return {'run': run} if run else {'error': f"unknown run {message.get('run_id')}"}
+        if op == 'heartbeat':
+            return {'cancel': self._heartbeat(worker, message.get('leases', []))}
+        if op == 'complete':
+            return {'accepted': self._complete(worker, message['lease_id'], message['result'],
+                                               message.get('files', []))}
+        if op == 'release':
+            self._release(worker, message.get('leases', []))
+            return {}
+        return {'error': f"unknown op '{op}'"}
+
+class _CoordinatorHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_MESSAGE_BYTES)
+        if not line:
+            return
+        try:
+            reply = self.server.coordinator.handle(json.loads(line))
+        except Exception as e:
+            reply = {'error': str(e)}
+        try:
+            self.wfile.write(json.dumps(reply, default=str).encode('utf-8') + b'\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the worker gave up on a long poll
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+class _LeaseManifest:
+    """The slice of RunManifest a stage needs on a worker
+
+    Dependencies' entries come with the lease; files the stage registers
+    are collected per stage and sent back with the result.
+    """
+    
+    def __init__(self):
+        self.stages: Dict[int, Dict[str, Any]] = {}
+        self._files: Dict[int, List[List[Any]]] = {}
+        self._lock = threading.Lock()
+        
+    def stage(self, stage_num: int) -> Optional[Dict[str, Any]]:
+        return self.stages.get(stage_num)
+        
+    def record_file(self, relative_path: str, size: int, sha256: str, stage_num: Optional[int] = None):
+        with self._lock:
+            self._files.setdefault(stage_num, []).append([relative_path, size, sha256])
+            
+    def take_files(self, stage_num: int) -> List[List[Any]]:
+        with self._lock:
+            return self._files.pop(stage_num, [])
+
+class StageWorker:
+    """Runs stages leased from a coordinator
+
+    Each slot thread long-polls for a lease, runs the stage through a
+    regular WorkflowExecutor pointed at the coordinator's run directory and
+    reports back; a heartbeat thread keeps the leases alive and stops
+    stages the coordinator has cancelled or given to someone else. All
+    slots share the MCP rate limiter, circuit breakers and resource budget
+    (a leased stage waits until its footprint fits this host). On Ctrl-C or
+    SIGTERM running stages are cancelled and handed back for re-dispatch.
+    """
+    
+    def __init__(self, config_file: Optional[str] = None, address: Optional[str] = None,
+                 slots: Optional[int] = None):
+        self.config_file = config_file
+        self.config_manager = ConfigManager(config_file)
+        config = self.config_manager.get('distributed', {}) or {}
+        self.address = address or config.get('connect') or config.get('listen', DEFAULT_ADDRESS)
+        self.slots = int(slots or config.get('worker_slots', self.config_manager.get_execution_config().get('max_parallel_tasks', 3)))
+        self.token = config.get('token')
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.heartbeat_interval = float(config.get('heartbeat_seconds', 5))
+        self.lease_ttl = float(config.get('lease_ttl_seconds', 15))
+        
+        exec_config = self.config_manager.get_execution_config()
+        self.rate_limiter = MCPRateLimiter(self.config_manager)
+        self.circuit_breakers = CircuitBreakerRegistry.from_config(exec_config)
+        self.resource_budget = ResourceBudget.from_config(exec_config)
+        self.mcp_hedger = MCPHedger(self.rate_limiter,
+                                    LatencyTracker.from_config(self.config_manager.get_storage_config()))
+        
+        self._configs: Dict[str, ConfigManager] = {}
+        self._runs: Dict[str, Tuple[Any, WorkflowDefinition]] = {}
+        self._active: Dict[str, CancellationToken] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        
+    def _request(self, message: Dict[str, Any], timeout: float = 30.0) -> Dict[str, Any]:
+        return request(self.address, {**message, 'worker': self.worker_id, 'token': self.token}, timeout=timeout)
+        
+    def serve(self):
+        """Work until interrupted, reconnecting whenever the coordinator goes away"""
+        
+        signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+        print(f"🧵 Stage worker {self.worker_id} ({self.slots} slots) → {self.address}")
+        
+        threads = [threading.Thread(target=self._slot, name=f'slot-{n}', daemon=True) for n in range(self.slots)]
+        threads.append(threading.Thread(target=self._heartbeats, name='heartbeat', daemon=True))
+        for thread in threads:
+            thread.start()
+            
+        try:
+            while not self._stop.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            self._stop.set()
+            
+        with self._lock:
+            running = dict(self._active)
+        for token in running.values():
+            token.cancel('interrupted')
+        if running:
+            try:
+                self._request({'op': 'release', 'leases': list(running)}, timeout=5.0)
+            except (OSError, RuntimeError):
+                pass  # the leases will expire instead
+        print(f"🛑 Stage worker stopped ({len(running)} running stage(s) handed back)")
+        
+    def _slot(self):
+        backoff, last_error = 0.5, None
+        while not self._stop.is_set():
+            try:
+                lease = self._request({'op': 'lease', 'wait': LEASE_POLL_SECONDS},
+                                      timeout=LEASE_POLL_SECONDS * 3 + 5)['lease']
+                backoff, last_error = 0.5, None
+            except (OSError, ValueError, RuntimeError) as e:
+                # Coordinator not up yet, or between runs
+                if str(e) != last_error:
+                    print(f"   ⏳ Waiting for coordinator at {self.address}: {e}")
+                    last_error = str(e)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 10.0)
+                continue
+                
+            if lease is not None:
+                self._run_lease(lease)
+                
+    def _run_lease(self, lease: Dict[str, Any]):
+        lease_id, stage_num = lease['lease_id'], lease['stage_num']
+        # The coordinator's timing wins over local configuration
+        self.lease_ttl, self.heartbeat_interval = lease['lease_ttl'], lease['heartbeat_interval']
+        token = CancellationToken()
+        with self._lock:
+            self._active[lease_id] = token
+            
+        result, files = None, []
+        try:
+            executor, workflow = self._run_for(lease['run_id'])
+            executor.manifest.stages.update({int(num): entry for num, entry in lease['dependencies'].items()})
+            stage = workflow.stages[stage_num - 1]
+            print(f"📋 Stage {stage_num}: {stage.name} ({workflow.name}, run {lease['run_id']})")
+            demand = lease.get('demand') or {}
+            if self.resource_budget is None or self.resource_budget.acquire(demand, token):
+                try:
+                    result = executor._execute_stage(stage, stage_num, workflow, token)
+                finally:
+                    if self.resource_budget is not None:
+                        self.resource_budget.release(demand)
+            files = executor.manifest.take_files(stage_num)
+        except Exception as e:
+            result = {'success': False, 'error': f"Worker {self.worker_id}: {e}", 'stage_num': stage_num,
+                      'execution_time': 0.0}
+                      
+        if token.cancelled:
+            # Cancelled here means the coordinator no longer wants this attempt
+            with self._lock:
+                self._active.pop(lease_id, None)
+            return
+            
+        # Keep trying for as long as the lease could still be alive
+        deadline = time.monotonic() + self.lease_ttl
+        while True:
+            try:
+                accepted = self._request({'op': 'complete', 'lease_id': lease_id, 'result': result, 'files': files})
+                if not accepted.get('accepted'):
+                    print(f"   ⚠️  Result for Stage {stage_num} arrived after its lease expired - discarded")
+                break
+            except (OSError, RuntimeError) as e:
+                if time.monotonic() >= deadline or self._stop.is_set():
+                    print(f"   ❌ Could not report Stage {stage_num}: {e}")
+                    break
+                time.sleep(0.5)
+                
+        with self._lock:
+            self._active.pop(lease_id, None)
+        self.mcp_hedger.latency.save()
+            
+    def _run_for(self, run_id: str) -> Tuple[Any, WorkflowDefinition]:
+        """Executor and workflow for a coordinator run, fetched once per run"""
+        
+        with self._lock:
+            if run_id in self._runs:
+                return self._runs[run_id]
+                
+        run = self._request({'op': 'run', 'run_id': run_id})['run']
+        workflow = workflow_from_dict(run['workflow'])
+        client_slug = run['client_slug'] or ''
+        
+        with self._lock:
+            if client_slug not in self._configs:
+                self._configs[client_slug] = ConfigManager(self.config_file, client_slug or None)
+            config_manager = self._configs[client_slug]
+        executor = WorkflowExecutor(config_manager, rate_limiter=self.rate_limiter,
+                                    circuit_breakers=self.circuit_breakers, mcp_hedger=self.mcp_hedger)
+        executor.events = EventBus(enabled=False)  # the coordinator publishes the run's events
+        executor.use_cache = run['use_cache']
+        executor.output_dir = Path(run['output_dir'])
+        executor.input_hashes = run['input_hashes']
+        executor.current_workflow = workflow
+        executor.stage_graph = StageGraph(workflow.stages)
+        executor.manifest = _LeaseManifest()
+        
+        with self._lock:
+            self._runs[run_id] = (executor, workflow)
+            while len(self._runs) > WORKER_RUN_CACHE:
+                del self._runs[next(iter(self._runs))]
+            return self._runs[run_id]
+            
+    def _heartbeats(self):
+        last_ok = time.monotonic()
+        while not self._stop.wait(self.heartbeat_interval):
+            with self._lock:
+                lease_ids = list(self._active)
+            if not lease_ids:
+                last_ok = time.monotonic()
+                continue
+                
+            try:
+                cancel = self._request({'op': 'heartbeat', 'leases': lease_ids}, timeout=self.heartbeat_interval * 2)['cancel']
+                last_ok = time.monotonic()
+            except (OSError, ValueError, RuntimeError):
+                if time.monotonic() - last_ok < self.lease_ttl:
+                    continue
+                # The coordinator has re-dispatched these by now
+                cancel = {lease_id: 'coordinator_lost' for lease_id in lease_ids}
+                
+            for lease_id, reason in cancel.items():
+                with self._lock:
+                    token = self._active.get(lease_id)
+                if token is not None:
+                    print(f"   🛑 Stopping leased stage ({reason})")
+                    token.cancel(reason)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Template Workflow Engine
+Lists, reads and validates the workflows a template declares in its template-config.json.
+"""
+
+from typing import Dict, List, Any
+
+from workflow_runner import WorkflowRunner
+
+class WorkflowEngine:
+    """Read-only view of a template's workflows; running them is WorkflowRunner's job"""
+    
+    def __init__(self, template_path: str):
+        self.runner = WorkflowRunner(template_path)
+        
+    def list_available_workflows(self) -> List[str]:
+        return self.runner.list_workflows()
+        
+    def get_workflow_definition(self, workflow_name: str) -> Dict[str, Any]:
+        """The workflow's entry from template-config.json (raises KeyError if undeclared)"""
+        return self.runner.config.get('workflows', {})[workflow_name]
+        
+    def validate_workflow(self, workflow_name: str) -> bool:
+        """True if every step names a command and `depends_on` resolves without cycles"""
+        
+        try:
+            steps = self.get_workflow_definition(workflow_name).get('steps', [])
+            self.runner.step_graph(workflow_name)
+        except (KeyError, ValueError):
+            return False
+        return bool(steps) and all(step.get('command') for step in steps)
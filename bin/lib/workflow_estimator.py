@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Stage Duration Estimation
+Predicts stage and workflow durations from recorded run history and the stage dependency graph.
+"""
+
+import os
+import json
+import heapq
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+HISTORY_FILE = '.stage-history.jsonl'
+# Recent durations kept per stage name; older ones are dropped from memory and compacted out of the file
+MAX_RECORDS_PER_STAGE = 200
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of a list of numbers (pct in 0-100)"""
+    
+    if not values:
+        return 0.0
+        
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+def _stage_fields(stage) -> Tuple[str, List[str], List[str]]:
+    """Name, agents and MCPs of a WorkflowStage or an interview stage dict"""
+    
+    if isinstance(stage, dict):
+        return stage.get('name', ''), stage.get('agents', []), stage.get('mcps', [])
+    return stage.name, stage.recommended_agents, stage.suggested_mcps
+
+class DurationHistory:
+    """Append-only JSONL log of completed stage durations, capped per stage
+
+    Only the latest `max_per_stage` durations of each stage name are kept.
+    The file is rewritten without the older lines once it holds twice as
+    many lines as are kept.
+    """
+    
+    def __init__(self, path: Path, max_per_stage: int = MAX_RECORDS_PER_STAGE):
+        self.path = Path(path)
+        self.max_per_stage = max(1, int(max_per_stage))
+        self._lock = threading.Lock()
+        self._records: Optional[List[Dict[str, Any]]] = None
+        self._lines = 0  # lines in the file, kept or not
+        
+    @classmethod
+    def from_config(cls, storage_config: Dict) -> 'DurationHistory':
+        """Build the history from the storage configuration section"""
+        
+        path = storage_config.get('history_file') or Path(storage_config['reports_base_dir']) / HISTORY_FILE
+        return cls(Path(path), storage_config.get('history_per_stage', MAX_RECORDS_PER_STAGE))
+        
+    def records(self) -> List[Dict[str, Any]]:
+        """Recorded stage durations (loaded once, then kept in memory)"""
+        
+        with self._lock:
+            if self._records is None:
+                loaded = []
+                if self.path.exists():
+                    with open(self.path, 'r') as f:
+                        for line in f:
+                            self._lines += 1
+                            try:
+                                loaded.append(json.loads(line))
+                            except json.JSONDecodeError:
+                                continue  # tolerate a torn last line
+                self._records = self._latest(loaded)
+                self._compact_if_needed()
+            return list(self._records)
+            
+    def _latest(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The last `max_per_stage` records of each stage, in their original order"""
+        
+        counts: Dict[str, int] = {}
+        kept = []
+        for entry in reversed(records):
+            stage = entry.get('stage_name', '').lower()
+            counts[stage] = counts.get(stage, 0) + 1
+            if counts[stage] <= self.max_per_stage:
+                kept.append(entry)
+        kept.reverse()
+        return kept
+        
+    def _compact_if_needed(self):
+        """Rewrite the file with the kept records once dropped lines outnumber them (lock held)"""
+        
+        if self._lines <= 2 * len(self._records):
+            return
+        tmp_path = self.path.with_suffix('.jsonl.tmp')
+        with open(tmp_path, 'w') as f:
+            for entry in self._records:
+                f.write(json.dumps(entry) + '\n')
+        # Lines another process appends between the read and the replace are lost; the estimates don't need them
+        os.replace(tmp_path, self.path)
+        self._lines = len(self._records)
+        
+        
+    def record(self, workflow_name: str, stage, seconds: float, usage: Optional[Dict[str, float]] = None):
+        """Append one stage duration (with the cores and memory it used, when measured)"""
+        
+        name, agents, mcps = _stage_fields(stage)
+        entry = {
+            'timestamp': datetime.now().isoformat(),
+            'workflow_name': workflow_name,
+            'stage_name': name,
+            'agents': list(agents),
+            'mcps': list(mcps),
+            'seconds': round(float(seconds), 3)
+        }
+        for key in ('cpu', 'memory_mb'):
+            if (usage or {}).get(key) is not None:
+                entry[key] = usage[key]
+                
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            if self._records is not None:
+                self._records.append(entry)
+                stage_records = [r for r in self._records if r.get('stage_name', '').lower() == name.lower()]
+                if len(stage_records) > self.max_per_stage:
+                    self._records.remove(stage_records[0])
+                self._lines += 1
+                self._compact_if_needed()
+
+class DurationEstimator:
+    """Percentile estimates per stage from history, falling back to agent/MCP history, then a heuristic"""
+    
+    def __init__(self, history: DurationHistory, min_samples: int = 3):
+        self.history = history
+        self.min_samples = min_samples
+        self._index: Optional[Dict[str, Dict[str, List[float]]]] = None
+        
+    def _build_index(self) -> Dict[str, Dict[str, List[float]]]:
+        if self._index is None:
+            index = {'stage': {}, 'agent': {}, 'mcp': {}}
+            for entry in self.history.records():
+                seconds = entry.get('seconds')
+                if seconds is None:
+                    continue
+                index['stage'].setdefault(entry.get('stage_name', '').lower(), []).append(seconds)
+                for agent in entry.get('agents', []):
+                    index['agent'].setdefault(agent, []).append(seconds)
+                for mcp in entry.get('mcps', []):
+                    index['mcp'].setdefault(mcp, []).append(seconds)
+            self._index = index
+        return self._index
+        
+    def estimate(self, stage) -> Dict[str, Any]:
+        """Estimated duration of a stage in seconds: p50, p90, sample count and the source used"""
+        
+        index = self._build_index()
+        name, agents, mcps = _stage_fields(stage)
+        
+        samples = index['stage'].get(name.lower(), [])
+        if len(samples) >= self.min_samples:
+            return self._summarise(samples, 'stage history')
+            
+        # No history for the stage itself - pool what its agents and MCPs usually take
+        pooled = []
+        for agent in agents:
+            pooled.extend(index['agent'].get(agent, []))
+        for mcp in mcps:
+            pooled.extend(index['mcp'].get(mcp, []))
+        if len(pooled) >= self.min_samples:
+            return self._summarise(pooled, 'agent/MCP history')
+            
+        seconds = self.heuristic_seconds(stage)
+        return {'p50': seconds, 'p90': seconds * 1.5, 'samples': 0, 'source': 'heuristic'}
+        
+    def _summarise(self, samples: List[float], source: str) -> Dict[str, Any]:
+        return {
+            'p50': percentile(samples, 50),
+            'p90': percentile(samples, 90),
+            'samples': len(samples),
+            'source': source
+        }
+        
+    @staticmethod
+    def heuristic_seconds(stage) -> float:
+        """Fixed rule-of-thumb estimate used when there is no history"""
+        
+        name, agents, mcps = _stage_fields(stage)
+        description = stage.get('description', '') if isinstance(stage, dict) else stage.description
+        
+        base_time = 5  # Base time per stage in minutes
+        
+        # Adjust based on stage complexity
+        if len(agents) > 1:
+            base_time += 2
+            
+        if len(mcps) > 2:
+            base_time += 3
+            
+        if 'comprehensive' in description.lower():
+            base_time *= 1.5
+        elif 'quick' in description.lower():
+            base_time *= 0.5
+            
+        return base_time * 60.0
+
+def critical_path(graph, durations: Dict[int, float]) -> Tuple[float, List[int]]:
+    """Longest dependency chain through the graph: (total seconds, stage numbers in order)"""
+    
+    finish: Dict[int, float] = {}
+    previous: Dict[int, Optional[int]] = {}
+    
+    for num in graph.topological_order():
+        start, via = 0.0, None
+        for dep in graph.dependencies[num]:
+            if finish[dep] > start:
+                start, via = finish[dep], dep
+        finish[num] = start + durations.get(num, 0.0)
+        previous[num] = via
+        
+    if not finish:
+        return 0.0, []
+        
+    node = max(finish, key=lambda n: finish[n])
+    length = finish[node]
+    path = []
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    return length, list(reversed(path))
+
+def simulate_makespan(graph, durations: Dict[int, float], workers: int) -> float:
+    """Wall-clock time of the scheduler's policy with `workers` slots
+
+    Mirrors StageScheduler: whenever a slot frees up, the lowest-numbered
+    ready stage is started.
+    """
+    
+    waiting = {num: len(deps) for num, deps in graph.dependencies.items()}
+    ready = [num for num, count in waiting.items() if count == 0]
+    heapq.heapify(ready)
+    running: List[Tuple[float, int]] = []
+    now = 0.0
+    workers = max(1, workers)
+    
+    while ready or running:
+        while ready and len(running) < workers:
+            num = heapq.heappop(ready)
+            heapq.heappush(running, (now + durations.get(num, 0.0), num))
+            
+        now, done = heapq.heappop(running)
+        for dependent in graph.dependents[done]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                heapq.heappush(ready, dependent)
+                
+    return now
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Run Events
+Structured progress events appended to per-run and shared event logs, served live as server-sent events.
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
+
+EVENTS_FILE = 'events.jsonl'
+EVENT_TYPES = ('run_started', 'stage_queued', 'stage_waiting', 'stage_started', 'stage_retrying', 'stage_finished',
+               'stage_skipped', 'stage_metrics', 'artifact_written', 'run_finished')
+DEFAULT_PORT = 8765
+# A reader leaves yesterday's feed once it has been quiet this long (late writers from just before midnight)
+FEED_SWITCH_GRACE = 2.0
+
+def default_events_dir(storage_config: Dict[str, Any], events_config: Optional[Dict[str, Any]] = None) -> Path:
+    """Directory holding the shared daily event feeds"""
+    
+    configured = (events_config or {}).get('dir')
+    return Path(configured or Path(storage_config['reports_base_dir']) / '.events')
+
+def feed_path(events_dir: Path, day: str) -> Path:
+    return Path(events_dir) / f'events-{day}.jsonl'
+
+def _today() -> str:
+    return time.strftime('%Y%m%d')
+
+class EventBus:
+    """Publishes the progress of one executor's runs
+
+    Every event is one JSON line appended to the run directory's events.jsonl
+    and to the shared feed <events_dir>/events-<YYYYMMDD>.jsonl that the SSE
+    server follows. Files are opened O_APPEND and each line goes out in a
+    single write(), so CLI runs, batch runs and daemon jobs in different
+    processes can share the feed without interleaving. Events are emitted
+    only between start_run() and end_run(); `subscribe` adds in-process
+    listeners (called on the emitting thread).
+    """
+    
+    def __init__(self, events_dir: Optional[Path] = None, clock: Callable[[], float] = time.time,
+                 enabled: bool = True):
+        self.events_dir = Path(events_dir) if events_dir else None
+        self.clock = clock
+        self.enabled = enabled
+        self.context: Dict[str, Any] = {}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._run_fd: Optional[int] = None
+        self._feed_fd: Optional[int] = None
+        self._feed_day: Optional[str] = None
+        self._seq = 0
+        self._lock = threading.Lock()
+        
+    @classmethod
+    def from_config(cls, events_config: Dict[str, Any], storage_config: Dict[str, Any],
+                    clock: Callable[[], float] = time.time) -> 'EventBus':
+        """Build the bus from the events and storage configuration sections"""
+        
+        return cls(default_events_dir(storage_config, events_config), clock=clock,
+                   enabled=events_config.get('enabled', True))
+                   
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        self._listeners.append(listener)
+        
+    def start_run(self, run_dir: Path, run: str, workflow: str, client: Optional[str] = None):
+        """Start a run's event log (appending when a resumed run already has one)"""
+        
+        self.end_run()
+        with self._lock:
+            self.context = {'run': run, 'workflow': workflow, 'client': client}
+            self._seq = 0
+            if self.enabled:
+                self._run_fd = _open_append(Path(run_dir) / EVENTS_FILE)
+                
+    def emit(self, event_type: str, **data) -> Optional[Dict[str, Any]]:
+        """Record an event of the current run; a no-op outside a run"""
+        
+        if not self.context:
+            return None
+            
+        with self._lock:
+            self._seq += 1
+            event = {'type': event_type, 'time': self.clock(), 'seq': self._seq, **self.context, **data}
+            if self.enabled:
+                line = (json.dumps(event, default=str, separators=(',', ':')) + '\n').encode('utf-8')
+                try:
+                    if self._run_fd is not None:
+                        os.write(self._run_fd, line)
+                    feed = self._feed()
+                    if feed is not None:
+                        os.write(feed, line)
+                except OSError as e:
+                    # Progress reporting must never fail a run
+                    print(f"Warning: Could not write run event: {e}")
+                    
+        for listener in self._listeners:
+            listener(event)
+        return event
+        
+    def end_run(self):
+        """Close the current run's event log and the feed"""
+        
+        with self._lock:
+            for fd in (self._run_fd, self._feed_fd):
+                if fd is not None:
+                    os.close(fd)
+            self._run_fd = self._feed_fd = self._feed_day = None
+            self.context = {}
+            
+    def _feed(self) -> Optional[int]:
+        """Descriptor of today's shared feed, rolling over at midnight"""
+        
+        if self.events_dir is None:
+            return None
+        day = _today()
+        if day != self._feed_day:
+            if self._feed_fd is not None:
+                os.close(self._feed_fd)
+            self._feed_fd = _open_append(feed_path(self.events_dir, day))
+            self._feed_day = day
+        return self._feed_fd
+
+def _open_append(path: Path) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+def follow_feed(events_dir: Path, position: Optional[Tuple[str, int]] = None, poll_interval: float = 0.25,
+                stop: Optional[threading.Event] = None) -> Iterator[Optional[Tuple[str, bytes]]]:
+    """Tail the shared feed: yields ('<day>:<offset>', line) for each new event, None when idle
+
+    Starts at `position` (the id of the last event seen) or at the current
+    end of today's feed, and moves on to the next day's file once the
+    current one is finished. Only ever reads the feed files - no run
+    directories are polled.
+    """
+    
+    events_dir = Path(events_dir)
+    if position is None:
+        day = _today()
+        path = feed_path(events_dir, day)
+        position = (day, path.stat().st_size if path.exists() else 0)
+    day, offset = position
+    last_data = time.monotonic()
+    
+    while stop is None or not stop.is_set():
+        path = feed_path(events_dir, day)
+        lines = []
+        if path.exists():
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # a write still in progress
+                    offset += len(line)
+                    lines.append((f'{day}:{offset}', line.rstrip(b'\n')))
+                    
+        if lines:
+            last_data = time.monotonic()
+            yield from lines
+            continue
+            
+        if day < _today() and time.monotonic() - last_data >= FEED_SWITCH_GRACE:
+            later = sorted(p.stem.split('-', 1)[1] for p in events_dir.glob('events-*.jsonl')
+                           if p.stem.split('-', 1)[1] > day)
+            day, offset = (later[0] if later else _today()), 0
+            continue
+            
+        yield None
+        time.sleep(poll_interval)
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """'<day>:<offset>' -> (day, offset); None for a missing or malformed id"""
+    
+    try:
+        day, offset = (event_id or '').split(':', 1)
+        return (day, int(offset)) if len(day) == 8 and day.isdigit() else None
+    except ValueError:
+        return None
+
+class EventStreamServer:
+    """Local HTTP endpoint streaming the shared feed as server-sent events
+
+    GET /events streams events as they are appended, optionally filtered
+    by ?run=, ?workflow=, ?client= and ?type= (comma-separated values).
+    Each SSE id is the event's feed position, so a reconnecting EventSource
+    (Last-Event-ID) resumes without gaps; ?replay=1 starts from the
+    beginning of today's feed. Every client gets its own thread that tails
+    the feed file, so any number of runs in any number of processes show up.
+    GET /health reports the feed location.
+    """
+    
+    def __init__(self, events_dir: Path, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                 poll_interval: float = 0.25, heartbeat: float = 15.0):
+        self.events_dir = Path(events_dir)
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.stop_event = threading.Event()
+        self.httpd = ThreadingHTTPServer((host, port), _EventStreamHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stream = self
+        self._thread: Optional[threading.Thread] = None
+        
+    @classmethod
+    def from_config(cls, events_config: Dict[str, Any], storage_config: Dict[str, Any],
+                    host: Optional[str] = None, port: Optional[int] = None) -> 'EventStreamServer':
+        return cls(default_events_dir(storage_config, events_config),
+                   host=host or events_config.get('host', '127.0.0.1'),
+                   port=int(port if port is not None else events_config.get('port', DEFAULT_PORT)))
+                   
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/events"
+        
+    def serve_forever(self):
+        try:
+            self.httpd.serve_forever(poll_interval=0.5)
+        finally:
+            self.httpd.server_close()
+            
+    def start(self) -> threading.Thread:
+        """Serve on a background thread (e.g. inside the daemon)"""
+        
+        self._thread = threading.Thread(target=self.serve_forever, name='events-http', daemon=True)
+        self._thread.start()
+        return self._thread
+        
+    def shutdown(self):
+        self.stop_event.set()
+        self.httpd.shutdown()
+
+class _EventStreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        stream: EventStreamServer = self.server.stream
+        url = urlparse(self.path)
+        
+        if url.path == '/health':
+            body = json.dumps({'status': 'ok', 'events_dir': str(stream.events_dir)}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+            
+        if url.path != '/events':
+            self.send_error(404, 'Use /events or /health')
+            return
+            
+        query = parse_qs(url.query)
+        filters = {key: set(','.join(query[key]).split(',')) for key in ('run', 'workflow', 'client', 'type')
+                   if key in query}
+        position = parse_event_id(self.headers.get('Last-Event-ID'))
+        if position is None and query.get('replay', ['0'])[0] not in ('0', ''):
+            position = (_today(), 0)
+            
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        
+        last_sent = time.monotonic()
+        try:
+            self.wfile.write(b'retry: 2000\n\n')
+            self.wfile.flush()
+            for item in follow_feed(stream.events_dir, position, stream.poll_interval, stream.stop_event):
+                if item is None:
+                    if time.monotonic() - last_sent >= stream.heartbeat:
+                        # Comment line: keeps proxies from timing out and notices closed clients
+                        self.wfile.write(b': keepalive\n\n')
+                        self.wfile.flush()
+                        last_sent = time.monotonic()
+                    continue
+                    
+                event_id, line = item
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if any(str(event.get(key)) not in values for key, values in filters.items()):
+                    continue
+                self.wfile.write(f"id: {event_id}\nevent: {event.get('type', 'message')}\n".encode('utf-8')
+                                 + b'data: ' + line + b'\n\n')
+                self.wfile.flush()
+                last_sent = time.monotonic()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+            
+    def log_message(self, format, *args):
+        # One line per connection would drown the daemon's own output
+        pass
@@ -4,16 +4,34 @@ Workflow Execution Engine
 Executes validated workflows with proper error handling and monitoring.
 """
 
-import os
 import json
-import time
 import shutil
+import hashlib
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
 from workflow_parser import WorkflowParser, WorkflowDefinition
+from workflow_scheduler import StageGraph, StageScheduler
+from workflow_resilience import RetryPolicy, CircuitBreakerRegistry
+from workflow_cancellation import CancellationToken, StageCancelled
+from workflow_manifest import RunManifest, hash_file, hash_directory_files, find_latest_run
+from workflow_cache import StageResultCache
+from workflow_blobstore import BlobStore
+from workflow_artifacts import normalise_compression
+from workflow_ratelimit import MCPRateLimiter
+from workflow_hedging import MCPHedger, LatencyTracker, hedge_rates
+from workflow_tracing import Tracer
+from workflow_clock import Clock, SYSTEM_CLOCK
+from workflow_handlers import HandlerRegistry, StageContext, CommandCache
+from workflow_history import RunIndex
+from workflow_estimator import DurationHistory, DurationEstimator, critical_path, simulate_makespan
+from workflow_correlation import CorrelationEngine, correlation_available, is_tabular
+from workflow_anomaly import AnomalyDetector, anomaly_available
+from workflow_events import EventBus
+from workflow_resources import ResourceBudget, ResourceEstimator, USAGE_MONITOR
 
 @dataclass
 class ExecutionResult:
@@ -31,7 +49,13 @@ class ExecutionResult:
 class WorkflowExecutor:
     """Executes validated workflows"""
     
-    def __init__(self, config_manager):
+    def __init__(self, config_manager, rate_limiter: Optional[MCPRateLimiter] = None,
+                 stage_pool: Optional[ThreadPoolExecutor] = None, clock: Optional[Clock] = None,
+                 cancel_parent: Optional[CancellationToken] = None,
+                 command_cache: Optional[CommandCache] = None,
+                 circuit_breakers: Optional[CircuitBreakerRegistry] = None,
+                 resource_budget: Optional[ResourceBudget] = None,
+                 mcp_hedger: Optional[MCPHedger] = None):
         self.config_manager = config_manager
         self.parser = WorkflowParser(config_manager)
         
@@ -43,29 +67,109 @@ class WorkflowExecutor:
         self.reports_dir = Path(self.storage_config['reports_base_dir'])
         self.temp_dir = Path(self.storage_config['temp_dir'])
         
+        # Simulated runs pass a VirtualClock (with an InlinePool as stage_pool)
+        self.clock = clock or SYSTEM_CLOCK
+        
+        # Retry backoff and per-MCP circuit breakers (breakers persist across runs)
+        self.retry_policy = RetryPolicy.from_config(self.exec_config)
+        self.circuit_breakers = circuit_breakers or CircuitBreakerRegistry.from_config(self.exec_config,
+                                                                                      clock=self.clock.monotonic)
+        
+        # Per-MCP token buckets and concurrency caps shared by every stage worker
+        self.rate_limiter = rate_limiter or MCPRateLimiter(config_manager)
+        # Duplicates slow calls of MCPs that opt in (shared with the rate limiter in batch runs)
+        self.mcp_hedger = mcp_hedger or MCPHedger(self.rate_limiter, LatencyTracker.from_config(self.storage_config))
+        
+        # Worker pool shared with other executors (batch runs); None = one pool per run
+        self.stage_pool = stage_pool
+        
+        # Stage results shared across runs, keyed by stage definition, parameters and inputs
+        self.stage_cache = StageResultCache.from_config(self.storage_config)
+        self.blob_store = BlobStore.from_config(self.storage_config)
+        self.artifact_compression = normalise_compression(self.storage_config.get('artifact_compression'))
+        self.use_cache = self.exec_config.get('cache_enabled', True)
+        
+        # Stage handlers: built-in simulations plus template commands imported on first use
+        # (imports are kept across runs when a daemon passes its command cache)
+        self.handlers = HandlerRegistry(command_cache=command_cache)
+        self._register_builtin_handlers()
+        
+        # Every run is recorded in the SQLite run index (history/compare commands)
+        self.run_index = RunIndex.from_config(self.storage_config)
+        
+        # Recorded stage durations feed the dry-run estimator
+        self.duration_history = DurationHistory.from_config(self.storage_config)
+        self.record_history = True  # off for simulations - their timings must not feed estimates
+        
+        # Stages start only while their CPU/memory/IO footprints fit the budget (shared in batch runs)
+        self.resource_budget = resource_budget or ResourceBudget.from_config(self.exec_config)
+        self.resource_estimator = ResourceEstimator(self.duration_history)
+        
+        # Analysis stages correlate the run's tabular inputs and upstream streamed records
+        self.correlation_engine = CorrelationEngine.from_config(config_manager.get('analysis', {}) or {})
+        self.anomaly_detector = AnomalyDetector.from_config(config_manager.get('analysis', {}) or {})
+        
+        # Structured progress events (run events.jsonl plus the shared feed the SSE server follows)
+        self.events = EventBus.from_config(config_manager.get('events', {}) or {}, self.storage_config,
+                                           clock=self.clock.time)
+        
+        # Set to a StageCoordinator to lease stages to remote workers instead of running them here
+        self.coordinator = None
+        
         # Current execution state
         self.current_workflow = None
         self.execution_start_time = None
         self.output_dir = None
-        
-    def execute_workflow(self, workflow_path: Path, dry_run: bool = False) -> ExecutionResult:
-        """Execute a validated workflow"""
+        self.manifest = None
+        self.stage_graph = None
+        self.input_hashes: Dict[str, str] = {}
+        self._pending_files: Dict[str, tuple] = {}  # written before the manifest exists
+        self.tracer = Tracer(clock=self.clock.time)
+        # Batch and daemon runs cancel through a parent token, which also reaches a run still in setup
+        self.cancel_parent = cancel_parent
+        self.cancel_token = CancellationToken(parent=cancel_parent, clock=self.clock)
+        self._live_results: Dict[int, Dict[str, Any]] = {}
+        self._mcp_hedging: Dict[str, Dict[str, int]] = {}  # per-MCP hedging counters of the current run
+        
+    def execute_workflow(self, workflow_path: Path, dry_run: bool = False, resume: bool = False) -> ExecutionResult:
+        """Execute a validated workflow (optionally resuming the latest run from its checkpoints)"""
         
         try:
             # Parse workflow
             workflow = self.parser.parse_suggested(workflow_path)
+        except Exception as e:
+            return ExecutionResult(
+                success=False,
+                execution_time=0.0,
+                stages_completed=0,
+                total_stages=0,
+                output_directory=None,
+                correlations_found=[],
+                error_message=f"Execution failed: {str(e)}",
+                partial_results=False
+            )
+            
+        return self.execute_definition(workflow, dry_run=dry_run, resume=resume)
+        
+    def execute_definition(self, workflow: WorkflowDefinition, dry_run: bool = False, resume: bool = False) -> ExecutionResult:
+        """Execute an already parsed workflow (lets batch runs parse once for many clients)"""
+        
+        try:
             self.current_workflow = workflow
-            self.execution_start_time = time.time()
+            self.execution_start_time = self.clock.time()
             
             if dry_run:
                 return self._perform_dry_run(workflow)
             else:
-                return self._perform_execution(workflow)
+                return self._perform_execution(workflow, resume=resume)
                 
         except Exception as e:
+            # Setup failures happen outside the stage loop; close their event log too
+            self.events.emit('run_finished', status='failed', error=str(e))
+            self.events.end_run()
             return ExecutionResult(
                 success=False,
-                execution_time=time.time() - (self.execution_start_time or time.time()),
+                execution_time=self.clock.time() - (self.execution_start_time or self.clock.time()),
                 stages_completed=0,
                 total_stages=len(workflow.stages) if workflow else 0,
                 output_directory=None,
@@ -80,7 +184,9 @@ class WorkflowExecutor:
         print(f"🔍 DRY RUN: {workflow.name}")
         print("=" * 50)
         
-        estimated_time = 0
+        graph = StageGraph(workflow.stages)
+        estimator = DurationEstimator(self.duration_history)
+        estimates = {}
         
         for i, stage in enumerate(workflow.stages, 1):
             print(f"\n📋 Stage {i}: {stage.name}")
@@ -90,16 +196,31 @@ class WorkflowExecutor:
             print(f"   Dependencies: {', '.join(stage.dependencies) if stage.dependencies else 'None'}")
             
             # Estimate time for this stage
-            stage_time = self._estimate_stage_time(stage)
-            estimated_time += stage_time
-            print(f"   Estimated time: {stage_time:.1f} minutes")
+            estimates[i] = estimator.estimate(stage)
+            samples = f", {estimates[i]['samples']} runs" if estimates[i]['samples'] else ""
+            print(f"   Estimated time: {estimates[i]['p50'] / 60:.1f} min "
+                  f"(p90 {estimates[i]['p90'] / 60:.1f} min; {estimates[i]['source']}{samples})")
             
             # Check for parallel execution opportunities
-            if not stage.dependencies and i > 1:
+            if not graph.dependencies[i] and i > 1:
                 print(f"   🔄 Could run in parallel with earlier stages")
                 
-        print(f"\n⏱️ Total estimated time: {estimated_time:.1f} minutes")
-        
+        workers = self.exec_config.get('max_parallel_tasks', 3)
+        p50 = {num: e['p50'] for num, e in estimates.items()}
+        p90 = {num: e['p90'] for num, e in estimates.items()}
+        path_length, path = critical_path(graph, p50)
+        sequential_time = sum(p50.values())
+        makespan_p50 = simulate_makespan(graph, p50, workers)
+        makespan_p90 = simulate_makespan(graph, p90, workers)
+        
+        print(f"\n🧭 Critical path: {' → '.join(f'Stage {num}' for num in path)} ({path_length / 60:.1f} minutes)")
+        print(f"⏱️ Total estimated time: {makespan_p50 / 60:.1f} minutes "
+              f"(p90 {makespan_p90 / 60:.1f} minutes, {workers} parallel tasks; "
+              f"{sequential_time / 60:.1f} minutes sequentially)")
+        if self.resource_budget is not None:
+            # The makespan above assumes every ready stage fits; admission may hold some back
+            print(f"🧮 Resource budget: {self.resource_budget.describe()}")
+            
         return ExecutionResult(
             success=True,
             execution_time=0,
@@ -109,87 +230,232 @@ class WorkflowExecutor:
             correlations_found=[],
             error_message=None,
             partial_results=False,
-            estimated_time=estimated_time
+            estimated_time=makespan_p50 / 60
         )
         
-    def _perform_execution(self, workflow: WorkflowDefinition) -> ExecutionResult:
+    def _perform_execution(self, workflow: WorkflowDefinition, resume: bool = False) -> ExecutionResult:
         """Perform actual workflow execution"""
         
         print(f"🚀 EXECUTING WORKFLOW: {workflow.name}")
         print("=" * 50)
         
-        # Setup output directory
-        self.output_dir = self._create_output_directory(workflow)
-        
-        # Save workflow configuration
-        self._save_workflow_config(workflow)
-        
-        # Archive input files
-        self._archive_input_files(workflow)
+        self.tracer = Tracer(clock=self.clock.time)
+        self.manifest = None
+        self._pending_files = {}
+        run_span_start = self.clock.time()
+        
+        # One token for the whole run, setup included - cancelling it must never be lost to a later replacement
+        self.cancel_token = CancellationToken(parent=self.cancel_parent, clock=self.clock)
+        self._live_results = {}
+        self._mcp_hedging = {}
+        
+        with self.tracer.span('Setup', 'setup'):
+            # Setup output directory (reuse the latest run's directory when resuming)
+            previous_run = self._find_resumable_run(workflow) if resume else None
+            if previous_run:
+                self.output_dir = previous_run
+                print(f"♻️  Resuming run in: {previous_run}")
+            else:
+                if resume:
+                    print("♻️  No previous run found - starting a fresh run")
+                self.output_dir = self._create_output_directory(workflow)
+                
+            self.events.start_run(self.output_dir, self._run_label(), workflow.name, workflow.client_slug)
+            self.events.emit('run_started', stages=len(workflow.stages), resumed=bool(previous_run))
+            
+            # Save workflow configuration
+            self._save_workflow_config(workflow)
+            
+            # Archive input files
+            with self.tracer.span('Archive inputs', 'setup'):
+                self._archive_input_files(workflow)
+                input_hashes = hash_directory_files(self.output_dir / 'inputs', self.blob_store.digest)
+                self.blob_store.save()
+            self.input_hashes = input_hashes
         
         # Execute stages
         stages_completed = 0
         correlations_found = []
         partial_results = False
+        total_stages = len(workflow.stages)
+        error_message = None
         
         try:
-            for i, stage in enumerate(workflow.stages, 1):
-                print(f"\n📋 Stage {i}/{len(workflow.stages)}: {stage.name}")
-                print("-" * 40)
+            graph = StageGraph(workflow.stages)
+            self.stage_graph = graph
+            
+            # Reuse still-valid stage checkpoints from the previous run
+            precompleted = {}
+            previous_manifest = RunManifest.load(self.output_dir) if previous_run else None
+            if previous_manifest:
+                for stage_num, artifact in previous_manifest.valid_checkpoints(workflow, graph, input_hashes).items():
+                    with open(artifact, 'r') as f:
+                        precompleted[stage_num] = json.load(f)
+                self.manifest = previous_manifest
+                self.manifest.reset_run(input_hashes, workflow.parameters)
+            else:
+                self.manifest = RunManifest.create(self.output_dir, workflow, input_hashes)
+            for relative_path, (size, sha256) in self._pending_files.items():
+                self.manifest.record_file(relative_path, size, sha256)
+            if self.coordinator:
+                self.coordinator.open_run(self, workflow)
                 
-                stage_result = self._execute_stage(stage, i, workflow)
+            for stage_num in sorted(precompleted):
+                print(f"⏭️ Stage {stage_num}: {workflow.stages[stage_num - 1].name} - checkpoint valid, skipping")
+                self.events.emit('stage_skipped', stage=stage_num, name=workflow.stages[stage_num - 1].name,
+                                 reason='checkpoint')
                 
-                if stage_result['success']:
-                    stages_completed += 1
-                    correlations_found.extend(stage_result.get('correlations', []))
-                    
-                    print(f"✅ Stage {i} completed successfully")
-                    
-                    # Save stage results
-                    self._save_stage_results(stage, i, stage_result)
-                    
+            scheduler = StageScheduler(
+                graph,
+                max_workers=self.coordinator.max_in_flight if self.coordinator else self.exec_config.get('max_parallel_tasks', 3),
+                error_handling=self.exec_config.get('error_handling', 'retry'),
+                retry_policy=self.retry_policy,
+                cancel_grace=float(self.exec_config.get('cancel_grace_seconds', 5)),
+                cancel_token=self.cancel_token,
+                tracer=self.tracer,
+                pool=self.stage_pool,
+                clock=self.clock,
+                # Remote workers admit against their own host's budget
+                budget=None if self.coordinator else self.resource_budget,
+                retry_timeouts=bool(self.exec_config.get('retry_timeouts', False))
+            )
+            
+            def on_start(stage_num: int):
+                stage = workflow.stages[stage_num - 1]
+                print(f"\n📋 Stage {stage_num}/{total_stages}: {stage.name}")
+                print("-" * 40)
+                self.events.emit('stage_queued', stage=stage_num, name=stage.name)
+                
+            def on_success(stage_num: int, result: Dict, attempt: int):
+                stage = workflow.stages[stage_num - 1]
+                if attempt:
+                    print(f"✅ Stage {stage_num} completed on retry")
                 else:
-                    print(f"❌ Stage {i} failed: {stage_result.get('error', 'Unknown error')}")
-                    
-                    error_handling = self.exec_config.get('error_handling', 'retry')
-                    
-                    if error_handling == 'stop':
-                        partial_results = True
-                        break
-                    elif error_handling == 'retry':
-                        # Attempt retry
-                        retry_result = self._retry_stage(stage, i, workflow)
-                        if retry_result['success']:
-                            stages_completed += 1
-                            correlations_found.extend(retry_result.get('correlations', []))
-                            print(f"✅ Stage {i} completed on retry")
-                            self._save_stage_results(stage, i, retry_result)
-                        else:
-                            partial_results = True
-                            if error_handling != 'continue':
-                                break
-                    # 'continue' option falls through to next stage
+                    print(f"✅ Stage {stage_num} completed successfully")
+                artifact = self._save_stage_results(stage, stage_num, result)
+                self.manifest.record_stage(stage_num, stage, 'completed', artifact, attempts=attempt + 1,
+                                           duration=result.get('execution_time'), cached=bool(result.get('cached')),
+                                           streams=result.get('streams', []))
+                if not result.get('cached') and self.record_history:
+                    self.duration_history.record(workflow.name, stage, result.get('execution_time', 0.0),
+                                                 usage=result.get('resource_usage'))
+                if not result.get('cached'):
+                    for mcp, stats in (result.get('metrics') or {}).get('mcp_hedging', {}).items():
+                        totals = self._mcp_hedging.setdefault(mcp, {'calls': 0, 'hedged': 0, 'hedge_wins': 0})
+                        for key in totals:
+                            totals[key] += stats.get(key, 0)
+                self.events.emit('stage_finished', stage=stage_num, name=stage.name, status='completed',
+                                 attempt=attempt + 1, duration=result.get('execution_time'),
+                                 cached=bool(result.get('cached')))
+                if result.get('metrics'):
+                    self.events.emit('stage_metrics', stage=stage_num, name=stage.name, metrics=result['metrics'])
+                
+            def on_failure(stage_num: int, result: Dict):
+                print(f"❌ Stage {stage_num} failed: {result.get('error', 'Unknown error')}")
+                self.manifest.record_stage(stage_num, workflow.stages[stage_num - 1], 'failed',
+                                           error=result.get('error'))
+                self.events.emit('stage_finished', stage=stage_num, name=workflow.stages[stage_num - 1].name,
+                                 status='timeout' if result.get('timed_out') else 'failed',
+                                 error=result.get('error'), duration=result.get('execution_time'))
+                
+            def on_retry(stage_num: int, attempt: int, delay: float):
+                print(f"   🔄 Stage {stage_num} retry attempt {attempt}/{self.retry_policy.max_retries} in {delay:.1f}s")
+                self.events.emit('stage_retrying', stage=stage_num, name=workflow.stages[stage_num - 1].name,
+                                 attempt=attempt + 1, max_attempts=self.retry_policy.max_retries + 1, delay=delay)
+                
+            def on_wait(stage_num: int, short: List[str]):
+                stage = workflow.stages[stage_num - 1]
+                print(f"   ⏸️  Stage {stage_num}: {stage.name} waiting for {', '.join(short)}")
+                self.events.emit('stage_waiting', stage=stage_num, name=stage.name, resources=short)
+                
+            def on_abandon(stage_num: int, reason: str):
+                # Timed out or interrupted - keep whatever the stage produced so far
+                self._save_partial_results(workflow.stages[stage_num - 1], stage_num, reason)
+                if reason != 'timeout':
+                    # Timeouts are reported once, by on_failure
+                    self.events.emit('stage_finished', stage=stage_num, name=workflow.stages[stage_num - 1].name,
+                                     status=reason)
+                
+            outcome = scheduler.run(
+                execute=lambda stage_num, token: self._dispatch_stage(stage_num, workflow, token),
+                on_start=on_start,
+                on_success=on_success,
+                on_failure=on_failure,
+                on_retry=on_retry,
+                on_abandon=on_abandon,
+                timeout_for=lambda stage_num: self._stage_timeout(workflow.stages[stage_num - 1]),
+                precompleted=precompleted,
+                demand_for=lambda stage_num: self.stage_demand(workflow.stages[stage_num - 1]),
+                on_wait=on_wait
+            )
+            
+            stages_completed = len(outcome.completed)
+            partial_results = bool(outcome.failed or outcome.skipped or outcome.cancelled)
+            
+            # A run cancelled during setup has no cancelled stages - none were started
+            run_cancelled = bool(outcome.cancelled) or self.cancel_token.cancelled
+            if run_cancelled:
+                error_message = "Execution cancelled by user"
+                if outcome.cancelled:
+                    print(f"\n🛑 Cancelled stages: {', '.join(f'Stage {n}' for n in outcome.cancelled)}")
+            elif outcome.failed:
+                error_message = f"Failed stages: {', '.join(f'Stage {n}' for n in outcome.failed)}"
+                
+            if run_cancelled:
+                run_status = 'cancelled'
+            elif stages_completed == total_stages:
+                run_status = 'completed'
+            else:
+                run_status = 'failed'
+            self.manifest.set_status(run_status)
+            
+            # Keep correlations in stage order regardless of completion order
+            for stage_num in outcome.completed:
+                correlations_found.extend(outcome.results[stage_num].get('correlations', []))
+                
+            if outcome.skipped:
+                print(f"\n⏭️ Skipped stages: {', '.join(f'Stage {n}' for n in outcome.skipped)}")
+                for stage_num in outcome.skipped:
+                    self.events.emit('stage_skipped', stage=stage_num, name=workflow.stages[stage_num - 1].name,
+                                     reason='not_run')
                     
             # Generate final reports
             if stages_completed > 0:
-                self._generate_final_reports(workflow, correlations_found)
-                
-            execution_time = time.time() - self.execution_start_time
+                with self.tracer.span('Final reports', 'report'):
+                    self._generate_final_reports(workflow, correlations_found, stages_completed,
+                                                 success=run_status == 'completed')
+                    
+            self._export_trace(workflow, run_span_start)
+            self._index_run(workflow, run_status, len(correlations_found), error_message)
+            
+            execution_time = self.clock.time() - self.execution_start_time
+            self.events.emit('run_finished', status=run_status, stages_completed=stages_completed,
+                             total_stages=total_stages, duration=execution_time, error=error_message,
+                             correlations=len(correlations_found), mcp_hedging=self._hedging_summary())
             
             return ExecutionResult(
-                success=stages_completed == len(workflow.stages),
+                success=stages_completed == total_stages,
                 execution_time=execution_time,
                 stages_completed=stages_completed,
-                total_stages=len(workflow.stages),
+                total_stages=total_stages,
                 output_directory=self.output_dir,
                 correlations_found=correlations_found,
-                error_message=None,
+                error_message=error_message,
                 partial_results=partial_results
             )
             
         except Exception as e:
-            execution_time = time.time() - self.execution_start_time
+            execution_time = self.clock.time() - self.execution_start_time
             
+            if self.manifest:
+                self.manifest.set_status('failed')
+                
+            if self.output_dir:
+                self._export_trace(workflow, run_span_start)
+                self._index_run(workflow, 'failed', len(correlations_found), str(e))
+            self.events.emit('run_finished', status='failed', stages_completed=stages_completed,
+                             total_stages=len(workflow.stages), duration=execution_time, error=str(e))
+                
             return ExecutionResult(
                 success=False,
                 execution_time=execution_time,
@@ -201,11 +467,85 @@ class WorkflowExecutor:
                 partial_results=True
             )
             
-    def _execute_stage(self, stage, stage_num: int, workflow: WorkflowDefinition) -> Dict[str, Any]:
-        """Execute a single workflow stage"""
+        finally:
+            if self.coordinator:
+                self.coordinator.close_run(self)
+            if self.record_history:
+                self.mcp_hedger.latency.save()
+            self.events.end_run()
+            
+    def _hedging_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Hedge and win rates per hedged MCP over the current run"""
+        return {mcp: hedge_rates(stats) for mcp, stats in self._mcp_hedging.items()}
+        
+    def _stage_timeout(self, stage) -> Optional[float]:
+        """Timeout in seconds for a stage (stage override, then execution config)"""
+        
+        timeout = stage.timeout_seconds or self.exec_config.get('timeout_seconds', 300)
+        return float(timeout) if timeout else None
+        
+    def stage_demand(self, stage) -> Dict[str, float]:
+        """CPU/memory/IO footprint reserved while a stage runs"""
+        
+        try:
+            handler_name = self.handlers.handler_name(stage)
+        except KeyError:
+            handler_name = None
+        return self.resource_estimator.demand(stage, handler_name)
+        
+    def _dispatch_stage(self, stage_num: int, workflow: WorkflowDefinition, token: CancellationToken) -> Dict[str, Any]:
+        """Run a stage here, or lease it to a remote worker in coordinator mode"""
+        
+        if self.coordinator:
+            return self.coordinator.run_stage(self, workflow, stage_num, token)
+        return self._execute_stage(workflow.stages[stage_num - 1], stage_num, workflow, token)
+        
+    def _execute_stage(self, stage, stage_num: int, workflow: WorkflowDefinition,
+                       token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """Execute a single workflow stage, reusing a cached result when one exists"""
         
-        stage_start_time = time.time()
+        self.events.emit('stage_started', stage=stage_num, name=stage.name)
         
+        if not self.use_cache:
+            return self._run_stage(stage, stage_num, workflow, token)
+            
+        cache_key = StageResultCache.key_for(stage, workflow.parameters, self.input_hashes, workflow.client_slug)
+        cached = self.stage_cache.get(cache_key)
+        
+        if cached is not None:
+            print(f"   💾 Using cached result for: {stage.name}")
+            cached.update({'stage_num': stage_num, 'execution_time': 0.0, 'cached': True})
+            return cached
+            
+        result = self._run_stage(stage, stage_num, workflow, token)
+        
+        # Handlers that write into the run directory opt out - a cache hit would skip the files
+        if result.get('success') and result.get('cacheable', True):
+            self.stage_cache.put(cache_key, result, workflow.name, stage.name)
+            
+        return result
+        
+    def _run_stage(self, stage, stage_num: int, workflow: WorkflowDefinition,
+                   token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """Run a stage handler (no caching)"""
+        
+        stage_start_time = self.clock.time()
+        token = token or self.cancel_token.child()
+        context = None
+        
+        # Fail fast instead of burning the backoff budget on an MCP that keeps failing
+        open_circuits = self.circuit_breakers.blocked(stage.suggested_mcps)
+        if open_circuits:
+            return {
+                'success': False,
+                'error': f"Circuit open for MCP(s): {', '.join(open_circuits)}",
+                'retryable': False,
+                'stage_num': stage_num,
+                'execution_time': 0.0
+            }
+            
+        # Stopped in the finally below - a probe left running keeps the RSS sampler thread alive
+        probe = USAGE_MONITOR.start()
         try:
             print(f"   Agents: {', '.join(stage.recommended_agents)}")
             print(f"   MCPs: {', '.join(stage.suggested_mcps)}")
@@ -216,40 +556,153 @@ class WorkflowExecutor:
             result = {
                 'success': True,
                 'stage_num': stage_num,
-                'execution_time': time.time() - stage_start_time,
+                'execution_time': self.clock.time() - stage_start_time,
                 'outputs': [],
                 'correlations': [],
                 'warnings': [],
                 'metrics': {}
             }
             
-            # Simulate different types of stage execution
-            if 'data collection' in stage.name.lower():
-                result.update(self._simulate_data_collection(stage, workflow))
-            elif 'analysis' in stage.name.lower():
-                result.update(self._simulate_analysis(stage, workflow))
-            elif 'report' in stage.name.lower():
-                result.update(self._simulate_report_generation(stage, workflow))
-            else:
-                result.update(self._simulate_generic_stage(stage, workflow))
-                
+            # Live view of the result so partial output can be flushed on timeout/cancel
+            self._live_results[stage_num] = result
+            
+            # Declared **Handler** first, otherwise the built-in matched by stage name
+            handler = self.handlers.resolve(stage)
+            context = StageContext(
+                stage=stage,
+                stage_num=stage_num,
+                workflow=workflow,
+                token=token,
+                partial=result,
+                output_dir=self.output_dir,
+                data={**workflow.parameters, 'client_slug': workflow.client_slug, 'stage_name': stage.name},
+                artifact_compression=self.artifact_compression,
+                mcp_caller=self._call_mcp
+            )
+            live_metrics = result['metrics']
+            result.update(handler(context, dict(workflow.parameters)))
+            if result.get('metrics') is not live_metrics:
+                # Keep what was recorded while the handler ran (MCP calls, hedging) next to what it returned
+                result['metrics'] = {**live_metrics, **(result.get('metrics') or {})}
+            
+            token.raise_if_cancelled()
+            
+            streams = [dict(s) for s in context.close_streams()]
+            if streams:
+                # The records live in this run's directory - a cache hit elsewhere would point at nothing
+                result.update({'streams': streams, 'cacheable': False})
+            
+            result['execution_time'] = self.clock.time() - stage_start_time
+            # Learned footprints for admission (recorded with the stage duration)
+            result['resource_usage'] = USAGE_MONITOR.stop(probe)
             return result
             
+        except StageCancelled as e:
+            return {
+                'success': False,
+                'error': f"Stage cancelled ({e})",
+                'cancelled': True,
+                'stage_num': stage_num,
+                'execution_time': self.clock.time() - stage_start_time
+            }
+            
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e),
                 'stage_num': stage_num,
-                'execution_time': time.time() - stage_start_time
+                'execution_time': self.clock.time() - stage_start_time
             }
             
-    def _simulate_data_collection(self, stage, workflow: WorkflowDefinition) -> Dict:
+        finally:
+            USAGE_MONITOR.stop(probe)
+            # Breakers record outcomes per MCP call (_call_mcp); a half-open trial the stage never used goes back
+            self.circuit_breakers.release(stage.suggested_mcps)
+            # Keep whatever a failed or cancelled handler streamed so far readable (and registered)
+            if context is not None:
+                for stream in context.close_streams():
+                    self._record_output(self.output_dir / stream['path'], stream['bytes'], stream['sha256'], stage_num)
+                for path in context.files:
+                    if path.is_file():
+                        self._record_output(path, path.stat().st_size, hash_file(path), stage_num)
+                
+    def _register_builtin_handlers(self):
+        """Built-in simulated handlers, selected by stage name unless a stage declares a handler"""
+        
+        def simulated(simulate):
+            return lambda context, config: simulate(context.stage, context.workflow, context.token, context.partial)
+            
+        self.handlers.register('data_collection', simulated(self._simulate_data_collection), keywords=['data collection'])
+        self.handlers.register('anomaly_detection', self._detect_anomalies, keywords=['anomal'])
+        self.handlers.register('analysis', simulated(self._simulate_analysis), keywords=['analysis'])
+        self.handlers.register('report', simulated(self._simulate_report_generation), keywords=['report'])
+        self.handlers.register('generic', simulated(self._simulate_generic_stage), default=True)
+        
+    def _call_mcp(self, mcp_name: str, call, token: CancellationToken, metrics: Optional[Dict] = None):
+        """Run one MCP call within that MCP's shared rate and concurrency limits
+        
+        `call(attempt_token)` runs twice at once when a hedged MCP is slow; the
+        losing attempt's token is cancelled. Hedging counters of the call are
+        added to `metrics['mcp_hedging']` when given. The call's outcome is
+        recorded against the MCP's circuit breaker.
+        """
+        
+        breaker = self.circuit_breakers.get(mcp_name)
+        with self.tracer.span(f"MCP {mcp_name}", 'mcp', mcp=mcp_name) as span:
+            outcome = {}
+            try:
+                if self.clock.virtual:
+                    # Simulated calls don't model MCP rate limits, concurrency caps or hedging
+                    value = call(token)
+                else:
+                    value = self.mcp_hedger.call(mcp_name, call, token, outcome)
+            except StageCancelled as e:
+                # A call the MCP was still answering when its stage timed out counts against it;
+                # interrupts and timeouts spent waiting on our own rate limits do not
+                if str(e) == 'timeout' and (self.clock.virtual or 'limit_wait' in outcome):
+                    breaker.record_failure()
+                raise
+            except Exception:
+                breaker.record_failure()
+                raise
+            finally:
+                # limit_wait is only set once the rate limits let the call through
+                issued = 'limit_wait' in outcome
+                if issued:
+                    span['limit_wait'] = outcome['limit_wait']
+                if outcome.get('hedged'):
+                    span.update({'hedged': True, 'hedge_won': outcome['hedge_won']})
+                if metrics is not None and issued and self.mcp_hedger.policy(mcp_name):
+                    stats = metrics.setdefault('mcp_hedging', {}).setdefault(
+                        mcp_name, {'calls': 0, 'hedged': 0, 'hedge_wins': 0})
+                    stats['calls'] += 1
+                    stats['hedged'] += int(outcome['hedged'])
+                    stats['hedge_wins'] += int(outcome['hedge_won'])
+            breaker.record_success()
+            return value
+            
+    def _simulate_mcp_work(self, stage, token: CancellationToken, seconds: float, partial: Dict):
+        """Spread simulated work over one call per suggested MCP"""
+        
+        mcps = stage.suggested_mcps
+        if not mcps:
+            token.sleep(seconds)
+            return
+            
+        partial['metrics'].setdefault('mcp_calls', [])
+        for mcp in mcps:
+            self._call_mcp(mcp, lambda attempt_token: attempt_token.sleep(seconds / len(mcps)), token,
+                           partial['metrics'])
+            partial['metrics']['mcp_calls'].append(mcp)
+            
+    def _simulate_data_collection(self, stage, workflow: WorkflowDefinition,
+                                  token: CancellationToken, partial: Dict) -> Dict:
         """Simulate data collection stage"""
         
         print("   📊 Collecting data from sources...")
         
-        # Simulate time delay
-        time.sleep(2)
+        # Simulate time delay, one source at a time so partial progress is visible
+        self._simulate_mcp_work(stage, token, 2, partial)
         
         outputs = []
         
@@ -275,13 +728,44 @@ class WorkflowExecutor:
             }
         }
         
-    def _simulate_analysis(self, stage, workflow: WorkflowDefinition) -> Dict:
-        """Simulate analysis stage"""
+    def _simulate_analysis(self, stage, workflow: WorkflowDefinition,
+                           token: CancellationToken, partial: Dict) -> Dict:
+        """Analysis stage: correlations across the run's tabular data, simulated when there is none"""
         
         print("   🔍 Analyzing data and discovering correlations...")
         
-        time.sleep(3)
-        
+        self._simulate_mcp_work(stage, token, 3, partial)
+        
+        stage_num = partial.get('stage_num')
+        sources, upstream = self._tabular_sources(stage_num)
+        if sources and correlation_available():
+            discovery = self.correlation_engine.discover(sources, token)
+            report = self.output_dir / 'artifacts' / f'stage_{stage_num}_correlation_analysis.json'
+            self._write_output(report, json.dumps(discovery, indent=2, default=str), stage_num)
+            print(f"   📈 {discovery['tests']} column pairs tested across {len(discovery['tables'])} tables, "
+                  f"{discovery['significant']} significant")
+            self._report_skipped_files(discovery['skipped_files'])
+            
+            result = {
+                'outputs': [str(report.relative_to(self.output_dir))],
+                'correlations': discovery['correlations'],
+                'metrics': {
+                    'correlations_found': len(discovery['correlations']),
+                    'correlation_tests': discovery['tests'],
+                    'tables_analysed': len(discovery['tables']),
+                    'rows_analysed': sum(table['rows'] for table in discovery['tables']),
+                    'files_skipped': len(discovery['skipped_files']),
+                    'correction': discovery['correction']
+                }
+            }
+            if upstream:
+                # Dependencies' streamed records aren't part of the stage cache key
+                result['cacheable'] = False
+            return result
+            
+        if sources:
+            print("   ⚠️ numpy is not installed - reporting simulated correlations")
+            
         # Simulate correlation discoveries
         correlations = [
             {
@@ -301,26 +785,91 @@ class WorkflowExecutor:
         return {
             'outputs': [
                 'correlation_analysis.json',
-                'anomaly_detection.json',
                 'insights_summary.json'
             ],
             'correlations': correlations,
             'metrics': {
                 'correlations_found': len(correlations),
-                'anomalies_detected': 3,
                 'confidence_level': 0.95
             }
         }
         
-    def _simulate_report_generation(self, stage, workflow: WorkflowDefinition) -> Dict:
+    def _detect_anomalies(self, context: StageContext, config: Dict[str, Any]) -> Dict:
+        """Anomaly detection stage: ranked day-level anomalies across every time series in the run's tabular data"""
+        
+        stage, stage_num, token = context.stage, context.stage_num, context.token
+        print("   🚨 Scanning time series for anomalies...")
+        
+        sources, upstream = self._tabular_sources(stage_num)
+        if not (sources and anomaly_available()):
+            if sources:
+                print("   ⚠️ numpy is not installed - skipping anomaly detection")
+            return self._simulate_generic_stage(stage, context.workflow, token, context.partial)
+            
+        self._simulate_mcp_work(stage, token, 1, context.partial)
+        
+        # The PRD's anomaly template takes its sensitivity as the alert_threshold parameter
+        threshold = config.get('alert_threshold')
+        detection = self.anomaly_detector.detect(sources, token, float(threshold) if threshold else None)
+        
+        with context.open_artifact('anomalies') as stream:
+            stream.extend(detection['anomalies'])
+        report = self.output_dir / 'artifacts' / f'stage_{stage_num}_anomaly_detection.json'
+        summary = {key: value for key, value in detection.items() if key != 'anomalies'}
+        summary['top_anomalies'] = detection['anomalies'][:20]
+        self._write_output(report, json.dumps(summary, indent=2, default=str), stage_num)
+        print(f"   📉 {detection['points_scored']} days scored across {detection['series']} series, "
+              f"{detection['detected']} anomalous")
+        self._report_skipped_files(detection['skipped_files'])
+              
+        result = {
+            'outputs': [str(report.relative_to(self.output_dir))],
+            'anomalies': detection['anomalies'][:20],
+            'metrics': {
+                'anomalies_detected': detection['detected'],
+                'anomalies_ranked': len(detection['anomalies']),
+                'series_scanned': detection['series'],
+                'days_scored': detection['points_scored'],
+                'files_skipped': len(detection['skipped_files']),
+                'method': detection['method'],
+                'threshold': detection['threshold']
+            }
+        }
+        if upstream:
+            result['cacheable'] = False
+        return result
+        
+    def _report_skipped_files(self, skipped: List[Dict[str, str]]):
+        for entry in skipped:
+            print(f"   ⚠️ Skipped unreadable file {entry['source']} ({entry['error']})")
+            
+    def _tabular_sources(self, stage_num: int) -> Tuple[List[Path], bool]:
+        """Tabular files an analysis stage reads (archived inputs, then its dependencies' streamed
+        records) and whether any of them came from upstream stages"""
+        
+        sources = []
+        inputs_dir = self.output_dir / 'inputs'
+        if inputs_dir.is_dir():
+            sources.extend(path for path in sorted(inputs_dir.iterdir()) if path.is_file() and is_tabular(path))
+            
+        upstream = []
+        if self.stage_graph is not None and self.manifest is not None:
+            for dep in sorted(self.stage_graph.dependencies.get(stage_num, ())):
+                entry = self.manifest.stage(dep) or {}
+                upstream.extend(self.output_dir / stream['path'] for stream in entry.get('streams', []))
+                
+        return sources + upstream, bool(upstream)
+        
+    def _simulate_report_generation(self, stage, workflow: WorkflowDefinition,
+                                    token: CancellationToken, partial: Dict) -> Dict:
         """Simulate report generation stage"""
         
         print("   📄 Generating reports and visualizations...")
         
-        time.sleep(2)
+        self._simulate_mcp_work(stage, token, 2, partial)
         
         # Create mock report files
-        self._create_mock_outputs(workflow)
+        self._create_mock_outputs(workflow, partial.get('stage_num'))
         
         return {
             'outputs': [
@@ -332,39 +881,28 @@ class WorkflowExecutor:
                 'charts_generated': 8,
                 'pages_created': 12,
                 'action_items': 15
-            }
+            },
+            'cacheable': False
         }
         
-    def _simulate_generic_stage(self, stage, workflow: WorkflowDefinition) -> Dict:
+    def _simulate_generic_stage(self, stage, workflow: WorkflowDefinition,
+                                token: CancellationToken, partial: Dict) -> Dict:
         """Simulate generic workflow stage"""
         
         print(f"   ⚙️ Processing: {stage.description}")
         
-        time.sleep(1)
+        self._simulate_mcp_work(stage, token, 1, partial)
         
         return {
             'outputs': [f'stage_{stage.name.lower().replace(" ", "_")}_results.json'],
             'metrics': {'items_processed': 42}
         }
         
-    def _retry_stage(self, stage, stage_num: int, workflow: WorkflowDefinition) -> Dict[str, Any]:
-        """Retry a failed stage with backoff"""
+    def _find_resumable_run(self, workflow: WorkflowDefinition) -> Optional[Path]:
+        """Find the latest run directory of this workflow that has a run manifest"""
         
-        max_retries = self.exec_config.get('max_retries', 3)
-        retry_delay = self.exec_config.get('retry_delay', 5)
-        
-        for attempt in range(max_retries):
-            print(f"   🔄 Retry attempt {attempt + 1}/{max_retries}")
-            
-            # Exponential backoff
-            time.sleep(retry_delay * (2 ** attempt))
-            
-            result = self._execute_stage(stage, stage_num, workflow)
-            
-            if result['success']:
-                return result
-                
-        return {'success': False, 'error': 'Max retries exceeded'}
+        client_base = Path(self.storage_config['reports_base_dir']) / (workflow.client_slug or 'default-client')
+        return find_latest_run(client_base / 'reports', workflow.name)
         
     def _create_output_directory(self, workflow: WorkflowDefinition) -> Path:
         """Create timestamped output directory for workflow results"""
@@ -411,14 +949,11 @@ class WorkflowExecutor:
             ]
         }
         
-        config_file = self.output_dir / 'workflow_config.yaml'
-        
         import yaml
-        with open(config_file, 'w') as f:
-            yaml.dump(config, f, default_flow_style=False)
+        self._write_output(self.output_dir / 'workflow_config.yaml', yaml.dump(config, default_flow_style=False))
             
     def _archive_input_files(self, workflow: WorkflowDefinition):
-        """Archive input files to output directory"""
+        """Archive input files into the run directory via the shared blob store"""
         
         if not workflow.client_slug:
             return
@@ -427,22 +962,82 @@ class WorkflowExecutor:
         archive_inputs_dir = self.output_dir / 'inputs'
         
         for input_name, input_path in workflow.inputs.items():
+            if self.cancel_token.cancelled:
+                return  # the scheduler sees the cancelled token and starts nothing
             if input_path.startswith('inputs/'):
                 source_file = client_inputs_dir / input_path.replace('inputs/', '')
                 if source_file.exists():
                     dest_file = archive_inputs_dir / source_file.name
-                    shutil.copy2(source_file, dest_file)
-                    print(f"   📁 Archived: {input_path}")
+                    try:
+                        digest, method = self.blob_store.archive(source_file, dest_file)
+                    except OSError as e:
+                        print(f"Warning: Blob store unavailable for {input_path} ({e}) - copying")
+                        shutil.copy2(source_file, dest_file)
+                        digest, method = hash_file(dest_file), 'copied'
+                    self._record_output(dest_file, dest_file.stat().st_size, digest)
+                    print(f"   📁 Archived: {input_path} ({method})")
                     
-    def _save_stage_results(self, stage, stage_num: int, result: Dict):
+    def _save_stage_results(self, stage, stage_num: int, result: Dict) -> Path:
         """Save stage execution results"""
         
         stage_file = self.output_dir / 'artifacts' / f'stage_{stage_num}_{stage.name.lower().replace(" ", "_")}.json'
+        return self._write_output(stage_file, json.dumps(result, indent=2, default=str), stage_num)
+            
+    def _index_run(self, workflow: WorkflowDefinition, status: str, correlations: int, error: Optional[str]):
+        """Record the run and its per-stage durations in the run index"""
         
-        with open(stage_file, 'w') as f:
-            json.dump(result, f, indent=2, default=str)
+        if not self.record_history:
+            return
+            
+        recorded = self.manifest.data.get('stages', {}) if self.manifest else {}
+        stages = []
+        for stage_num, stage in enumerate(workflow.stages, 1):
+            entry = recorded.get(str(stage_num), {})
+            stages.append({
+                'stage_num': stage_num,
+                'name': stage.name,
+                'status': entry.get('status', 'skipped'),
+                'duration': entry.get('duration'),
+                'attempts': entry.get('attempts'),
+                'cached': entry.get('cached', False),
+                'artifact': entry.get('artifact')
+            })
+            
+        try:
+            self.run_index.record_run(self.output_dir, workflow.name, workflow.client_slug, status,
+                                      self.execution_start_time, self.clock.time(), stages,
+                                      total_stages=len(workflow.stages), correlations=correlations, error=error)
+        except Exception as e:
+            print(f"Warning: Could not update run index: {e}")
+            
+    def _export_trace(self, workflow: WorkflowDefinition, run_start: float):
+        """Write the run's spans as trace.jsonl and a Chrome trace_event file"""
+        
+        self.tracer.record(workflow.name, 'workflow', run_start, self.clock.time(), client_slug=workflow.client_slug)
+        
+        try:
+            for trace_file in self.tracer.export(self.output_dir):
+                self._record_output(trace_file, trace_file.stat().st_size, hash_file(trace_file))
+        except OSError as e:
+            print(f"Warning: Could not write execution trace: {e}")
+            
+        # Last write of the run - persist the file list
+        if self.manifest:
+            self.manifest.save()
             
-    def _generate_final_reports(self, workflow: WorkflowDefinition, correlations: List[Dict]):
+    def _save_partial_results(self, stage, stage_num: int, reason: str):
+        """Flush the partial output of a timed-out or cancelled stage"""
+        
+        partial = dict(self._live_results.get(stage_num, {'stage_num': stage_num}))
+        partial.update({'success': False, 'partial': True, 'status': reason})
+        
+        stage_file = self.output_dir / 'artifacts' / f'stage_{stage_num}_{stage.name.lower().replace(" ", "_")}.partial.json'
+        self._write_output(stage_file, json.dumps(partial, indent=2, default=str), stage_num)
+        
+        print(f"   💾 Partial output of Stage {stage_num} saved ({reason})")
+        
+    def _generate_final_reports(self, workflow: WorkflowDefinition, correlations: List[Dict],
+                                stages_completed: int, success: bool):
         """Generate final workflow reports"""
         
         print(f"\n📊 Generating final reports...")
@@ -451,25 +1046,26 @@ class WorkflowExecutor:
         summary = {
             'workflow_name': workflow.name,
             'execution_completed': datetime.now().isoformat(),
-            'total_execution_time': time.time() - self.execution_start_time,
-            'stages_completed': len(workflow.stages),
+            'total_execution_time': self.clock.time() - self.execution_start_time,
+            'stages_completed': stages_completed,
+            'total_stages': len(workflow.stages),
             'correlations_discovered': len(correlations),
             'correlations': correlations,
-            'output_files': self._list_output_files(),
+            'output_files': list(self.manifest.files) if self.manifest else [],
             'client_slug': workflow.client_slug,
-            'success': True
+            'time_by_category': self.tracer.summary(),
+            'mcp_hedging': self._hedging_summary(),
+            'success': success
         }
         
-        summary_file = self.output_dir / 'execution_summary.json'
-        with open(summary_file, 'w') as f:
-            json.dump(summary, f, indent=2, default=str)
-            
+        self._write_output(self.output_dir / 'execution_summary.json', json.dumps(summary, indent=2, default=str))
+        
         # Generate HTML summary report
         self._generate_html_summary(workflow, summary)
         
         print(f"   ✅ Reports generated in: {self.output_dir}")
         
-    def _create_mock_outputs(self, workflow: WorkflowDefinition):
+    def _create_mock_outputs(self, workflow: WorkflowDefinition, stage_num: Optional[int] = None):
         """Create mock output files for demonstration"""
         
         reports_dir = self.output_dir / 'reports'
@@ -506,18 +1102,16 @@ class WorkflowExecutor:
 </body>
 </html>"""
         
-        with open(reports_dir / f'{workflow.name}_dashboard.html', 'w') as f:
-            f.write(dashboard_content)
-            
+        self._write_output(reports_dir / f'{workflow.name}_dashboard.html', dashboard_content, stage_num)
+        
         # Create mock Excel data file (as text for now)
         excel_content = """Workflow,Stage,Metric,Value
 {},Data Collection,Records,1250
 {},Analysis,Correlations,2
 {},Reporting,Charts,8""".format(workflow.name, workflow.name, workflow.name)
         
-        with open(reports_dir / f'{workflow.name}_data.csv', 'w') as f:
-            f.write(excel_content)
-            
+        self._write_output(reports_dir / f'{workflow.name}_data.csv', excel_content, stage_num)
+        
     def _generate_html_summary(self, workflow: WorkflowDefinition, summary: Dict):
         """Generate HTML execution summary"""
         
@@ -575,37 +1169,35 @@ class WorkflowExecutor:
 </body>
 </html>"""
         
-        with open(self.output_dir / 'workflow_summary.html', 'w') as f:
-            f.write(html_content)
-            
-    def _list_output_files(self) -> List[str]:
-        """List all files created during workflow execution"""
+        self._write_output(self.output_dir / 'workflow_summary.html', html_content)
         
-        files = []
+    def _write_output(self, path: Path, content: str, stage_num: Optional[int] = None) -> Path:
+        """Write a file into the run directory and register it in the run manifest"""
         
-        for root, dirs, filenames in os.walk(self.output_dir):
-            for filename in filenames:
-                file_path = Path(root) / filename
-                rel_path = file_path.relative_to(self.output_dir)
-                files.append(str(rel_path))
-                
-        return files
+        data = content.encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(data)
+        self._record_output(path, len(data), hashlib.sha256(data).hexdigest(), stage_num)
+        return path
         
-    def _estimate_stage_time(self, stage) -> float:
-        """Estimate execution time for a stage in minutes"""
+    def _record_output(self, path: Path, size: int, sha256: str, stage_num: Optional[int] = None):
+        """Track a run directory file so reports, resume and retention never need to walk the tree"""
         
-        base_time = 5  # Base time per stage in minutes
+        relative_path = str(Path(path).relative_to(self.output_dir))
+        if self.manifest:
+            self.manifest.record_file(relative_path, size, sha256, stage_num)
+        else:
+            self._pending_files[relative_path] = (size, sha256)
+        self.events.emit('artifact_written', path=relative_path, bytes=size, stage=stage_num)
         
-        # Adjust based on stage complexity
-        if len(stage.recommended_agents) > 1:
-            base_time += 2
+    def _run_label(self) -> str:
+        """Run identifier in events: the run directory relative to the reports base directory"""
         
-        if len(stage.suggested_mcps) > 2:
-            base_time += 3
-            
-        if 'comprehensive' in stage.description.lower():
-            base_time *= 1.5
-        elif 'quick' in stage.description.lower():
-            base_time *= 0.5
-            
-        return base_time
\ No newline at end of file
+        try:
+            return str(self.output_dir.relative_to(self.reports_dir))
+        except ValueError:
+            return str(self.output_dir)
+        
+    def _estimate_stage_time(self, stage) -> float:
+        """Estimate execution time for a stage in minutes"""
+        return DurationEstimator(self.duration_history).estimate(stage)['p50'] / 60
\ No newline at end of file
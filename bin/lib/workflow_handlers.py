@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Stage Handler Registry
+Maps stage types to handler callables, including template commands loaded on first use.
+"""
+
+import threading
+import importlib.util
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any, Callable, Tuple
+
+from workflow_cancellation import CancellationToken
+from workflow_artifacts import ArtifactWriter, artifact_filename
+
+@dataclass
+class StageContext:
+    """Everything a handler gets to see about the stage it runs"""
+    stage: Any
+    stage_num: int
+    workflow: Any
+    token: CancellationToken
+    partial: Dict[str, Any]
+    output_dir: Optional[Path] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    artifact_compression: Optional[str] = None
+    streams: List[ArtifactWriter] = field(default_factory=list)
+    files: List[Path] = field(default_factory=list)
+    mcp_caller: Optional[Callable] = None
+    
+    def open_artifact(self, name: str = 'records', compression: Optional[str] = 'default',
+                      batch_size: int = 1000) -> ArtifactWriter:
+        """Streaming NDJSON artifact in the run's artifacts/ directory; the executor closes it
+        
+        Handlers append records as they produce them instead of returning them
+        in the result dict. Row counts and sizes end up in the run manifest.
+        """
+        
+        if self.output_dir is None:
+            raise ValueError("Stage has no output directory to write artifacts to")
+        if compression == 'default':
+            compression = self.artifact_compression
+            
+        slug = self.stage.name.lower().replace(' ', '_')
+        path = self.output_dir / 'artifacts' / artifact_filename(f'stage_{self.stage_num}_{slug}.{name}', compression)
+        writer = ArtifactWriter(path, compression, batch_size)
+        self.streams.append(writer)
+        return writer
+        
+    def call_mcp(self, mcp_name: str, call: Callable[[CancellationToken], Any]) -> Any:
+        """Make an MCP call within that MCP's rate limits, hedged if the MCP opts in
+        
+        `call(token)` gets the token of its own attempt and may run twice at once.
+        """
+        
+        if self.mcp_caller is None:
+            return call(self.token)
+        return self.mcp_caller(mcp_name, call, self.token, self.partial.get('metrics'))
+        
+    def record_file(self, path: Path):
+        """Tell the executor about a file the handler wrote into the run directory"""
+        self.files.append(Path(path))
+        
+    def close_streams(self) -> List[Dict[str, Any]]:
+        """Close every artifact the handler opened; stats use paths relative to the run directory"""
+        
+        stats = []
+        for writer in self.streams:
+            entry = writer.close()
+            entry['path'] = str(Path(entry['path']).relative_to(self.output_dir))
+            stats.append(entry)
+        return stats
+
+StageHandler = Callable[[StageContext, Dict[str, Any]], Dict[str, Any]]
+
+def load_command(name: str, path: Path) -> Callable[[Any, Dict[str, Any]], Any]:
+    """Import a template command module ('<template>/<command>') and return its execute(context, config)"""
+    
+    module_name = 'ccc_template_' + name.replace('/', '_')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    
+    execute = getattr(module, 'execute', None)
+    if not callable(execute):
+        raise KeyError(f"Template command {path} has no execute(context, config) function")
+    return execute
+
+class CommandCache:
+    """Template commands imported once and shared between registries (e.g. every daemon job)
+
+    A command is imported again only when its file changes.
+    """
+    
+    def __init__(self):
+        self._loaded: Dict[str, Tuple[float, Callable]] = {}
+        self._lock = threading.Lock()
+        
+    def load(self, name: str, path: Path) -> Callable[[Any, Dict[str, Any]], Any]:
+        mtime = path.stat().st_mtime
+        with self._lock:
+            cached = self._loaded.get(name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+                
+        execute = load_command(name, path)
+        with self._lock:
+            self._loaded[name] = (mtime, execute)
+        return execute
+        
+# Handler types the executor registers itself
+BUILTIN_HANDLERS = ('data_collection', 'anomaly_detection', 'analysis', 'report', 'generic')
+
+class HandlerRegistry:
+    """Single extension point for stage work
+
+    Built-in handlers are registered under a type name with the stage-name
+    keywords that select them. Template commands (templates/<template>/commands/<name>.py
+    exposing execute(context, config)) are found by file name only and imported
+    the first time a stage asks for them, e.g. `**Handler**: seo/keyword_research`.
+    """
+    
+    def __init__(self, templates_dir: Optional[Path] = None, command_cache: Optional[CommandCache] = None):
+        self.templates_dir = Path(templates_dir) if templates_dir else Path(__file__).parent.parent.parent / 'templates'
+        self.command_cache = command_cache  # imports shared with other registries; None = import per registry
+        self._handlers: Dict[str, StageHandler] = {}
+        self._keywords: List[Tuple[str, str]] = []  # (stage name keyword, handler type) in match order
+        self._default: Optional[str] = None
+        self._commands: Optional[Dict[str, Path]] = None
+        self._lock = threading.Lock()
+        
+    def register(self, handler_type: str, handler: StageHandler, keywords: Optional[List[str]] = None,
+                 default: bool = False):
+        """Register a handler; `keywords` select it from the stage name when no handler is declared"""
+        
+        self._handlers[handler_type] = handler
+        for keyword in keywords or []:
+            self._keywords.append((keyword.lower(), handler_type))
+        if default:
+            self._default = handler_type
+            
+    def command_modules(self) -> Dict[str, Path]:
+        """Template command files by handler name ('<template>/<command>'), without importing them"""
+        
+        with self._lock:
+            if self._commands is None:
+                self._commands = {}
+                if self.templates_dir.exists():
+                    for path in sorted(self.templates_dir.glob('*/commands/*.py')):
+                        if path.stem != '__init__':
+                            self._commands[f'{path.parent.parent.name}/{path.stem}'] = path
+            return dict(self._commands)
+            
+    def available(self) -> List[str]:
+        """All handler names a stage may declare"""
+        return sorted(set(self._handlers) | set(BUILTIN_HANDLERS) | set(self.command_modules()))
+        
+    def is_known(self, name: str) -> bool:
+        """True if a declared handler name resolves to something (no imports)"""
+        return self._canonical(name) in self.available()
+        
+    def handler_name(self, stage) -> str:
+        """Handler type a stage resolves to (declared, then by stage name keyword, then the default)"""
+        
+        declared = getattr(stage, 'handler', None)
+        if declared:
+            return self._canonical(declared)
+            
+        stage_name = stage.name.lower()
+        for keyword, handler_type in self._keywords:
+            if keyword in stage_name:
+                return handler_type
+                
+        if self._default is None:
+            raise KeyError(f"No handler matches stage '{stage.name}'")
+        return self._default
+        
+    def resolve(self, stage) -> StageHandler:
+        """Handler callable for a stage, importing a template command on first use"""
+        
+        name = self.handler_name(stage)
+        
+        with self._lock:
+            if name in self._handlers:
+                return self._handlers[name]
+                
+        commands = self.command_modules()
+        if name not in commands:
+            raise KeyError(f"Unknown stage handler '{name}' for stage '{stage.name}'")
+            
+        handler = self._load_command(name, commands[name])
+        with self._lock:
+            return self._handlers.setdefault(name, handler)
+            
+    def _canonical(self, name: str) -> str:
+        """Accept 'keyword_research' for 'seo/keyword_research' when the command name is unique"""
+        
+        if name in self._handlers or '/' in name:
+            return name
+            
+        matches = [key for key in self.command_modules() if key.split('/', 1)[1] == name]
+        return matches[0] if len(matches) == 1 else name
+        
+    def _load_command(self, name: str, path: Path) -> StageHandler:
+        """Import a template command module and wrap its execute function as a stage handler"""
+        
+        execute = self.command_cache.load(name, path) if self.command_cache else load_command(name, path)
+        
+        def run_command(context: StageContext, config: Dict[str, Any]) -> Dict[str, Any]:
+            # Template commands return free-form data; keep it under 'data' in the stage result
+            output = execute(context, config)
+            return {'handler': name, 'data': output, 'outputs': [f"{name.replace('/', '_')}.json"]}
+            
+        return run_command
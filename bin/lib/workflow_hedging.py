@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+MCP Request Hedging
+Duplicate slow MCP calls once they pass their learned tail latency and keep whichever answers first.
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+from pathlib import Path
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from workflow_cancellation import CancellationToken, StageCancelled
+from workflow_estimator import percentile
+
+LATENCY_FILE = '.mcp-latency.json'
+LATENCY_WINDOW = 500  # most recent call latencies kept per MCP
+HEDGE_POLL_SECONDS = 0.05
+
+@dataclass
+class HedgePolicy:
+    """Hedging settings of one MCP ([mcps.<name>] hedge = true)"""
+    percentile: float = 95.0
+    min_samples: int = 20
+    max_ratio: float = 0.1
+    after: Optional[float] = None  # fixed hedge delay in seconds instead of the learned percentile
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['HedgePolicy']:
+        """Policy from an MCP's config section; None unless the MCP opts in"""
+        
+        if not config.get('hedge'):
+            return None
+        after = config.get('hedge_after_ms')
+        return cls(
+            percentile=float(config.get('hedge_percentile', 95)),
+            min_samples=int(config.get('hedge_min_samples', 20)),
+            max_ratio=float(config.get('hedge_max_ratio', 0.1)),
+            after=float(after) / 1000.0 if after is not None else None
+        )
+
+class LatencyTracker:
+    """Recent latencies of MCP calls, persisted across runs as <reports_base_dir>/.mcp-latency.json
+
+    Samples are the latency the call would have had without hedging: when
+    a hedge wins, the primary's elapsed time at that moment stands in (a
+    lower bound), so hedging never hides the tail it is meant to cut.
+    Processes sharing the file overwrite each other's windows; the last
+    run to finish wins, which is fine for a rolling estimate.
+    """
+    
+    def __init__(self, path: Optional[Path] = None, window: int = LATENCY_WINDOW):
+        self.path = Path(path) if path else None
+        self.window = window
+        self._samples: Optional[Dict[str, Deque[float]]] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        
+    @classmethod
+    def from_config(cls, storage_config: Dict[str, Any]) -> 'LatencyTracker':
+        """Build the tracker from the storage configuration section"""
+        
+        path = storage_config.get('mcp_latency_file') or Path(storage_config['reports_base_dir']) / LATENCY_FILE
+        return cls(Path(path))
+        
+    def _load(self) -> Dict[str, Deque[float]]:
+        if self._samples is None:
+            stored = {}
+            if self.path is not None and self.path.exists():
+                try:
+                    with open(self.path) as f:
+                        stored = json.load(f)
+                except (IOError, ValueError) as e:
+                    print(f"Warning: Could not read MCP latency history: {e}")
+            self._samples = {mcp: deque((float(s) for s in samples), maxlen=self.window)
+                             for mcp, samples in stored.items() if isinstance(samples, list)}
+        return self._samples
+        
+    def record(self, mcp_name: str, seconds: float):
+        with self._lock:
+            samples = self._load()
+            samples.setdefault(mcp_name, deque(maxlen=self.window)).append(round(seconds, 4))
+            self._dirty = True
+            
+    def samples(self, mcp_name: str) -> List[float]:
+        with self._lock:
+            return list(self._load().get(mcp_name, ()))
+            
+    def percentile(self, mcp_name: str, pct: float, min_samples: int = 1) -> Optional[float]:
+        """Latency percentile of an MCP; None until it has min_samples calls on record"""
+        
+        samples = self.samples(mcp_name)
+        if len(samples) < max(1, min_samples):
+            return None
+        return percentile(samples, pct)
+        
+    def save(self):
+        """Write the windows back (only if calls were recorded since the last save)"""
+        
+        with self._lock:
+            if not self._dirty or self.path is None:
+                return
+            snapshot = {mcp: list(samples) for mcp, samples in self._samples.items()}
+            self._dirty = False
+            
+        tmp_path = self.path.with_name(f'{LATENCY_FILE}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            print(f"Warning: Could not save MCP latency history: {e}")
+
+class MCPHedger:
+    """Runs MCP calls within their rate limits, hedging the slow ones of MCPs that opt in
+
+    A hedged call starts as usual. If it has not returned by the MCP's
+    learned p95 latency (or its fixed hedge_after_ms), one duplicate is
+    issued, the first successful answer is returned and the other attempt's
+    token is cancelled. The duplicate only goes out if a concurrency slot and
+    a request token are free at that moment, so hedges never queue behind or
+    exceed the MCP's limits, and at most hedge_max_ratio of its calls are
+    hedged. `call(attempt_token)` must therefore be safe to run twice.
+    """
+    
+    def __init__(self, rate_limiter, latency: Optional[LatencyTracker] = None):
+        self.rate_limiter = rate_limiter
+        self.latency = latency or LatencyTracker()
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._policies: Dict[str, Optional[HedgePolicy]] = {}
+        self._lock = threading.Lock()
+        
+    def policy(self, mcp_name: str) -> Optional[HedgePolicy]:
+        """Hedging policy of an MCP (None = not hedged)"""
+        
+        with self._lock:
+            if mcp_name not in self._policies:
+                self._policies[mcp_name] = HedgePolicy.from_config(self.rate_limiter.config_for(mcp_name))
+            return self._policies[mcp_name]
+            
+    def hedge_delay(self, mcp_name: str) -> Optional[float]:
+        """Seconds after which a call is hedged; None when the MCP is not hedged (yet)"""
+        
+        policy = self.policy(mcp_name)
+        if policy is None:
+            return None
+        if policy.after is not None:
+            return policy.after
+        return self.latency.percentile(mcp_name, policy.percentile, policy.min_samples)
+        
+    def call(self, mcp_name: str, call: Callable[[CancellationToken], Any], token: CancellationToken,
+             outcome: Optional[Dict[str, Any]] = None) -> Any:
+        """Make one MCP call; `outcome` receives limit_wait, hedged and hedge_won"""
+        
+        outcome = outcome if outcome is not None else {}
+        outcome.update({'hedged': False, 'hedge_won': False})
+        policy = self.policy(mcp_name)
+        delay = self.hedge_delay(mcp_name)
+        
+        waited = time.monotonic()
+        limit = self.rate_limiter.acquire(mcp_name, token)
+        outcome['limit_wait'] = time.monotonic() - waited  # set once the call is really under way
+        if policy is not None:
+            self._count(mcp_name, 'calls')
+            
+        if delay is None:
+            started = time.monotonic()
+            try:
+                value = call(token)
+            finally:
+                limit.release_slot()
+            if policy is not None:
+                self.latency.record(mcp_name, time.monotonic() - started)
+            return value
+            
+        return self._hedged(mcp_name, call, token, limit, delay, policy, outcome)
+        
+    def _hedged(self, mcp_name: str, call, token: CancellationToken, limit, delay: float,
+                policy: HedgePolicy, outcome: Dict[str, Any]) -> Any:
+        results: queue.Queue = queue.Queue()
+        attempts: List[CancellationToken] = []
+        primary_started = time.monotonic()
+        
+        def launch(attempt_limit):
+            attempt, attempt_token = len(attempts), token.child()
+            attempts.append(attempt_token)
+            
+            def run():
+                try:
+                    results.put((attempt, True, call(attempt_token)))
+                except BaseException as e:
+                    results.put((attempt, False, e))
+                finally:
+                    attempt_limit.release_slot()
+                    
+            threading.Thread(target=run, name=f'mcp-{mcp_name}-{attempt}', daemon=True).start()
+            
+        launch(limit)
+        hedge_at: Optional[float] = primary_started + delay
+        errors: List[BaseException] = []
+        
+        while True:
+            wait = HEDGE_POLL_SECONDS if hedge_at is None else min(HEDGE_POLL_SECONDS, hedge_at - time.monotonic())
+            try:
+                attempt, ok, value = results.get(timeout=max(0.0, wait))
+            except queue.Empty:
+                if token.cancelled:
+                    raise StageCancelled(token.reason)
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    hedge_limit = self.rate_limiter.try_acquire(mcp_name) if self._may_hedge(mcp_name, policy) else None
+                    if hedge_limit is None:
+                        self._count(mcp_name, 'hedge_skipped')
+                    else:
+                        self._count(mcp_name, 'hedged')
+                        outcome['hedged'] = True
+                        launch(hedge_limit)
+                continue
+                
+            if not ok:
+                errors.append(value)
+                # A primary failing before the hedge delay is the retry policy's business, not a reason to hedge
+                if hedge_at is not None or len(errors) == len(attempts):
+                    raise errors[0]
+                continue
+                
+            for other, attempt_token in enumerate(attempts):
+                if other != attempt:
+                    attempt_token.cancel('hedge lost')
+            self.latency.record(mcp_name, time.monotonic() - primary_started)
+            if attempt:
+                self._count(mcp_name, 'hedge_wins')
+                outcome['hedge_won'] = True
+            return value
+            
+    def _may_hedge(self, mcp_name: str, policy: HedgePolicy) -> bool:
+        with self._lock:
+            stats = self.stats.get(mcp_name, {})
+            return stats.get('hedged', 0) < policy.max_ratio * stats.get('calls', 0)
+            
+    def _count(self, mcp_name: str, key: str):
+        with self._lock:
+            stats = self.stats.setdefault(mcp_name, {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'hedge_skipped': 0})
+            stats[key] += 1
+            
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-MCP hedging counters with hedge and win rates"""
+        
+        with self._lock:
+            return {mcp: hedge_rates(stats) for mcp, stats in self.stats.items()}
+
+def hedge_rates(stats: Dict[str, int]) -> Dict[str, Any]:
+    """Counters plus hedge_rate (hedged / calls) and win_rate (hedge wins / hedged)"""
+    
+    calls, hedged = stats.get('calls', 0), stats.get('hedged', 0)
+    return {
+        **stats,
+        'hedge_rate': round(hedged / calls, 4) if calls else 0.0,
+        'win_rate': round(stats.get('hedge_wins', 0) / hedged, 4) if hedged else 0.0
+    }
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Run History Index
+Embedded SQLite index of workflow runs and stage durations for listing, querying and comparison.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Any
+
+from workflow_manifest import MANIFEST_FILE
+
+RUN_INDEX_FILE = '.run-index.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_dir TEXT NOT NULL,
+    created TEXT NOT NULL DEFAULT '',
+    workflow_name TEXT NOT NULL,
+    client_slug TEXT NOT NULL DEFAULT '',
+    started REAL,
+    finished REAL,
+    duration REAL,
+    status TEXT NOT NULL,
+    stages_completed INTEGER NOT NULL DEFAULT 0,
+    total_stages INTEGER NOT NULL DEFAULT 0,
+    correlations INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    indexed_mtime REAL,
+    archive TEXT,
+    archive_bytes INTEGER,
+    UNIQUE (run_dir, created)
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    stage_num INTEGER NOT NULL,
+    stage_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL,
+    attempts INTEGER,
+    cached INTEGER NOT NULL DEFAULT 0,
+    artifact TEXT,
+    PRIMARY KEY (run_id, stage_num)
+);
+CREATE INDEX IF NOT EXISTS runs_workflow ON runs (workflow_name, started);
+CREATE INDEX IF NOT EXISTS runs_client ON runs (client_slug, started);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE INDEX IF NOT EXISTS stages_name ON stages (stage_name);
+CREATE TABLE IF NOT EXISTS scanned_dirs (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archived_inputs (
+    run_dir TEXT NOT NULL,
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (run_dir, path)
+);
+"""
+
+# Columns added after the first release of the index
+_MIGRATIONS = {
+    'archive': 'ALTER TABLE runs ADD COLUMN archive TEXT',
+    'archive_bytes': 'ALTER TABLE runs ADD COLUMN archive_bytes INTEGER'
+}
+
+class RunIndex:
+    """SQLite index of runs; the run directories stay the source of truth"""
+    
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(runs)')}
+        with conn:
+            for column, statement in _MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+        
+    @classmethod
+    def from_config(cls, storage_config: Dict) -> 'RunIndex':
+        """Build the index from the storage configuration section"""
+        
+        path = storage_config.get('history_db') or Path(storage_config['reports_base_dir']) / RUN_INDEX_FILE
+        return cls(Path(path))
+        
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+        
+    def record_run(self, run_dir: Path, workflow_name: str, client_slug: Optional[str], status: str,
+                   started: Optional[float], finished: Optional[float], stages: List[Dict[str, Any]],
+                   total_stages: int, correlations: int = 0, error: Optional[str] = None) -> int:
+        """Insert a run with its stages, replacing an earlier row of the same run
+
+        Same-day runs share a directory, so a run is identified by its directory
+        plus the manifest's creation time; a resumed run keeps both and replaces
+        its previous row.
+        """
+        
+        conn = self._connection()
+        run_dir = str(Path(run_dir))
+        manifest = _read_json(Path(run_dir) / MANIFEST_FILE)
+        created = manifest.get('created', '')
+        indexed_mtime = (Path(run_dir) / MANIFEST_FILE).stat().st_mtime if manifest else None
+        completed = sum(1 for stage in stages if stage['status'] == 'completed')
+        
+        with conn:
+            conn.execute('DELETE FROM runs WHERE run_dir = ? AND created = ?', (run_dir, created))
+            cursor = conn.execute(
+                """INSERT INTO runs (run_dir, created, workflow_name, client_slug, started, finished, duration, status,
+                                     stages_completed, total_stages, correlations, error, indexed_mtime)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (run_dir, created, workflow_name, client_slug or '', started, finished,
+                 (finished - started) if started and finished else None, status,
+                 completed, total_stages, correlations, error, indexed_mtime)
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                """INSERT INTO stages (run_id, stage_num, stage_name, status, duration, attempts, cached, artifact)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(run_id, stage['stage_num'], stage['name'], stage['status'], stage.get('duration'),
+                  stage.get('attempts'), int(bool(stage.get('cached'))), stage.get('artifact'))
+                 for stage in stages]
+            )
+        return run_id
+        
+    def runs(self, workflow_name: Optional[str] = None, client_slug: Optional[str] = None,
+             status: Optional[str] = None, since_days: Optional[float] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent runs first"""
+        
+        where, params = self._filters(workflow_name, client_slug, status, since_days)
+        rows = self._connection().execute(
+            f'SELECT * FROM runs {where} ORDER BY started DESC LIMIT ?', params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+        
+    def run(self, run_id: int) -> Optional[Dict[str, Any]]:
+        """One run with its stages"""
+        
+        conn = self._connection()
+        row = conn.execute('SELECT * FROM runs WHERE id = ?', (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = dict(row)
+        run['stages'] = [dict(s) for s in conn.execute(
+            'SELECT * FROM stages WHERE run_id = ? ORDER BY stage_num', (run_id,)).fetchall()]
+        return run
+        
+    def slowest_stages(self, workflow_name: Optional[str] = None, client_slug: Optional[str] = None,
+                       last_runs: int = 30, limit: int = 10) -> List[Dict[str, Any]]:
+        """Stage names ranked by mean duration over the most recent matching runs (cache hits excluded)"""
+        
+        where, params = self._filters(workflow_name, client_slug, None, None)
+        rows = self._connection().execute(f"""
+            WITH recent AS (SELECT id FROM runs {where} ORDER BY started DESC LIMIT ?)
+            SELECT s.stage_name, COUNT(*) AS runs, AVG(s.duration) AS mean_duration,
+                   MAX(s.duration) AS max_duration, MIN(s.duration) AS min_duration,
+                   SUM(CASE WHEN s.status != 'completed' THEN 1 ELSE 0 END) AS failures
+            FROM stages s JOIN recent r ON s.run_id = r.id
+            WHERE s.cached = 0 AND s.duration IS NOT NULL
+            GROUP BY s.stage_name
+            ORDER BY mean_duration DESC
+            LIMIT ?
+        """, params + [last_runs, limit]).fetchall()
+        return [dict(row) for row in rows]
+        
+    def latest_run_ids(self, workflow_name: str, client_slug: Optional[str] = None, count: int = 2) -> List[int]:
+        where, params = self._filters(workflow_name, client_slug, None, None)
+        rows = self._connection().execute(
+            f'SELECT id FROM runs {where} ORDER BY started DESC LIMIT ?', params + [count]).fetchall()
+        return [row['id'] for row in rows]
+        
+    def compare(self, run_a: int, run_b: int) -> Optional[Dict[str, Any]]:
+        """Stage-by-stage duration and status differences between two runs (b relative to a)"""
+        
+        first, second = self.run(run_a), self.run(run_b)
+        if first is None or second is None:
+            return None
+            
+        by_name_a = {s['stage_name']: s for s in first['stages']}
+        by_name_b = {s['stage_name']: s for s in second['stages']}
+        names = list(by_name_a) + [n for n in by_name_b if n not in by_name_a]
+        
+        stages = []
+        for name in names:
+            a, b = by_name_a.get(name), by_name_b.get(name)
+            a_duration = a['duration'] if a else None
+            b_duration = b['duration'] if b else None
+            stages.append({
+                'stage_name': name,
+                'status_a': a['status'] if a else None,
+                'status_b': b['status'] if b else None,
+                'duration_a': a_duration,
+                'duration_b': b_duration,
+                'delta': (b_duration - a_duration) if a_duration is not None and b_duration is not None else None
+            })
+            
+        return {
+            'run_a': {k: v for k, v in first.items() if k != 'stages'},
+            'run_b': {k: v for k, v in second.items() if k != 'stages'},
+            'duration_delta': (second['duration'] or 0) - (first['duration'] or 0),
+            'stages': stages
+        }
+        
+    def reindex(self, reports_base_dir: Path, full: bool = False) -> int:
+        """Index run directories not yet indexed (or changed since); returns the number indexed
+
+        A client's reports directory is only listed again when its own mtime
+        changed (a run directory was added or removed), so repeated calls over a
+        large, mostly old tree cost one stat per client. Runs recorded by the
+        executor are indexed directly; `full` rescans every directory anyway.
+        """
+        
+        conn = self._connection()
+        known = {row['run_dir']: row['indexed_mtime']
+                 for row in conn.execute('SELECT run_dir, MAX(indexed_mtime) AS indexed_mtime FROM runs GROUP BY run_dir')}
+        scanned = {row['path']: row['mtime'] for row in conn.execute('SELECT path, mtime FROM scanned_dirs')}
+        indexed = 0
+        
+        # <reports_base_dir>/<client>/reports/<run>/manifest.json - scandir keeps this to one stat per run
+        base = Path(reports_base_dir)
+        for client_dir in _subdirs(base):
+            reports_dir = client_dir / 'reports'
+            try:
+                dir_mtime = reports_dir.stat().st_mtime
+            except OSError:
+                continue
+            if not full and scanned.get(str(reports_dir)) == dir_mtime:
+                continue
+                
+            for run_dir in _subdirs(reports_dir):
+                manifest_path = run_dir / MANIFEST_FILE
+                try:
+                    mtime = manifest_path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if known.get(str(run_dir)) == mtime:
+                    continue
+                if self._index_run_dir(run_dir, client_dir.name):
+                    indexed += 1
+                    
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO scanned_dirs (path, mtime) VALUES (?, ?)',
+                             (str(reports_dir), dir_mtime))
+                             
+        return indexed
+        
+    def clients(self) -> List[str]:
+        """Client slugs with indexed runs"""
+        return [row['client_slug'] for row in
+                self._connection().execute('SELECT DISTINCT client_slug FROM runs ORDER BY client_slug')]
+                
+    def run_dirs_before(self, client_slug: str, cutoff: float, unarchived_only: bool = False) -> List[Dict[str, Any]]:
+        """A client's run directories whose latest run started before `cutoff`, oldest first
+
+        Same-day runs share a directory, so age is decided by the newest run in it.
+        """
+        
+        rows = self._connection().execute(f"""
+            SELECT run_dir, MAX(started) AS last_started, MAX(archive) AS archive,
+                   MAX(archive_bytes) AS archive_bytes, COUNT(*) AS runs
+            FROM runs WHERE client_slug = ?
+            GROUP BY run_dir HAVING MAX(started) < ? {'AND MAX(archive) IS NULL' if unarchived_only else ''}
+            ORDER BY last_started
+        """, (client_slug, cutoff)).fetchall()
+        return [dict(row) for row in rows]
+        
+    def mark_archived(self, run_dir: Path, archive: Path, archive_bytes: int,
+                      inputs: Optional[Dict[str, str]] = None):
+        """Point every row of a run directory at the tarball that replaced it
+        
+        `inputs` maps the run's input paths to the blob digests the tarball
+        leaves out; those blobs are kept for as long as the run is.
+        """
+        
+        with self._connection() as conn:
+            conn.execute('UPDATE runs SET archive = ?, archive_bytes = ? WHERE run_dir = ?',
+                         (str(archive), archive_bytes, str(Path(run_dir))))
+            conn.executemany('INSERT OR REPLACE INTO archived_inputs (run_dir, path, digest) VALUES (?, ?, ?)',
+                             [(str(Path(run_dir)), path, digest) for path, digest in (inputs or {}).items()])
+                             
+    def archived_input_digests(self) -> Set[str]:
+        """Blob digests that compacted runs still refer to"""
+        return {row['digest'] for row in self._connection().execute('SELECT DISTINCT digest FROM archived_inputs')}
+        
+    def delete_run_dir(self, run_dir: Path):
+        """Forget every run recorded for a (deleted) run directory"""
+        
+        with self._connection() as conn:
+            conn.execute('DELETE FROM runs WHERE run_dir = ?', (str(Path(run_dir)),))
+            conn.execute('DELETE FROM archived_inputs WHERE run_dir = ?', (str(Path(run_dir)),))
+        
+    def _index_run_dir(self, run_dir: Path, client_slug: str) -> bool:
+        """Index one run directory from its manifest and execution summary"""
+        
+        manifest = _read_json(run_dir / MANIFEST_FILE)
+        if not manifest:
+            return False
+        summary = _read_json(run_dir / 'execution_summary.json')
+        
+        stages = []
+        for num, entry in sorted(manifest.get('stages', {}).items(), key=lambda item: int(item[0])):
+            stages.append({
+                'stage_num': int(num),
+                'name': entry.get('name', f'Stage {num}'),
+                'status': entry.get('status', 'unknown'),
+                'duration': entry.get('duration'),
+                'attempts': entry.get('attempts'),
+                'cached': entry.get('cached', False),
+                'artifact': entry.get('artifact')
+            })
+            
+        started = _timestamp(manifest.get('created'))
+        finished = _timestamp(manifest.get('updated'))
+        self.record_run(
+            run_dir, manifest.get('workflow_name', run_dir.name), manifest.get('client_slug') or client_slug,
+            manifest.get('status', 'unknown'), started, finished, stages,
+            total_stages=summary.get('total_stages', len(stages)),
+            correlations=summary.get('correlations_discovered', 0)
+        )
+        return True
+        
+    def _filters(self, workflow_name, client_slug, status, since_days):
+        clauses, params = [], []
+        if workflow_name:
+            clauses.append('workflow_name = ?')
+            params.append(workflow_name)
+        if client_slug:
+            clauses.append('client_slug = ?')
+            params.append(client_slug)
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if since_days:
+            clauses.append('started >= ?')
+            params.append((datetime.now() - timedelta(days=since_days)).timestamp())
+        return ('WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+def _subdirs(directory: Path) -> List[Path]:
+    try:
+        with os.scandir(directory) as entries:
+            return [Path(entry.path) for entry in entries if entry.is_dir() and not entry.name.startswith('.')]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, IOError):
+        return {}
+
+def _timestamp(iso_value: Optional[str]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(iso_value).timestamp() if iso_value else None
+    except ValueError:
+        return None
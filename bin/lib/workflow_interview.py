@@ -5,11 +5,14 @@ Conducts chat-based interviews to create detailed workflow specifications.
 """
 
 import re
+from types import SimpleNamespace
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 from datetime import datetime
 
 from workflow_parser import WorkflowDefinition
+from workflow_estimator import DurationHistory, DurationEstimator, simulate_makespan
+from workflow_scheduler import StageGraph
 
 @dataclass
 class InterviewResponse:
@@ -1071,6 +1074,18 @@ This workflow will generate a configuration file at:
         timeline = responses.get('timeline', 'standard')
         base_time_per_stage = {'immediate': 10, 'standard': 20, 'comprehensive': 40}
         
+        # Prefer recorded durations of similar stages over the fixed table
+        estimator = DurationEstimator(DurationHistory.from_config(self.config_manager.get_storage_config()))
+        estimates = {num: estimator.estimate(stage) for num, stage in enumerate(stages, 1)}
+        if estimates and all(e['source'] != 'heuristic' for e in estimates.values()):
+            # Same makespan as the dry run: stages overlap as far as their dependencies and the worker count allow
+            graph = StageGraph([SimpleNamespace(name=stage.get('name', ''), dependencies=stage.get('dependencies', []))
+                                for stage in stages])
+            workers = self.config_manager.get_execution_config().get('max_parallel_tasks', 3)
+            low = simulate_makespan(graph, {num: e['p50'] for num, e in estimates.items()}, workers) / 60
+            high = simulate_makespan(graph, {num: e['p90'] for num, e in estimates.items()}, workers) / 60
+            return f"{max(1, int(low))}-{max(1, int(round(high)))}"
+            
         base_time = len(stages) * base_time_per_stage.get(timeline, 20)
         
         # Adjust for parallelization
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Workflow Job Queue
+SQLite-backed queue of workflow runs shared by the CLI and the worker daemon.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+JOBS_DB_FILE = 'jobs.db'
+
+JOB_STATUSES = ('queued', 'running', 'completed', 'failed', 'cancelled')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workflow_name TEXT NOT NULL,
+    client_slug TEXT NOT NULL DEFAULT '',
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    options TEXT NOT NULL DEFAULT '{}',
+    submitted TEXT NOT NULL,
+    started TEXT,
+    finished TEXT,
+    worker_pid INTEGER,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority);
+CREATE INDEX IF NOT EXISTS jobs_client ON jobs (client_slug, status);
+"""
+
+def default_queue_dir(storage_config: Dict) -> Path:
+    """Directory holding the job database and daemon pid file"""
+    return Path(storage_config.get('daemon_dir') or Path(storage_config['reports_base_dir']) / '.daemon')
+
+class JobQueue:
+    """Priority job queue with per-client fairness
+
+    Claiming picks the highest priority first; within a priority the client
+    with the fewest running jobs wins, then the client served least recently,
+    then submission order. One busy client therefore cannot starve the rest.
+    Jobs for a workflow and client that already have a job running wait for
+    it: same-day runs share one run directory (manifest, journal, events).
+    """
+    
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+        
+    @classmethod
+    def from_config(cls, storage_config: Dict) -> 'JobQueue':
+        return cls(default_queue_dir(storage_config) / JOBS_DB_FILE)
+        
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; WAL lets the CLI read while the daemon writes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+        
+    def submit(self, workflow_name: str, client_slug: Optional[str] = None, priority: int = 0,
+               options: Optional[Dict[str, Any]] = None) -> int:
+        """Queue a workflow run; returns the job id"""
+        
+        cursor = self._connection().execute(
+            'INSERT INTO jobs (workflow_name, client_slug, priority, options, submitted) VALUES (?, ?, ?, ?, ?)',
+            (workflow_name, client_slug or '', int(priority), json.dumps(options or {}), datetime.now().isoformat())
+        )
+        return cursor.lastrowid
+        
+    def claim_next(self, worker_pid: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Atomically move the next fair job to 'running' and return it"""
+        
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("""
+                SELECT j.id FROM jobs j
+                LEFT JOIN (SELECT client_slug, COUNT(*) AS running FROM jobs
+                           WHERE status = 'running' GROUP BY client_slug) r ON r.client_slug = j.client_slug
+                LEFT JOIN (SELECT client_slug, MAX(started) AS last_started FROM jobs
+                           WHERE started IS NOT NULL GROUP BY client_slug) s ON s.client_slug = j.client_slug
+                WHERE j.status = 'queued'
+                  AND NOT EXISTS (SELECT 1 FROM jobs b WHERE b.status = 'running' AND b.client_slug = j.client_slug
+                                  AND b.workflow_name = j.workflow_name)
+                ORDER BY j.priority DESC, COALESCE(r.running, 0) ASC, COALESCE(s.last_started, '') ASC, j.id ASC
+                LIMIT 1
+            """).fetchone()
+            
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+                
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started = ?, worker_pid = ? WHERE id = ?",
+                (datetime.now().isoformat(), worker_pid or os.getpid(), row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+            
+        return self.get(row['id'])
+        
+    def finish(self, job_id: int, status: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None):
+        """Record a job's final status"""
+        
+        self._connection().execute(
+            'UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE id = ?',
+            (status, datetime.now().isoformat(), json.dumps(result, default=str) if result is not None else None,
+             error, job_id)
+        )
+        
+    def requeue(self, job_id: int, options: Optional[Dict[str, Any]] = None):
+        """Put a running job back in the queue (e.g. the daemon is shutting down)"""
+        
+        job = self.get(job_id)
+        merged = dict(job['options'] if job else {}, **(options or {}))
+        self._connection().execute(
+            "UPDATE jobs SET status = 'queued', started = NULL, worker_pid = NULL, options = ? WHERE id = ?",
+            (json.dumps(merged), job_id)
+        )
+        
+    def cancel(self, job_id: int) -> Optional[str]:
+        """Cancel a queued job outright or flag a running one; returns the job's resulting status"""
+        
+        conn = self._connection()
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+            (datetime.now().isoformat(), job_id)
+        )
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        
+        job = self.get(job_id)
+        return job['status'] if job else None
+        
+    def cancel_requested(self) -> List[int]:
+        """Running jobs the CLI has asked to cancel"""
+        rows = self._connection().execute(
+            "SELECT id FROM jobs WHERE status = 'running' AND cancel_requested = 1").fetchall()
+        return [row['id'] for row in rows]
+        
+    def recover_stale(self) -> List[int]:
+        """Requeue 'running' jobs whose worker process no longer exists"""
+        
+        stale = []
+        for row in self._connection().execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'").fetchall():
+            if not pid_alive(row['worker_pid']):
+                self.requeue(row['id'], {'resume': True})
+                stale.append(row['id'])
+        return stale
+        
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+        
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs first, optionally filtered by status"""
+        
+        if status:
+            rows = self._connection().execute(
+                'SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?', (status, limit)).fetchall()
+        else:
+            rows = self._connection().execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+        
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        rows = self._connection().execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+        
+    def _to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job['options'] = json.loads(job['options'] or '{}')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+def pid_alive(pid: Optional[int]) -> bool:
+    """Whether a process with this pid exists on this host"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
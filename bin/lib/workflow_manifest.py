@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Workflow Run Manifest
+Records stage checkpoints and input hashes so interrupted runs can be resumed.
+"""
+
+import os
+import re
+import json
+import socket
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+
+MANIFEST_FILE = 'manifest.json'
+JOURNAL_FILE = 'manifest.journal'
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's bytes, read in chunks"""
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_data(data: Any) -> str:
+    """SHA-256 of a JSON-serialisable value (key order independent)"""
+    encoded = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+def stage_fingerprint(stage) -> str:
+    """Hash of everything in a stage definition that affects its output"""
+    return hash_data({
+        'name': stage.name,
+        'description': stage.description,
+        'dependencies': stage.dependencies,
+        'agents': stage.recommended_agents,
+        'mcps': stage.suggested_mcps,
+        'timeout_seconds': stage.timeout_seconds,
+        'handler': stage.handler
+    })
+
+def hash_directory_files(directory: Path, hasher: Callable[[Path], str] = hash_file) -> Dict[str, str]:
+    """Hash every regular file directly inside a directory"""
+    
+    hashes = {}
+    if directory.exists():
+        for file_path in sorted(directory.iterdir()):
+            if file_path.is_file():
+                hashes[file_path.name] = hasher(file_path)
+    return hashes
+
+class RunManifest:
+    """Per-run manifest persisted as manifest.json in the output directory
+
+    Stage checkpoints are appended to manifest.journal as they happen rather
+    than rewriting manifest.json each time, which would make a run quadratic
+    in its stage count. Full saves (run start, resume, final status) fold the
+    journal into manifest.json; load() replays whatever is left after a crash.
+    """
+    
+    def __init__(self, output_dir: Path, data: Optional[Dict[str, Any]] = None):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / MANIFEST_FILE
+        self.journal_path = self.output_dir / JOURNAL_FILE
+        self.data = data or {}
+        self._unsaved_files: List[str] = []
+        self._lock = threading.Lock()
+        
+    @classmethod
+    def load(cls, output_dir: Path) -> Optional['RunManifest']:
+        """Load the manifest of an existing run, or None if there is none"""
+        
+        path = Path(output_dir) / MANIFEST_FILE
+        if not path.exists():
+            return None
+            
+        try:
+            with open(path, 'r') as f:
+                manifest = cls(output_dir, json.load(f))
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Warning: Could not load run manifest {path}: {e}")
+            return None
+            
+        manifest._replay_journal()
+        return manifest
+            
+    @classmethod
+    def create(cls, output_dir: Path, workflow, input_hashes: Dict[str, str]) -> 'RunManifest':
+        """Start a fresh manifest for a run"""
+        
+        manifest = cls(output_dir, {
+            'workflow_name': workflow.name,
+            'client_slug': workflow.client_slug,
+            'created': datetime.now().isoformat(),
+            'updated': datetime.now().isoformat(),
+            'status': 'running',
+            # Lets gc tell a live run from one whose process died without recording a final status
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'parameters_hash': hash_data(workflow.parameters),
+            'inputs': input_hashes,
+            'stages': {}
+        })
+        manifest.save()
+        return manifest
+        
+    def valid_checkpoints(self, workflow, graph, input_hashes: Dict[str, str]) -> Dict[int, Path]:
+        """Stage numbers whose checkpoints can be reused, mapped to their artifact files
+
+        A checkpoint is valid when the stage definition, workflow parameters and
+        input file hashes are unchanged, its artifact and streamed record files
+        still exist with their recorded sizes, and every stage it depends on is
+        itself valid.
+        """
+        
+        if self.data.get('parameters_hash') != hash_data(workflow.parameters):
+            return {}
+        if self.data.get('inputs', {}) != input_hashes:
+            return {}
+            
+        valid: Dict[int, Path] = {}
+        stages = self.data.get('stages', {})
+        
+        for num in graph.topological_order():
+            entry = stages.get(str(num))
+            if not entry or entry.get('status') != 'completed':
+                continue
+            if entry.get('fingerprint') != stage_fingerprint(workflow.stages[num - 1]):
+                continue
+            if not all(dep in valid for dep in graph.dependencies[num]):
+                continue
+                
+            artifact = entry.get('artifact')
+            if artifact and all(self._file_intact(path) for path in [artifact] + [s['path'] for s in entry.get('streams', [])]):
+                valid[num] = self.output_dir / artifact
+                
+        return valid
+        
+    def _file_intact(self, relative_path: str) -> bool:
+        """A recorded file still exists with its recorded size (one stat, no directory walk)"""
+        
+        try:
+            size = (self.output_dir / relative_path).stat().st_size
+        except OSError:
+            return False
+        recorded = self.data.get('files', {}).get(relative_path)
+        # Manifests written before files were tracked only know the artifact exists
+        return recorded is None or recorded['size'] == size
+        
+    def record_stage(self, stage_num: int, stage, status: str, artifact: Optional[Path] = None, **extra):
+        """Record a stage outcome and persist the manifest"""
+        
+        with self._lock:
+            entry = {
+                'name': stage.name,
+                'fingerprint': stage_fingerprint(stage),
+                'status': status,
+                'updated': datetime.now().isoformat()
+            }
+            if artifact is not None:
+                entry['artifact'] = str(Path(artifact).relative_to(self.output_dir))
+            entry.update(extra)
+            self.data.setdefault('stages', {})[str(stage_num)] = entry
+            
+            files = self.data.get('files', {})
+            record = {'stage': str(stage_num), 'entry': entry,
+                      'files': {path: files[path] for path in self._unsaved_files if path in files}}
+            with open(self.journal_path, 'a') as f:
+                f.write(json.dumps(record, default=str, separators=(',', ':')) + '\n')
+            self._unsaved_files = []
+            
+    def record_file(self, relative_path: str, size: int, sha256: str, stage_num: Optional[int] = None):
+        """Register a file written into the run directory (kept in memory until the next save)"""
+        
+        with self._lock:
+            self.data.setdefault('files', {})[relative_path] = {
+                'size': size,
+                'sha256': sha256,
+                'stage': stage_num,
+                'written': datetime.now().isoformat()
+            }
+            self._unsaved_files.append(relative_path)
+            
+    def stage(self, stage_num: int) -> Optional[Dict[str, Any]]:
+        """Recorded entry of a stage, if any"""
+        with self._lock:
+            entry = self.data.get('stages', {}).get(str(stage_num))
+            return dict(entry) if entry else None
+            
+    @property
+    def files(self) -> Dict[str, Dict[str, Any]]:
+        """Files written into the run directory, in write order"""
+        with self._lock:
+            return dict(self.data.get('files', {}))
+            
+    def reset_run(self, input_hashes: Dict[str, str], parameters: Dict[str, Any]):
+        """Mark a resumed run as running again with the current inputs"""
+        
+        with self._lock:
+            self.data['status'] = 'running'
+            self.data.update({'host': socket.gethostname(), 'pid': os.getpid()})
+            self.data['inputs'] = input_hashes
+            self.data['parameters_hash'] = hash_data(parameters)
+            self.data.setdefault('resumed', []).append(datetime.now().isoformat())
+            self._save_locked()
+            
+    def set_status(self, status: str):
+        """Record the final run status"""
+        with self._lock:
+            self.data['status'] = status
+            self._save_locked()
+            
+    def save(self):
+        """Persist the manifest atomically"""
+        with self._lock:
+            self._save_locked()
+            
+    def _save_locked(self):
+        self.data['updated'] = datetime.now().isoformat()
+        tmp_path = self.path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(self.data, indent=2, default=str))
+        os.replace(tmp_path, self.path)
+        # Everything journaled is now in manifest.json; replaying it again would be harmless
+        try:
+            os.unlink(self.journal_path)
+        except FileNotFoundError:
+            pass
+        self._unsaved_files = []
+        
+    def _replay_journal(self):
+        """Apply stage records journaled after the last full save"""
+        
+        try:
+            with open(self.journal_path, 'r') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+            
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break  # torn final line from an interrupted append
+            self.data.setdefault('stages', {})[record['stage']] = record['entry']
+            self.data.setdefault('files', {}).update(record.get('files', {}))
+
+def find_latest_run(client_reports_dir: Path, workflow_name: str) -> Optional[Path]:
+    """Most recently updated run directory of a workflow that has a manifest"""
+    
+    candidates: List[tuple] = []
+    run_pattern = re.compile(re.escape(workflow_name) + r'_\d{4}_\d{2}_\d{2}$')
+    
+    for run_dir in client_reports_dir.glob(f'{workflow_name}_*'):
+        manifest_path = run_dir / MANIFEST_FILE
+        if run_pattern.match(run_dir.name) and run_dir.is_dir() and manifest_path.exists():
+            candidates.append((manifest_path.stat().st_mtime, run_dir))
+            
+    if not candidates:
+        return None
+        
+    return max(candidates)[1]
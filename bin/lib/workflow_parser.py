@@ -8,7 +8,9 @@ import re
 import json
 from pathlib import Path
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from workflow_resources import parse_resources
 
 @dataclass
 class WorkflowStage:
@@ -23,6 +25,9 @@ class WorkflowStage:
     expected_outputs: List[str]
     expected_correlations: List[str]
     warnings: List[str]
+    timeout_seconds: Optional[int] = None
+    handler: Optional[str] = None
+    resources: Dict[str, float] = field(default_factory=dict)  # declared cpu / memory_mb / io footprint
 
 @dataclass
 class WorkflowDefinition:
@@ -287,6 +292,15 @@ class WorkflowParser:
                 elif line.startswith('**Success Criteria**:'):
                     # This might be followed by a list, handle it
                     current_stage.success_criteria.append(line.replace('**Success Criteria**:', '').strip())
+                elif line.startswith('**Timeout**:'):
+                    timeout_match = re.match(r'(\d+)\s*(s|sec|seconds?|m|min|minutes?)?$', line.replace('**Timeout**:', '').strip().lower())
+                    if timeout_match:
+                        multiplier = 60 if (timeout_match.group(2) or 's').startswith('m') else 1
+                        current_stage.timeout_seconds = int(timeout_match.group(1)) * multiplier
+                elif line.startswith('**Handler**:'):
+                    current_stage.handler = line.replace('**Handler**:', '').strip() or None
+                elif line.startswith('**Resources**:'):
+                    current_stage.resources = parse_resources(line.replace('**Resources**:', ''))
                 elif line.startswith('**Expected Correlations**:'):
                     correlations_text = line.replace('**Expected Correlations**:', '').strip()
                     current_stage.expected_correlations = [c.strip() for c in correlations_text.split(',') if c.strip()]
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+MCP Rate Limiting
+Per-MCP token buckets and concurrency caps shared by every stage of a run.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any
+
+from workflow_cancellation import CancellationToken, StageCancelled
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available right now"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+            
+    def acquire(self, token: Optional[CancellationToken] = None, tokens: float = 1.0):
+        """Block until tokens are available (cancellable)"""
+        
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_time = (tokens - self.tokens) / self.rate
+                
+            if token is not None:
+                token.sleep(wait_time)
+            else:
+                time.sleep(wait_time)
+
+class MCPLimit:
+    """Rate and concurrency limits for one MCP"""
+    
+    def __init__(self, name: str, rate_per_second: Optional[float] = None,
+                 burst: Optional[float] = None, max_concurrent: Optional[int] = None):
+        self.name = name
+        self.bucket = TokenBucket(rate_per_second, burst or rate_per_second) if rate_per_second else None
+        self.slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self.max_concurrent = max_concurrent
+        self.rate_per_second = rate_per_second
+        
+    def acquire_slot(self, token: Optional[CancellationToken] = None):
+        """Wait for a concurrency slot, checking for cancellation while waiting"""
+        
+        if self.slots is None:
+            return
+            
+        while not self.slots.acquire(timeout=0.1):
+            if token is not None and token.cancelled:
+                raise StageCancelled(token.reason)
+                
+    def release_slot(self):
+        if self.slots is not None:
+            self.slots.release()
+
+class MCPRateLimiter:
+    """Per-MCP limits declared under [mcps.<name>] in config.toml or the client YAML
+
+    Recognised keys: requests_per_second or requests_per_minute, burst, max_concurrent.
+    MCPs without limits are not throttled.
+    """
+    
+    def __init__(self, config_manager):
+        self.config_manager = config_manager
+        self._limits: Dict[str, MCPLimit] = {}
+        self._lock = threading.Lock()
+        self.wait_time: Dict[str, float] = {}
+        
+    def config_for(self, mcp_name: str) -> Dict[str, Any]:
+        """Look up limits for an MCP, tolerating the '-mcp' suffix used in workflows"""
+        
+        for name in (mcp_name, mcp_name[:-4] if mcp_name.endswith('-mcp') else f'{mcp_name}-mcp'):
+            config = self.config_manager.get_mcp_config(name)
+            if isinstance(config, dict) and config:
+                return config
+        return {}
+        
+    def get(self, mcp_name: str) -> MCPLimit:
+        """Get (or build) the limit for an MCP"""
+        
+        with self._lock:
+            if mcp_name not in self._limits:
+                config = self.config_for(mcp_name)
+                rate = config.get('requests_per_second')
+                if rate is None and config.get('requests_per_minute'):
+                    rate = float(config['requests_per_minute']) / 60.0
+                self._limits[mcp_name] = MCPLimit(
+                    mcp_name,
+                    rate_per_second=float(rate) if rate else None,
+                    burst=config.get('burst'),
+                    max_concurrent=config.get('max_concurrent')
+                )
+            return self._limits[mcp_name]
+            
+    def ignored_overrides(self, client_config) -> List[str]:
+        """MCPs whose [mcps] settings in a client's config differ from the ones this limiter enforces
+
+        Batch and daemon runs share one limiter built from the global config,
+        so a client's own limits (and hedge settings) do not apply there.
+        """
+        
+        client_mcps = client_config.get('mcps', {}) or {}
+        return sorted(name for name, config in client_mcps.items()
+                      if config != self.config_manager.get_mcp_config(name))
+        
+    def has_limits(self, mcp_name: str) -> bool:
+        """True if any limit is configured for the MCP"""
+        limit = self.get(mcp_name)
+        return bool(limit.bucket or limit.slots)
+        
+    @contextmanager
+    def limit(self, mcp_name: str, token: Optional[CancellationToken] = None):
+        """Hold a concurrency slot and spend one request token for the duration of an MCP call"""
+        
+        limit = self.acquire(mcp_name, token)
+        try:
+            yield limit
+        finally:
+            limit.release_slot()
+            
+    def acquire(self, mcp_name: str, token: Optional[CancellationToken] = None) -> MCPLimit:
+        """Wait for a concurrency slot and a request token; the caller must release_slot() when done"""
+        
+        limit = self.get(mcp_name)
+        started = time.monotonic()
+        
+        limit.acquire_slot(token)
+        try:
+            if limit.bucket is not None:
+                limit.bucket.acquire(token)
+        except BaseException:
+            limit.release_slot()
+            raise
+        self._record_wait(mcp_name, time.monotonic() - started)
+        return limit
+        
+    def try_acquire(self, mcp_name: str) -> Optional[MCPLimit]:
+        """Take a slot and a request token only if both are free right now (None otherwise)"""
+        
+        limit = self.get(mcp_name)
+        if limit.slots is not None and not limit.slots.acquire(blocking=False):
+            return None
+        if limit.bucket is not None and not limit.bucket.try_acquire():
+            limit.release_slot()
+            return None
+        return limit
+        
+    def _record_wait(self, mcp_name: str, seconds: float):
+        with self._lock:
+            self.wait_time[mcp_name] = self.wait_time.get(mcp_name, 0.0) + seconds
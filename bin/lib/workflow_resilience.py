@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Workflow Resilience Primitives
+Retry backoff policy and per-MCP circuit breakers shared by all stages of a run.
+"""
+
+import time
+import random
+import threading
+from typing import Callable, Dict, List, Optional
+from dataclasses import dataclass
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with jitter for failed stages"""
+    max_retries: int = 3
+    base_delay: float = 5.0
+    jitter: float = 0.2  # +/- fraction applied to each delay
+    max_delay: Optional[float] = None
+    
+    @classmethod
+    def from_config(cls, exec_config: Dict) -> 'RetryPolicy':
+        """Build a policy from the execution configuration section"""
+        return cls(
+            max_retries=int(exec_config.get('max_retries', 3)),
+            base_delay=float(exec_config.get('retry_delay', 5)),
+            jitter=float(exec_config.get('retry_jitter', 0.2)),
+            max_delay=exec_config.get('max_retry_delay')
+        )
+        
+    def delay(self, attempt: int) -> float:
+        """Delay in seconds before retry number `attempt` (1-based)"""
+        
+        delay = self.base_delay * (2 ** (attempt - 1))
+        
+        if self.max_delay is not None:
+            delay = min(delay, float(self.max_delay))
+            
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+            
+        return max(0.0, delay)
+
+class CircuitBreaker:
+    """Tracks consecutive failures against one MCP"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.clock = clock  # the executor's clock, so simulated runs reset breakers in virtual time
+        
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+        self._lock = threading.Lock()
+        
+    def allow(self) -> bool:
+        """Return True if a call may go through (half-open allows a single trial)"""
+        
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+                
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.trial_in_progress = False
+                
+            if self.state == self.HALF_OPEN and not self.trial_in_progress:
+                self.trial_in_progress = True
+                return True
+                
+            return False
+            
+    def release(self):
+        """Give back a half-open trial slot that was granted but not used"""
+        with self._lock:
+            self.trial_in_progress = False
+            
+    def record_success(self):
+        """Close the breaker after a successful call"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.trial_in_progress = False
+            
+    def record_failure(self):
+        """Count a failure and open the breaker once the threshold is reached"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.trial_in_progress = False
+            
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+class CircuitBreakerRegistry:
+    """Circuit breakers keyed by MCP name"""
+    
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        
+    @classmethod
+    def from_config(cls, exec_config: Dict, clock: Callable[[], float] = time.monotonic) -> 'CircuitBreakerRegistry':
+        """Build a registry from the execution configuration section"""
+        return cls(
+            failure_threshold=int(exec_config.get('circuit_breaker_threshold', 3)),
+            reset_timeout=float(exec_config.get('circuit_breaker_reset', 60)),
+            clock=clock
+        )
+        
+    def get(self, mcp_name: str) -> CircuitBreaker:
+        """Get (or create) the breaker for an MCP"""
+        with self._lock:
+            if mcp_name not in self._breakers:
+                self._breakers[mcp_name] = CircuitBreaker(mcp_name, self.failure_threshold, self.reset_timeout,
+                                                          clock=self.clock)
+            return self._breakers[mcp_name]
+            
+    def blocked(self, mcp_names: List[str]) -> List[str]:
+        """Return the MCPs whose breakers currently reject calls"""
+        
+        allowed, blocked = [], []
+        for mcp in mcp_names:
+            (allowed if self.get(mcp).allow() else blocked).append(mcp)
+            
+        if blocked:
+            # The call will not happen, so do not hold on to half-open trial slots
+            for mcp in allowed:
+                self.get(mcp).release()
+                
+        return blocked
+        
+    def release(self, mcp_names: List[str]):
+        """Give back half-open trial slots a stage was granted but never used on a call"""
+        for mcp in mcp_names:
+            self.get(mcp).release()
+            
+    def states(self) -> Dict[str, str]:
+        """Current breaker state per MCP"""
+        with self._lock:
+            return {name: breaker.state for name, breaker in self._breakers.items()}
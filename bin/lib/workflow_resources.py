@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Stage Resource Admission
+CPU, memory and I/O footprints of stages, and the budget that decides how many of them run at once.
+"""
+
+import os
+import re
+import time
+import threading
+from typing import Dict, List, Optional, Any
+
+from workflow_estimator import DurationHistory, percentile
+
+RESOURCE_KEYS = ('cpu', 'memory_mb', 'io')
+# Footprints of the built-in handlers until a stage has declared or learned one
+HANDLER_FOOTPRINTS = {
+    'data_collection': {'cpu': 0.25, 'memory_mb': 128, 'io': 1},
+    'analysis': {'cpu': 1.0, 'memory_mb': 1024, 'io': 0},
+    'anomaly_detection': {'cpu': 1.0, 'memory_mb': 1536, 'io': 0},
+    'report': {'cpu': 0.25, 'memory_mb': 128, 'io': 0}
+}
+DEFAULT_FOOTPRINT = {'cpu': 0.5, 'memory_mb': 256, 'io': 0}
+# Learned footprints are the p90 of past runs plus this much headroom
+LEARNED_HEADROOM = 1.25
+# Measured usage at or below this is noise (sleep/IO-bound handlers, RSS already reserved by the process)
+MIN_LEARNED_SAMPLE = {'cpu': 0.01, 'memory_mb': 1.0}
+RSS_SAMPLE_SECONDS = 0.1
+
+_UNITS_MB = {'': 1, 'k': 1 / 1024, 'kb': 1 / 1024, 'm': 1, 'mb': 1, 'g': 1024, 'gb': 1024, 't': 1024 ** 2, 'tb': 1024 ** 2}
+
+def parse_resources(text: str) -> Dict[str, float]:
+    """'cpu=2, memory=1.5GB, io=1' -> {'cpu': 2.0, 'memory_mb': 1536.0, 'io': 1.0}"""
+    
+    resources = {}
+    for part in re.split(r'[,;]', text):
+        match = re.match(r'\s*(cpus?|cores?|mem(?:ory)?|rss|io)\s*[=:]\s*([\d.]+)\s*([a-z]*)\s*$', part.lower())
+        if not match:
+            continue
+        name, value, unit = match.groups()
+        if name.startswith('mem') or name == 'rss':
+            unit = unit.replace('ib', 'b')  # GiB reads as GB
+            if unit in _UNITS_MB:
+                resources['memory_mb'] = float(value) * _UNITS_MB[unit]
+        elif name == 'io':
+            resources['io'] = float(value)
+        else:
+            resources['cpu'] = float(value)
+    return resources
+
+def host_memory_mb() -> Optional[float]:
+    """Physical memory of this host in MB (None where the OS does not say)"""
+    
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB (Linux /proc; None elsewhere)"""
+    
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+class ResourceBudget:
+    """Cores, memory and I/O slots shared by every stage this process runs
+
+    Stages are admitted only while the sum of their footprints fits every
+    budget. A stage larger than a whole budget still runs, but alone, so a
+    mis-sized stage can never block a run forever. Batch runs and the daemon
+    share one budget across all their executors.
+    """
+    
+    def __init__(self, cpu: Optional[float] = None, memory_mb: Optional[float] = None, io: float = 4):
+        self.capacity = {
+            'cpu': float(cpu or os.cpu_count() or 1),
+            'memory_mb': float(memory_mb or (host_memory_mb() or 4096) * 0.8),
+            'io': float(io)
+        }
+        self.used = {key: 0.0 for key in RESOURCE_KEYS}
+        self.running = 0
+        self._cond = threading.Condition()
+        
+    @classmethod
+    def from_config(cls, exec_config: Dict[str, Any]) -> Optional['ResourceBudget']:
+        """Budget from execution.resource_budget; None when execution.resource_admission is off"""
+        
+        if not exec_config.get('resource_admission', True):
+            return None
+        budget = exec_config.get('resource_budget', {}) or {}
+        memory = budget.get('memory_mb')
+        if memory is None and budget.get('memory'):
+            memory = parse_resources(f"memory={budget['memory']}").get('memory_mb')
+        return cls(cpu=budget.get('cpu'), memory_mb=memory, io=budget.get('io', 4))
+        
+    def admit(self, demand: Dict[str, float]) -> List[str]:
+        """Reserve a footprint if it fits; returns the resources that are short (empty = admitted)"""
+        
+        with self._cond:
+            short = [key for key in RESOURCE_KEYS
+                     if demand.get(key, 0) and self.used[key] + demand[key] > self.capacity[key] + 1e-9]
+            if short and self.running:
+                return short
+            for key in RESOURCE_KEYS:
+                self.used[key] += demand.get(key, 0)
+            self.running += 1
+            return []
+            
+    def acquire(self, demand: Dict[str, float], token=None, poll: float = 0.5) -> bool:
+        """Block until a footprint is admitted; False if the token is cancelled first"""
+        
+        with self._cond:
+            while self.admit(demand):
+                if token is not None and token.cancelled:
+                    return False
+                self._cond.wait(poll)
+        return True
+        
+    def release(self, demand: Dict[str, float]):
+        with self._cond:
+            for key in RESOURCE_KEYS:
+                self.used[key] = max(0.0, self.used[key] - demand.get(key, 0))
+            self.running = max(0, self.running - 1)
+            self._cond.notify_all()
+            
+    def describe(self) -> str:
+        return (f"{self.capacity['cpu']:g} cores, {self.capacity['memory_mb']:.0f} MB, "
+                f"{self.capacity['io']:g} I/O slots")
+
+class ResourceEstimator:
+    """Stage footprints: declared **Resources**, else learned from run history, else handler defaults
+    
+    Learned values only ever raise a handler default: thread CPU time and
+    RSS growth under-report stages that wait on I/O or reuse memory a
+    long-lived process already holds, and a footprint of ~0 would admit
+    such stages without limit.
+    """
+    
+    def __init__(self, history: DurationHistory, min_samples: int = 3):
+        self.history = history
+        self.min_samples = min_samples
+        self._index: Optional[Dict[str, Dict[str, List[float]]]] = None
+        
+    def _build_index(self) -> Dict[str, Dict[str, List[float]]]:
+        if self._index is None:
+            index: Dict[str, Dict[str, List[float]]] = {}
+            for entry in self.history.records():
+                samples = index.setdefault(entry.get('stage_name', '').lower(), {'cpu': [], 'memory_mb': []})
+                for key in ('cpu', 'memory_mb'):
+                    if entry.get(key) is not None:
+                        samples[key].append(entry[key])
+            self._index = index
+        return self._index
+        
+    def demand(self, stage, handler_name: Optional[str] = None) -> Dict[str, float]:
+        """Footprint to reserve for a stage"""
+        
+        defaults = HANDLER_FOOTPRINTS.get(handler_name, DEFAULT_FOOTPRINT)
+        footprint = dict(defaults)
+        
+        learned = self._build_index().get(stage.name.lower(), {})
+        for key, samples in learned.items():
+            samples = [value for value in samples if value > MIN_LEARNED_SAMPLE[key]]
+            if len(samples) >= self.min_samples:
+                footprint[key] = max(defaults.get(key, 0), percentile(samples, 90) * LEARNED_HEADROOM)
+                
+        footprint.update(getattr(stage, 'resources', None) or {})
+        return footprint
+
+class _Probe:
+    __slots__ = ('cpu_start', 'wall_start', 'rss_start', 'rss_peak')
+
+class UsageMonitor:
+    """Measures the CPU cores and memory a stage actually used
+
+    CPU is the handler thread's own CPU time over its wall time. Memory is
+    the rise of the process RSS above its level when the stage started,
+    sampled by one background thread while any stage is running; stages
+    running side by side see each other's growth, so the figure errs high.
+    """
+    
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self._probes: List[_Probe] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        
+    def start(self) -> _Probe:
+        probe = _Probe()
+        probe.cpu_start = time.thread_time()
+        probe.wall_start = time.perf_counter()
+        probe.rss_start = probe.rss_peak = current_rss_mb()
+        with self._lock:
+            self._probes.append(probe)
+            if probe.rss_start is not None and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+                self._thread.start()
+        return probe
+        
+    def stop(self, probe: _Probe) -> Dict[str, float]:
+        """Usage since start(); call from the thread that called start() (calling it again is harmless)"""
+        
+        wall = time.perf_counter() - probe.wall_start
+        usage = {'cpu': round((time.thread_time() - probe.cpu_start) / wall, 3) if wall > 0 else 0.0}
+        self._update(probe)
+        with self._lock:
+            if probe in self._probes:
+                self._probes.remove(probe)
+        if probe.rss_start is not None:
+            usage['memory_mb'] = round(max(0.0, probe.rss_peak - probe.rss_start), 1)
+        return usage
+        
+    def _update(self, probe: _Probe):
+        rss = current_rss_mb()
+        if rss is not None and probe.rss_peak is not None:
+            probe.rss_peak = max(probe.rss_peak, rss)
+            
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            rss = current_rss_mb()
+            with self._lock:
+                if not self._probes:
+                    self._thread = None
+                    return
+                for probe in self._probes:
+                    if rss is not None and probe.rss_peak is not None:
+                        probe.rss_peak = max(probe.rss_peak, rss)
+
+USAGE_MONITOR = UsageMonitor()
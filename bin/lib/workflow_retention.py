@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Reports Retention
+Enforces per-client retention and compacts old run directories into one tarball per run.
+"""
+
+import os
+import json
+import time
+import shutil
+import socket
+import tarfile
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+from config_manager import ConfigManager
+from workflow_history import RunIndex
+from workflow_manifest import MANIFEST_FILE, JOURNAL_FILE
+from workflow_jobs import pid_alive
+from workflow_blobstore import BlobStore, BLOB_SWEEP_GRACE
+
+try:
+    import zstandard
+except ImportError:  # optional - runs are compacted to .tar.gz without it
+    zstandard = None
+
+DAY = 86400
+STALE_RUN_HOURS = 24
+
+class RetentionService:
+    """Garbage collection for <reports_base_dir>/<client>/reports
+
+    Candidates come from the run index rather than a walk of the reports tree:
+    the index is brought up to date incrementally first, then each client's
+    policy selects run directories by age. A run directory older than
+    `compress_after_days` becomes <run>.tar.zst (or .tar.gz) and its index rows
+    point at the tarball, so history and compare keep working. Anything older
+    than `retention_days` is deleted along with its index rows. Input blobs
+    no run links to or compacted run records are deleted last.
+
+    Policy comes from the storage section, overridden per client by the
+    client config's storage_settings (retention_days, compress_after_days,
+    archive_completed).
+
+    Runs whose manifest still says 'running' are left alone while they are
+    live: their process exists (runs of this host) or their manifest or
+    journal changed within `stale_run_hours` (runs of other hosts, which
+    can't be checked). A run that died without a final status is collected
+    like any other.
+    """
+    
+    def __init__(self, config_file: Optional[str] = None, index: Optional[RunIndex] = None):
+        self.config_file = config_file
+        self.config_manager = ConfigManager(config_file)
+        self.storage_config = self.config_manager.get_storage_config()
+        self.reports_base_dir = Path(self.storage_config['reports_base_dir'])
+        self.index = index or RunIndex.from_config(self.storage_config)
+        self.blob_store = BlobStore.from_config(self.storage_config)
+        self.stale_after = float(self.storage_config.get('stale_run_hours', STALE_RUN_HOURS)) * 3600
+        
+    def policy(self, client_slug: str) -> Dict[str, Any]:
+        """Effective retention policy of a client"""
+        
+        client_settings = {}
+        if client_slug:
+            client_settings = ConfigManager(self.config_file, client_slug).get('storage_settings', {}) or {}
+            
+        def setting(key, default):
+            return client_settings.get(key, self.storage_config.get(key, default))
+            
+        return {
+            'retention_days': setting('retention_days', None),
+            'compress_after_days': setting('compress_after_days', 30),
+            'archive_completed': setting('archive_completed', True)
+        }
+        
+    def collect(self, clients: Optional[List[str]] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """Compress and expire run directories; returns what was (or would be) done"""
+        
+        started = time.time()
+        indexed = self.index.reindex(self.reports_base_dir)
+        stats = {'indexed': indexed, 'compressed': 0, 'deleted': 0, 'skipped': 0,
+                 'bytes_before': 0, 'bytes_after': 0, 'bytes_deleted': 0,
+                 'blobs_deleted': 0, 'blob_bytes_deleted': 0, 'dry_run': dry_run}
+                 
+        for client_slug in clients or self.index.clients():
+            policy = self.policy(client_slug)
+            now = time.time()
+            expired = set()
+            
+            # Expire first so nothing gets compressed only to be deleted
+            if policy['retention_days'] is not None:
+                for entry in self.index.run_dirs_before(client_slug, now - float(policy['retention_days']) * DAY):
+                    if self._expire(entry, stats, dry_run):
+                        expired.add(entry['run_dir'])
+                        
+            if policy['archive_completed'] and policy['compress_after_days'] is not None:
+                cutoff = now - float(policy['compress_after_days']) * DAY
+                for entry in self.index.run_dirs_before(client_slug, cutoff, unarchived_only=True):
+                    if entry['run_dir'] not in expired:
+                        self._compress(Path(entry['run_dir']), cutoff, stats, dry_run)
+                        
+        # Only across every client: runs of different clients share identical inputs' blobs
+        if not clients:
+            stats['blobs_deleted'], stats['blob_bytes_deleted'] = self.blob_store.sweep(
+                self.index.archived_input_digests(), dry_run=dry_run,
+                grace=float(self.storage_config.get('blob_gc_grace_seconds', BLOB_SWEEP_GRACE)))
+                
+        stats['duration'] = time.time() - started
+        return stats
+        
+    def _expire(self, entry: Dict[str, Any], stats: Dict[str, Any], dry_run: bool) -> bool:
+        run_dir = Path(entry['run_dir'])
+        
+        if entry['archive']:
+            target = Path(entry['archive'])
+            size = entry['archive_bytes'] or 0
+        else:
+            if _in_use(run_dir, self.stale_after):
+                stats['skipped'] += 1
+                return False
+            target = run_dir
+            size = _run_size(run_dir)
+            
+        if not dry_run:
+            if target.is_dir():
+                shutil.rmtree(target, ignore_errors=True)
+            elif target.exists():
+                target.unlink()
+            self.index.delete_run_dir(run_dir)
+            
+        stats['deleted'] += 1
+        stats['bytes_deleted'] += size
+        return True
+        
+    def _compress(self, run_dir: Path, cutoff: float, stats: Dict[str, Any], dry_run: bool):
+        try:
+            manifest_mtime = (run_dir / MANIFEST_FILE).stat().st_mtime
+        except OSError:
+            return
+        # A resumed or still-running run touches its manifest - leave it alone
+        if _in_use(run_dir, self.stale_after) or manifest_mtime >= cutoff:
+            stats['skipped'] += 1
+            return
+            
+        size = _run_size(run_dir)
+        stats['compressed'] += 1
+        stats['bytes_before'] += size
+        if dry_run:
+            return
+            
+        # Inputs stay in the blob store instead of the tarball - make sure each one is there
+        inputs = {str(path.relative_to(run_dir)): self.blob_store.store(path)
+                  for path in sorted((run_dir / 'inputs').rglob('*')) if path.is_file()}
+        self.blob_store.save()
+        archive = compress_run(run_dir)
+        archive_bytes = archive.stat().st_size
+        self.index.mark_archived(run_dir, archive, archive_bytes, inputs)
+        shutil.rmtree(run_dir)
+        stats['bytes_after'] += archive_bytes
+
+def compress_run(run_dir: Path) -> Path:
+    """Pack a run directory into <run>.tar.zst (zstandard installed) or <run>.tar.gz next to it
+    
+    inputs/ is left out: archived inputs are blob store links, and the
+    manifest in the tarball keeps their digests.
+    """
+    
+    run_dir = Path(run_dir)
+    inputs = f'{run_dir.name}/inputs'
+    
+    def without_inputs(info: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+        return None if info.name == inputs or info.name.startswith(inputs + '/') else info
+        
+    suffix = '.tar.zst' if zstandard is not None else '.tar.gz'
+    archive = run_dir.with_name(run_dir.name + suffix)
+    tmp_path = archive.with_name(archive.name + '.partial')
+    
+    with open(tmp_path, 'wb') as f:
+        if zstandard is not None:
+            with zstandard.ZstdCompressor(level=10).stream_writer(f, closefd=False) as compressed:
+                with tarfile.open(fileobj=compressed, mode='w|') as tar:
+                    tar.add(run_dir, arcname=run_dir.name, filter=without_inputs)
+        else:
+            with tarfile.open(fileobj=f, mode='w:gz') as tar:
+                tar.add(run_dir, arcname=run_dir.name, filter=without_inputs)
+                
+    os.replace(tmp_path, archive)
+    return archive
+
+def _manifest(run_dir: Path) -> Dict[str, Any]:
+    try:
+        with open(run_dir / MANIFEST_FILE, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError, IOError):
+        return {}
+
+def _in_use(run_dir: Path, stale_after: float = STALE_RUN_HOURS * 3600) -> bool:
+    """A run still being written: 'running' and its process alive, or recently active"""
+    
+    manifest = _manifest(run_dir)
+    if manifest.get('status') != 'running':
+        return False
+    if manifest.get('pid') and manifest.get('host') == socket.gethostname():
+        return pid_alive(manifest['pid'])
+        
+    # Another host's run (or one recorded before pids were) - judge by its last checkpoint
+    last_activity = 0.0
+    for name in (MANIFEST_FILE, JOURNAL_FILE):
+        try:
+            last_activity = max(last_activity, (run_dir / name).stat().st_mtime)
+        except OSError:
+            pass
+    return time.time() - last_activity < stale_after
+
+def _run_size(run_dir: Path) -> int:
+    """Bytes of a run directory, from the manifest's file list when it has one"""
+    
+    manifest = _manifest(run_dir)
+    if 'files' in manifest:
+        return sum(entry['size'] for entry in manifest['files'].values())
+    return sum(path.stat().st_size for path in run_dir.rglob('*') if path.is_file())
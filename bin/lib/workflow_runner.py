@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Template Workflow Runner
+Runs the command steps declared in a template's template-config.json through a shared context.
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Any, Callable
+
+from workflow_handlers import load_command
+from workflow_scheduler import StageGraph, StageScheduler
+
+TEMPLATE_CONFIG_FILE = 'template-config.json'
+RESULTS_FILE = 'workflow_results.json'
+CCC_ROOT = Path(__file__).parent.parent.parent
+
+_config_cache: Dict[Path, tuple] = {}
+_config_lock = threading.Lock()
+
+def load_template_config(template_path: Path) -> Dict[str, Any]:
+    """template-config.json of a template, re-read only when the file changes"""
+    
+    config_path = Path(template_path) / TEMPLATE_CONFIG_FILE
+    if not config_path.exists():
+        return {}
+        
+    mtime = config_path.stat().st_mtime
+    with _config_lock:
+        cached = _config_cache.get(config_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+            
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+        
+    with _config_lock:
+        _config_cache[config_path] = (mtime, config)
+    return config
+
+class WorkflowContext:
+    """State shared by every command of a workflow run
+
+    `data` is what template commands read (context.data.get(...)). Expensive
+    shared inputs go through load(), which runs each loader once per context
+    even when concurrent steps ask for the same key.
+    """
+    
+    def __init__(self, template_path: Path, data: Optional[Dict[str, Any]] = None,
+                 artifacts_dir: Optional[Path] = None):
+        self.template_path = Path(template_path)
+        self.data: Dict[str, Any] = dict(data or {})
+        self.artifacts_dir = Path(artifacts_dir) if artifacts_dir else None
+        self.results: Dict[str, Any] = {}
+        self._loaded: Dict[str, Any] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        
+    @property
+    def template_config(self) -> Dict[str, Any]:
+        return load_template_config(self.template_path)
+        
+    def load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Memoized shared load: the first caller runs `loader`, the rest reuse its value"""
+        
+        with self._lock:
+            if key in self._loaded:
+                return self._loaded[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+            
+        with key_lock:
+            with self._lock:
+                if key in self._loaded:
+                    return self._loaded[key]
+            value = loader()
+            with self._lock:
+                self._loaded[key] = value
+            return value
+            
+    def record_result(self, command: str, result: Any):
+        """Make a step's result visible to later steps"""
+        with self._lock:
+            self.results[command] = result
+
+def create_workflow_context(template_path: str, data: Optional[Dict[str, Any]] = None,
+                            artifacts_dir: Optional[str] = None) -> WorkflowContext:
+    """Build the shared context for running a template's workflows"""
+    return WorkflowContext(Path(template_path), data, Path(artifacts_dir) if artifacts_dir else None)
+
+class WorkflowRunner:
+    """Executes template workflow steps, importing each command module on first use
+
+    A step may list the commands it needs in `depends_on`; every other step
+    starts as soon as a worker is free, so independent commands run
+    concurrently. Relative output directories resolve against `output_root`
+    (the CCC root by default), not the current directory.
+    """
+    
+    def __init__(self, template_path: str, max_workers: int = 4, output_root: Optional[str] = None):
+        self.template_path = Path(template_path)
+        self.template_name = self.template_path.name
+        self.max_workers = max_workers
+        self.output_root = Path(output_root) if output_root else CCC_ROOT
+        self._commands: Dict[str, Optional[Callable]] = {}
+        self._lock = threading.Lock()
+        
+    @property
+    def config(self) -> Dict[str, Any]:
+        return load_template_config(self.template_path)
+        
+    def list_workflows(self) -> List[str]:
+        """Workflow names declared by the template"""
+        return list(self.config.get('workflows', {}).keys())
+        
+    def _command_path(self, command: str) -> Path:
+        declared = self.config.get('commands', {}).get(command)
+        return self.template_path / (declared or f'commands/{command}.py')
+        
+    def load_command(self, command: str) -> Optional[Callable]:
+        """execute() of a command module, or None if the template doesn't ship it"""
+        
+        with self._lock:
+            if command in self._commands:
+                return self._commands[command]
+                
+        path = self._command_path(command)
+        execute = load_command(f'{self.template_name}/{command}', path) if path.is_file() else None
+        
+        with self._lock:
+            return self._commands.setdefault(command, execute)
+            
+    def step_config(self, step: Dict[str, Any]) -> Dict[str, Any]:
+        """Agent preferences from the template overlaid with the step's own config"""
+        
+        config = dict(self.config.get('agent_preferences', {}).get(step.get('agent'), {}))
+        config.update(step.get('config', {}))
+        return config
+        
+    def execute_workflow_step(self, step: Dict[str, Any], context: WorkflowContext) -> Dict[str, Any]:
+        """Run one command step; status is completed, skipped (command not shipped) or failed"""
+        
+        command = step.get('command')
+        started = time.time()
+        outcome = {
+            'agent': step.get('agent'),
+            'command': command,
+            'description': step.get('description', ''),
+            'started': datetime.now().isoformat()
+        }
+        
+        try:
+            execute = self.load_command(command)
+        except Exception as e:
+            execute = None
+            outcome.update({'status': 'failed', 'error': f"Could not load command: {e}"})
+            
+        if 'status' not in outcome:
+            if execute is None:
+                outcome.update({'status': 'skipped', 'reason': f"Command '{command}' is not available in the {self.template_name} template"})
+            else:
+                try:
+                    result = execute(context, self.step_config(step))
+                    failed = isinstance(result, dict) and result.get('status') == 'failed'
+                    outcome.update({'status': 'failed' if failed else 'completed', 'result': result})
+                    context.record_result(command, result)
+                except Exception as e:
+                    outcome.update({'status': 'failed', 'error': str(e)})
+                    
+        outcome['duration'] = time.time() - started
+        return outcome
+        
+    def step_graph(self, workflow_name: str) -> StageGraph:
+        """Dependency graph of a workflow's steps (step numbers are 1-based, `depends_on` names commands)"""
+        
+        workflow = self.config.get('workflows', {}).get(workflow_name)
+        if workflow is None:
+            raise ValueError(f"Workflow '{workflow_name}' not found in {self.template_name} template")
+            
+        steps = [SimpleNamespace(name=step.get('command', ''), dependencies=list(step.get('depends_on', [])))
+                 for step in workflow.get('steps', [])]
+        return StageGraph(steps)
+        
+    def run_workflow(self, workflow_name: str, context: WorkflowContext,
+                     stop_on_failure: bool = True) -> Dict[str, Any]:
+        """Run a template workflow and merge every step result into the artifacts directory
+
+        Steps start once the steps they depend on have completed. A failed step
+        stops new steps from starting (`stop_on_failure`) or, otherwise, only
+        skips the steps that depend on it.
+        """
+        
+        graph = self.step_graph(workflow_name)
+        steps = self.config['workflows'][workflow_name].get('steps', [])
+        
+        if context.artifacts_dir is None:
+            output_directory = self.config.get('default_config', {}).get('output_directory', f'output/{self.template_name}')
+            context.artifacts_dir = self.output_root / output_directory / f"{workflow_name}_{datetime.now().strftime('%Y_%m_%d')}"
+        context.artifacts_dir.mkdir(parents=True, exist_ok=True)
+        
+        started = time.time()
+        
+        def execute(num: int, token) -> Dict[str, Any]:
+            outcome = self.execute_workflow_step(steps[num - 1], context)
+            # Failed commands are not retried - they may have changed the project already
+            return {'success': outcome['status'] != 'failed', 'retryable': False, 'outcome': outcome}
+            
+        def record(num: int, result: Dict[str, Any], *_):
+            self._write_artifact(context.artifacts_dir / f"{num:02d}_{steps[num - 1].get('command')}.json",
+                                 result['outcome'])
+            
+        scheduler = StageScheduler(graph, max_workers=self.max_workers,
+                                   error_handling='stop' if stop_on_failure else 'continue')
+        schedule = scheduler.run(execute, on_success=record, on_failure=record)
+        
+        outcomes = []
+        for num, step in enumerate(steps, 1):
+            if num in schedule.results:
+                outcomes.append(schedule.results[num]['outcome'])
+            else:
+                outcomes.append({'agent': step.get('agent'), 'command': step.get('command'), 'status': 'skipped',
+                                 'reason': 'earlier step failed' if stop_on_failure else 'dependency failed'})
+                
+        summary = {
+            'template': self.template_name,
+            'workflow': workflow_name,
+            'completed': datetime.now().isoformat(),
+            'duration': time.time() - started,
+            'success': not schedule.failed and not schedule.skipped,
+            'steps': [{k: v for k, v in o.items() if k != 'result'} for o in outcomes],
+            'results': dict(context.results)
+        }
+        self._write_artifact(context.artifacts_dir / RESULTS_FILE, summary)
+        return summary
+        
+    def _write_artifact(self, path: Path, data: Dict[str, Any]):
+        tmp_path = path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+class AgentWorkflowIntegration:
+    """Formats the agent handoffs implied by a template workflow's steps"""
+    
+    def __init__(self, runner: WorkflowRunner):
+        self.runner = runner
+        
+    def format_agent_switch(self, from_agent: str, to_agent: str, task: str) -> str:
+        """Handoff message shown when work passes from one agent to another"""
+        
+        return "\n".join([
+            "=" * 50,
+            f"🤝 AGENT HANDOFF: {from_agent} → {to_agent}",
+            "=" * 50,
+            f"Task: {task}",
+            f"Template: {self.runner.template_name}"
+        ])
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Workflow Stage Scheduler
+Builds the stage dependency graph and runs ready stages on a bounded worker pool.
+"""
+
+import re
+import heapq
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Any, Callable, Set
+from dataclasses import dataclass, field
+
+from workflow_resilience import RetryPolicy
+from workflow_cancellation import CancellationToken
+from workflow_tracing import Tracer
+from workflow_clock import Clock, SYSTEM_CLOCK, InlinePool
+from workflow_resources import ResourceBudget
+
+# How often stages held back for resources re-check a budget another run may have freed
+ADMISSION_POLL_SECONDS = 0.25
+
+@dataclass
+class ScheduleOutcome:
+    """Results of a scheduled workflow run"""
+    results: Dict[int, Dict[str, Any]]
+    completed: List[int]
+    failed: List[int]
+    skipped: List[int]
+    halted: bool
+    retried: Set[int] = field(default_factory=set)
+    cancelled: List[int] = field(default_factory=list)
+    resumed: List[int] = field(default_factory=list)
+
+class StageGraph:
+    """Dependency graph over parsed workflow stages (stage numbers are 1-based)"""
+    
+    def __init__(self, stages: List):
+        self.stages = stages
+        self.dependencies: Dict[int, Set[int]] = {}
+        self.dependents: Dict[int, List[int]] = {num: [] for num in range(1, len(stages) + 1)}
+        
+        name_index = {stage.name.strip().lower(): num for num, stage in enumerate(stages, 1)}
+        
+        for num, stage in enumerate(stages, 1):
+            deps = set()
+            for dep in stage.dependencies:
+                dep_num = self._resolve_dependency(dep, name_index, len(stages))
+                if dep_num is None:
+                    raise ValueError(f"Stage '{stage.name}' depends on non-existent stage: {dep}")
+                if dep_num == num:
+                    raise ValueError(f"Stage '{stage.name}' depends on itself")
+                deps.add(dep_num)
+            self.dependencies[num] = deps
+            for dep_num in deps:
+                self.dependents[dep_num].append(num)
+                
+        # Fail early on cycles - the scheduler would otherwise wait forever
+        self.topological_order()
+        
+    def _resolve_dependency(self, dep: str, name_index: Dict[str, int], stage_count: int) -> Optional[int]:
+        """Resolve a dependency reference ("Stage 2" or a stage name) to a stage number"""
+        
+        stage_match = re.match(r'^stage\s+(\d+)\b', dep.strip(), re.IGNORECASE)
+        if stage_match:
+            dep_num = int(stage_match.group(1))
+            return dep_num if 1 <= dep_num <= stage_count else None
+            
+        return name_index.get(dep.strip().lower())
+        
+    def topological_order(self) -> List[int]:
+        """Return stage numbers in dependency order (Kahn's algorithm)"""
+        
+        remaining = {num: len(deps) for num, deps in self.dependencies.items()}
+        ready = deque(num for num, count in remaining.items() if count == 0)
+        order = []
+        
+        while ready:
+            num = ready.popleft()
+            order.append(num)
+            for dependent in self.dependents[num]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+                    
+        if len(order) != len(self.stages):
+            raise ValueError("Circular dependencies detected in workflow stages")
+            
+        return order
+        
+    def descendants(self, num: int) -> Set[int]:
+        """All stages that transitively depend on the given stage"""
+        
+        found = set()
+        pending = list(self.dependents[num])
+        
+        while pending:
+            dependent = pending.pop()
+            if dependent not in found:
+                found.add(dependent)
+                pending.extend(self.dependents[dependent])
+                
+        return found
+
+class StageScheduler:
+    """Runs workflow stages as soon as their dependencies complete"""
+    
+    def __init__(self, graph: StageGraph, max_workers: int = 3, error_handling: str = 'retry',
+                 retry_policy: Optional[RetryPolicy] = None, stage_timeout: Optional[float] = None,
+                 cancel_grace: float = 5.0, cancel_token: Optional[CancellationToken] = None,
+                 tracer: Optional[Tracer] = None, pool: Optional[ThreadPoolExecutor] = None,
+                 clock: Optional[Clock] = None, max_in_flight: Optional[int] = None,
+                 budget: Optional[ResourceBudget] = None, retry_timeouts: bool = False):
+        self.graph = graph
+        self.max_workers = max(1, int(max_workers or 1))
+        self.error_handling = error_handling
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.stage_timeout = stage_timeout
+        self.cancel_grace = cancel_grace
+        self.cancel_token = cancel_token or CancellationToken()
+        self.tracer = tracer
+        self.pool = pool  # shared pool (e.g. batch runs); owned by the caller
+        self.clock = clock or SYSTEM_CLOCK  # a VirtualClock with an InlinePool for simulated runs
+        # Stages submitted but not finished; enough to keep a shared pool busy without tracking the whole graph
+        self.max_in_flight = max(1, int(max_in_flight or self.max_workers * 2))
+        self.budget = budget  # admits stages only while their footprints fit; may be shared
+        # A timed-out attempt's thread may still be writing the stage's outputs, so a retry would race it
+        self.retry_timeouts = retry_timeouts
+        
+    def run(self,
+            execute: Callable[[int, CancellationToken], Dict[str, Any]],
+            on_start: Optional[Callable[[int], None]] = None,
+            on_success: Optional[Callable[[int, Dict[str, Any], int], None]] = None,
+            on_failure: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+            on_retry: Optional[Callable[[int, int, float], None]] = None,
+            on_abandon: Optional[Callable[[int, str], None]] = None,
+            timeout_for: Optional[Callable[[int], Optional[float]]] = None,
+            precompleted: Optional[Dict[int, Dict[str, Any]]] = None,
+            demand_for: Optional[Callable[[int], Dict[str, float]]] = None,
+            on_wait: Optional[Callable[[int, List[str]], None]] = None) -> ScheduleOutcome:
+        """Run all stages, honouring the stop/retry/continue error-handling modes
+        
+        Retries are parked on a timer heap rather than slept on, so other ready
+        stages keep the worker pool busy while a failed stage backs off. Stages
+        that exceed their timeout have their token cancelled and are treated as
+        failed (`on_abandon` then `on_failure`), retried only with
+        `retry_timeouts`; Ctrl-C or cancelling the run's token stops submitting, cancels
+        every in-flight stage and returns what finished.
+        Stages in `precompleted` (e.g. valid resume checkpoints) are not run.
+        With a budget, ready stages whose `demand_for` footprint does not fit
+        wait (smaller ones behind them may go first) until running stages
+        release theirs.
+        """
+        
+        precompleted = precompleted or {}
+        remaining = {num: len(deps) for num, deps in self.graph.dependencies.items()}
+        
+        for num in precompleted:
+            for dependent in self.graph.dependents[num]:
+                remaining[dependent] -= 1
+                
+        ready = [num for num in sorted(remaining) if remaining[num] == 0 and num not in precompleted]  # heap
+        
+        results: Dict[int, Dict[str, Any]] = dict(precompleted)
+        completed: List[int] = list(precompleted)
+        failed: List[int] = []
+        blocked: Set[int] = set()
+        retried: Set[int] = set()
+        halted = False
+        cancelled: List[int] = []
+        abandoned = False
+        
+        in_flight = {}  # future -> (stage_num, attempt, token, started, timeout)
+        timers = []  # heap of (due, stage_num, attempt, scheduled_at)
+        last_failure: Dict[int, Dict[str, Any]] = {}
+        demands: Dict[int, Dict[str, float]] = {}
+        waiting_since: Dict[int, float] = {}  # stage -> when the budget first held it back
+        
+        def admitted(num: int) -> bool:
+            if self.budget is None:
+                return True
+            if num not in demands:
+                demands[num] = demand_for(num) if demand_for else {}
+            short = self.budget.admit(demands[num])
+            if short:
+                if num not in waiting_since:
+                    waiting_since[num] = clock.time()
+                    if on_wait:
+                        on_wait(num, short)
+                return False
+            since = waiting_since.pop(num, None)
+            if since is not None and self.tracer:
+                self.tracer.record(f"Stage {num} resource wait", 'wait', since, clock.time(), stage_num=num)
+            return True
+            
+        def submit(num: int, attempt: int):
+            token = self.cancel_token.child()
+            timeout = timeout_for(num) if timeout_for else self.stage_timeout
+            # The clock starts when a worker picks the stage up, not while it queues for the pool
+            started = {'at': None}
+            future = pool.submit(self._guarded, execute, num, token, attempt, clock.time(), started)
+            in_flight[future] = (num, attempt, token, started, timeout)
+            if self.budget is not None:
+                # Released when the stage's thread is really done, even if it was abandoned on timeout
+                future.add_done_callback(lambda _, demand=demands[num]: self.budget.release(demand))
+            
+        def deadline_of(entry) -> Optional[float]:
+            started, timeout = entry[3]['at'], entry[4]
+            if not timeout or (started is None and inline):
+                return None
+            # Queued stages have no deadline yet - poll until they start
+            return started + timeout if started is not None else clock.monotonic() + 0.1
+            
+        def handle(num: int, attempt: int, result: Dict[str, Any]):
+            nonlocal ready, halted
+            
+            if result.get('cancelled') and self.cancel_token.cancelled:
+                # The run was cancelled, not the stage - same outcome as an interrupt
+                halted = True
+                cancelled.append(num)
+                if on_abandon:
+                    on_abandon(num, self.cancel_token.reason)
+                return
+                
+            if result.get('success'):
+                results[num] = result
+                completed.append(num)
+                if attempt:
+                    retried.add(num)
+                if on_success:
+                    on_success(num, result, attempt)
+                    
+                for dependent in self.graph.dependents[num]:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0 and dependent not in blocked:
+                        heapq.heappush(ready, dependent)
+                return
+                
+            if on_failure:
+                on_failure(num, result)
+                
+            retryable = result.get('retryable', True)
+            if (self.error_handling == 'retry' and retryable and not halted
+                    and not self.cancel_token.cancelled
+                    and attempt < self.retry_policy.max_retries):
+                delay = self.retry_policy.delay(attempt + 1)
+                last_failure[num] = result
+                heapq.heappush(timers, (clock.monotonic() + delay, num, attempt + 1, clock.time()))
+                if on_retry:
+                    on_retry(num, attempt + 1, delay)
+                return
+                
+            results[num] = result
+            failed.append(num)
+            
+            if self.error_handling == 'continue':
+                # Independent branches keep running; dependents can never start
+                blocked.update(self.graph.descendants(num))
+                ready = [n for n in ready if n not in blocked]
+                heapq.heapify(ready)
+            else:
+                # 'stop', or 'retry' with retries exhausted: drain in-flight stages and stop
+                halted = True
+                ready = []
+                
+        def cancel_all(reason: str):
+            """Cancel everything, give stages a moment to stop cooperatively, keep what finished"""
+            nonlocal halted, in_flight, timers
+            
+            self.cancel_token.cancel(reason)
+            halted = True
+            
+            done, _ = wait_for(in_flight, timeout=self.cancel_grace) if in_flight else (set(), set())
+            for future, (num, attempt, _, _, _) in list(in_flight.items()):
+                if future in done and future.result().get('success'):
+                    handle(num, attempt, future.result())
+                else:
+                    cancelled.append(num)
+                    if on_abandon:
+                        on_abandon(num, self.cancel_token.reason)
+            # Stages backing off before a retry will not get one
+            for _, num, _, _ in timers:
+                cancelled.append(num)
+                if on_abandon:
+                    on_abandon(num, self.cancel_token.reason)
+            in_flight, timers = {}, []
+            
+        clock = self.clock
+        pool = self.pool or ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage')
+        # The inline pool resolves futures by advancing virtual time, so it does its own waiting
+        # (and returns whenever it starts stages, so queued stages need no polling)
+        inline = isinstance(pool, InlinePool)
+        wait_for = pool.wait if inline else wait
+        
+        try:
+            while ready or in_flight or timers:
+                if self.cancel_token.cancelled:
+                    # Cancelled from outside the loop (batch Ctrl-C, daemon cancel requests)
+                    cancel_all(self.cancel_token.reason)
+                    break
+                    
+                if halted and timers:
+                    # Pending retries will never run - record their last failure
+                    for _, num, _, _ in timers:
+                        results[num] = last_failure[num]
+                        failed.append(num)
+                    timers = []
+                    
+                now = clock.monotonic()
+                while timers and timers[0][0] <= now:
+                    _, num, attempt, scheduled_at = heapq.heappop(timers)
+                    if not admitted(num):
+                        heapq.heappush(timers, (now + ADMISSION_POLL_SECONDS, num, attempt, scheduled_at))
+                        break
+                    if self.tracer:
+                        self.tracer.record(f"Stage {num} retry backoff", 'retry', scheduled_at, clock.time(),
+                                           stage_num=num, attempt=attempt)
+                    submit(num, attempt)
+                    
+                # The pool bounds actual concurrency; the in-flight cap keeps every wait() and
+                # deadline scan below proportional to the worker count, not the graph's width
+                held = []
+                while ready and not halted and len(in_flight) < self.max_in_flight:
+                    num = heapq.heappop(ready)
+                    if not admitted(num):
+                        held.append(num)
+                        if len(held) >= self.max_in_flight:
+                            break  # bounded backfill scan
+                        continue
+                    if on_start:
+                        on_start(num)
+                    submit(num, 0)
+                for num in held:
+                    heapq.heappush(ready, num)
+                    
+                wakeups = [timers[0][0]] if timers else []
+                wakeups.extend(d for d in map(deadline_of, in_flight.values()) if d)
+                if held:
+                    wakeups.append(clock.monotonic() + ADMISSION_POLL_SECONDS)
+                timeout = max(0.0, min(wakeups) - clock.monotonic()) if wakeups else None
+                
+                if not in_flight:
+                    if timers or held:
+                        if clock.virtual:
+                            clock.sleep(timeout)
+                        else:
+                            self.cancel_token.wait(timeout)
+                        continue
+                    break
+                    
+                done, _ = wait_for(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                if self.cancel_token.cancelled:
+                    continue  # finished stages are sorted out by cancel_all at the top of the loop
+                    
+                for future in done:
+                    num, attempt = in_flight.pop(future)[:2]
+                    handle(num, attempt, future.result())
+                    
+                # Enforce stage timeouts - the worker thread is abandoned and told to stop
+                now = clock.monotonic()
+                for future, entry in list(in_flight.items()):
+                    num, attempt, token, started, timeout = entry
+                    if timeout and started['at'] is not None and now >= started['at'] + timeout and not future.done():
+                        del in_flight[future]
+                        abandoned = True
+                        token.cancel('timeout')
+                        if on_abandon:
+                            on_abandon(num, 'timeout')
+                        handle(num, attempt, {
+                            'success': False,
+                            'error': f"Stage timed out after {timeout:g}s",
+                            'timed_out': True,
+                            'retryable': self.retry_timeouts,
+                            'stage_num': num
+                        })
+                        
+        except KeyboardInterrupt:
+            cancel_all('interrupted')
+            
+        finally:
+            if self.pool is None:
+                # Never block on a stage that ignored its cancellation token
+                pool.shutdown(wait=not (abandoned or self.cancel_token.cancelled), cancel_futures=True)
+            else:
+                for future in in_flight:
+                    future.cancel()
+            
+        finished = set(completed) | set(failed) | set(cancelled)
+        skipped = [num for num in sorted(remaining) if num not in finished]
+        
+        return ScheduleOutcome(
+            results=results,
+            completed=sorted(completed),
+            failed=sorted(failed),
+            skipped=skipped,
+            halted=halted,
+            retried=retried,
+            cancelled=sorted(cancelled),
+            resumed=sorted(precompleted)
+        )
+        
+    def _guarded(self, func: Callable[[int, CancellationToken], Dict[str, Any]], num: int,
+                 token: CancellationToken, attempt: int = 0, submitted_at: Optional[float] = None,
+                 started: Optional[Dict[str, Optional[float]]] = None) -> Dict[str, Any]:
+        """Run a stage callable, turning unexpected exceptions into failed results"""
+        
+        if started is not None:
+            started['at'] = self.clock.monotonic()
+            
+        if self.tracer is None:
+            return self._call_stage(func, num, token)
+            
+        queue_wait = self.clock.time() - submitted_at if submitted_at else 0.0
+        with self.tracer.span(f"Stage {num}", 'stage', stage_num=num, attempt=attempt,
+                              queue_wait=queue_wait) as span:
+            result = self._call_stage(func, num, token)
+            span['success'] = bool(result.get('success'))
+            if not result.get('success'):
+                span['error'] = result.get('error')
+            return result
+            
+    def _call_stage(self, func: Callable[[int, CancellationToken], Dict[str, Any]], num: int,
+                    token: CancellationToken) -> Dict[str, Any]:
+        try:
+            return func(num, token)
+        except Exception as e:
+            return {'success': False, 'error': str(e), 'stage_num': num}
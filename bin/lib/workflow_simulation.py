@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Workflow Simulation
+Runs workflows on a virtual clock to measure engine overhead and exercise scheduling quickly.
+"""
+
+import io
+import time
+import random
+import contextlib
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+from workflow_parser import WorkflowDefinition, WorkflowStage
+from workflow_executor import WorkflowExecutor
+from workflow_scheduler import StageGraph
+from workflow_clock import VirtualClock, InlinePool
+from workflow_events import EventBus
+from workflow_estimator import critical_path, simulate_makespan
+
+SYNTHETIC_MCPS = ['dataforseo', 'firecrawl', 'chart-mcp', 'perplexity-ask']
+SYNTHETIC_SHAPES = ('layered', 'chain', 'fanout', 'diamond')
+
+def _shape_dependencies(shape: str, num: int, stage_count: int, rng: random.Random,
+                        max_dependencies: int, window: int) -> List[int]:
+    if shape == 'chain':
+        return [num - 1] if num > 1 else []
+    if shape == 'fanout':
+        # One root, everything else in parallel, one final stage joining them all
+        if num == 1:
+            return []
+        return list(range(2, num)) if num == stage_count and num > 2 else [1]
+    if shape == 'diamond':
+        # Repeated top -> (left, right) -> bottom blocks, each top after the previous bottom
+        offset = (num - 1) % 4
+        if offset == 0:
+            return [num - 1] if num > 1 else []
+        if offset in (1, 2):
+            return [num - offset]
+        return [num - 2, num - 1]
+    if shape != 'layered':
+        raise ValueError(f"Unknown synthetic workflow shape '{shape}' (use {', '.join(SYNTHETIC_SHAPES)})")
+        
+    if num <= stage_count * 0.2:
+        return []
+    candidates = range(max(1, num - window), num)
+    return sorted(rng.sample(candidates, min(len(candidates), rng.randint(1, max_dependencies))))
+
+def synthetic_workflow(stage_count: int = 500, max_dependencies: int = 3, window: int = 25,
+                       seed: int = 0, name: str = 'synthetic', shape: str = 'layered') -> WorkflowDefinition:
+    """Generated workflow of a given dependency shape
+
+    'layered' is a random DAG: collection stages first, then analysis stages
+    that each depend on up to `max_dependencies` of the `window` stages
+    before them, then reports. 'chain', 'fanout' and 'diamond' are the
+    fixed shapes the engine benchmarks use. Stage names pick the built-in
+    handlers (and so their simulated durations) by position.
+    """
+    
+    rng = random.Random(seed)
+    stages: List[WorkflowStage] = []
+    
+    for num in range(1, stage_count + 1):
+        position = num / stage_count
+        kind = 'Data Collection' if position <= 0.2 else 'Analysis' if position <= 0.9 else 'Report'
+        dependencies = _shape_dependencies(shape, num, stage_count, rng, max_dependencies, window)
+        
+        stages.append(WorkflowStage(
+            name=f'{kind} {num}',
+            description=f'Synthetic {kind.lower()} stage',
+            dependencies=[f'Stage {dep}' for dep in dependencies],
+            recommended_agents=['DataPipelineAgent'],
+            suggested_mcps=rng.sample(SYNTHETIC_MCPS, rng.randint(0, 2)),
+            parallel_tasks=[],
+            success_criteria=[],
+            expected_outputs=[],
+            expected_correlations=[],
+            warnings=[]
+        ))
+        
+    return WorkflowDefinition(
+        name=name,
+        description=f'Synthetic {stage_count}-stage {shape} workflow for simulation',
+        goal='Exercise the scheduler',
+        context='',
+        requirements=[],
+        expected_challenges=[],
+        parameters={'seed': seed, 'shape': shape},
+        inputs={},
+        stages=stages,
+        expected_outputs=[],
+        template_selection=None,
+        client_slug='simulation',
+        estimated_time=None
+    )
+
+def simulate_workflow(config_manager, workflow: WorkflowDefinition, workers: Optional[int] = None,
+                      jitter: float = 0.3, seed: int = 0, quiet: bool = True) -> Dict[str, Any]:
+    """Execute a workflow on a virtual clock and report simulated vs real time
+
+    The real executor, scheduler, handlers and tracer run unchanged; only
+    sleeping is virtual and stages run inline. Nothing touches the stage
+    cache, duration history or run index, and output goes under
+    <temp_dir>/simulations. The run's trace.json is a simulated timeline.
+    """
+    
+    exec_config = config_manager.get_execution_config()
+    workers = int(workers or exec_config.get('max_parallel_tasks', 3))
+    
+    clock = VirtualClock(jitter=jitter, seed=seed)
+    executor = WorkflowExecutor(config_manager, stage_pool=InlinePool(clock, workers), clock=clock)
+    executor.use_cache = False
+    executor.record_history = False
+    # Virtual workers are the only limit - this host's cores and memory say nothing about the modelled one
+    executor.resource_budget = None
+    # The run's own events.jsonl only - simulated runs stay off the shared feed dashboards follow
+    executor.events = EventBus(clock=clock.time)
+    executor.exec_config = dict(executor.exec_config, max_parallel_tasks=workers)
+    executor.storage_config = dict(executor.storage_config,
+                                   reports_base_dir=str(Path(executor.storage_config['temp_dir']) / 'simulations'))
+                                   
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        result = executor.execute_definition(workflow)
+    wall_time = time.perf_counter() - started
+    
+    # Per-stage virtual durations, fed back through the estimator's makespan model
+    recorded = executor.manifest.data.get('stages', {}) if executor.manifest else {}
+    durations = {int(num): entry.get('duration') or 0.0 for num, entry in recorded.items()}
+    graph = StageGraph(workflow.stages)
+    for num in graph.dependencies:
+        durations.setdefault(num, 0.0)
+    path_length, _ = critical_path(graph, durations)
+    
+    return {
+        'workflow_name': workflow.name,
+        'stages': len(workflow.stages),
+        'workers': workers,
+        'success': result.success,
+        'stages_completed': result.stages_completed,
+        'error_message': result.error_message,
+        'simulated_time': result.execution_time,
+        'wall_time': wall_time,
+        'overhead_per_stage_ms': wall_time / max(1, len(workflow.stages)) * 1000,
+        'estimated_makespan': simulate_makespan(graph, durations, workers),
+        'critical_path': path_length,
+        'sequential_time': sum(durations.values()),
+        'output_directory': str(result.output_directory) if result.output_directory else None
+    }
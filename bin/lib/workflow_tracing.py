@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Execution Tracing
+Records stage, retry, MCP call and reporting spans and exports them as JSONL and Chrome trace files.
+"""
+
+import json
+import time
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Callable
+
+TRACE_JSONL_FILE = 'trace.jsonl'
+TRACE_CHROME_FILE = 'trace.json'
+
+class Tracer:
+    """Thread-safe span recorder for one workflow run"""
+    
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.spans: List[Dict[str, Any]] = []
+        self._threads: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 1
+        
+    def _thread_index(self) -> int:
+        name = threading.current_thread().name
+        with self._lock:
+            if name not in self._threads:
+                self._threads[name] = len(self._threads) + 1
+            return self._threads[name]
+            
+    def _new_id(self) -> int:
+        with self._lock:
+            span_id = self._next_id
+            self._next_id += 1
+            return span_id
+            
+    @contextmanager
+    def span(self, name: str, category: str, **attrs):
+        """Time a block of work; attributes can be added to the yielded dict while it runs"""
+        
+        parent_stack = getattr(self._local, 'stack', None)
+        if parent_stack is None:
+            parent_stack = self._local.stack = []
+            
+        span_id = self._new_id()
+        span_attrs = dict(attrs)
+        start = self.clock()
+        parent_stack.append(span_id)
+        
+        try:
+            yield span_attrs
+        except BaseException as e:
+            span_attrs.setdefault('error', str(e) or type(e).__name__)
+            raise
+        finally:
+            parent_stack.pop()
+            self._append(name, category, start, self.clock(), span_attrs,
+                         span_id=span_id, parent_id=parent_stack[-1] if parent_stack else None)
+                         
+    def record(self, name: str, category: str, start: float, end: float, **attrs):
+        """Record a span whose start and end were measured elsewhere (e.g. retry backoff)"""
+        stack = getattr(self._local, 'stack', None) or []
+        self._append(name, category, start, end, attrs, span_id=self._new_id(),
+                     parent_id=stack[-1] if stack else None)
+                     
+    def _append(self, name: str, category: str, start: float, end: float, attrs: Dict[str, Any],
+                span_id: int, parent_id: Optional[int]):
+        span = {
+            'id': span_id,
+            'parent_id': parent_id,
+            'name': name,
+            'category': category,
+            'start': start,
+            'end': end,
+            'duration': end - start,
+            'thread': threading.current_thread().name,
+            'tid': self._thread_index(),
+            'attrs': attrs
+        }
+        with self._lock:
+            self.spans.append(span)
+            
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Total time and span count per category"""
+        
+        totals: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for span in self.spans:
+                entry = totals.setdefault(span['category'], {'count': 0, 'total_seconds': 0.0})
+                entry['count'] += 1
+                entry['total_seconds'] += span['duration']
+        return totals
+        
+    def export(self, output_dir: Path) -> List[Path]:
+        """Write trace.jsonl and a Chrome trace_event file into the run directory"""
+        
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s['start'])
+            threads = dict(self._threads)
+            
+        jsonl_path = Path(output_dir) / TRACE_JSONL_FILE
+        with open(jsonl_path, 'w') as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + '\n')
+                
+        # chrome://tracing / Perfetto format: complete ('X') events in microseconds
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': thread_name}}
+            for thread_name, tid in threads.items()
+        ]
+        for span in spans:
+            events.append({
+                'name': span['name'],
+                'cat': span['category'],
+                'ph': 'X',
+                'ts': int(span['start'] * 1_000_000),
+                'dur': max(1, int(span['duration'] * 1_000_000)),
+                'pid': 1,
+                'tid': span['tid'],
+                'args': span['attrs']
+            })
+            
+        chrome_path = Path(output_dir) / TRACE_CHROME_FILE
+        with open(chrome_path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+            
+        return [jsonl_path, chrome_path]
@@ -11,6 +11,8 @@ from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 
 from workflow_parser import WorkflowParser, WorkflowDefinition
+from workflow_ratelimit import MCPRateLimiter
+from workflow_handlers import HandlerRegistry
 
 @dataclass
 class ValidationResult:
@@ -116,12 +118,11 @@ class WorkflowValidator:
                     
             return False
             
-        # Check agent capabilities
-        for stage in workflow.stages:
-            for agent in stage.recommended_agents:
-                capabilities = self._get_agent_capabilities(agent)
-                if not capabilities:
-                    warnings.append(f"Could not verify capabilities for agent: {agent}")
+        # Check agent capabilities (once per agent - large workflows reuse the same few)
+        for agent in sorted(required_agents):
+            capabilities = self._get_agent_capabilities(agent)
+            if not capabilities:
+                warnings.append(f"Could not verify capabilities for agent: {agent}")
                     
         return True
         
@@ -192,6 +193,7 @@ class WorkflowValidator:
         agent_usage = {}
         mcp_usage = {}
         no_conflicts = True
+        rate_limiter = MCPRateLimiter(self.config_manager)
         
         # Track agent usage across stages
         for i, stage in enumerate(workflow.stages):
@@ -205,10 +207,11 @@ class WorkflowValidator:
                         
                 agent_usage[agent] = i
                 
-            # Check MCP rate limiting potential
+            # Check MCP rate limiting potential (configured limits are enforced at runtime)
             for mcp in stage.suggested_mcps:
-                if mcp in mcp_usage:
+                if mcp in mcp_usage and not rate_limiter.has_limits(mcp):
                     warnings.append(f"MCP {mcp} used in multiple stages - check rate limits")
+                    suggestions.append(f"Declare limits for {mcp} under [mcps.{mcp}] (requests_per_minute, burst, max_concurrent)")
                 mcp_usage[mcp] = i
                 
         return no_conflicts
@@ -241,6 +244,12 @@ class WorkflowValidator:
                 if dep not in stage_names:
                     errors.append(f"Stage '{stage.name}' depends on non-existent stage: {dep}")
                     
+        registry = HandlerRegistry(self.ccc_root / 'templates')
+        for stage in workflow.stages:
+            if stage.handler and not registry.is_known(stage.handler):
+                errors.append(f"Stage '{stage.name}' uses unknown handler: {stage.handler}")
+                suggestions.append(f"Available handlers: {', '.join(registry.available())}")
+                    
     def _discover_available_agents(self) -> List[str]:
         """Discover available CCC agents"""
         
@@ -371,26 +380,28 @@ class WorkflowValidator:
             stage_name = f"Stage {i+1}"
             graph[stage_name] = stage.dependencies
             
-        # Simple cycle detection using DFS
-        def has_cycle(node, visited, rec_stack):
-            visited.add(node)
-            rec_stack.add(node)
-            
-            for neighbor in graph.get(node, []):
-                if neighbor not in visited:
-                    if has_cycle(neighbor, visited, rec_stack):
-                        return True
-                elif neighbor in rec_stack:
-                    return True
-                    
-            rec_stack.remove(node)
-            return False
-            
+        # Iterative DFS - a recursive one overflows the stack on long dependency chains
         visited = set()
         
-        for node in graph:
-            if node not in visited:
-                if has_cycle(node, visited, set()):
-                    return True
+        for root in graph:
+            if root in visited:
+                continue
+            visited.add(root)
+            rec_stack = {root}
+            stack = [(root, iter(graph[root]))]
+            
+            while stack:
+                node, neighbors = stack[-1]
+                for neighbor in neighbors:
+                    if neighbor in rec_stack:
+                        return True
+                    if neighbor not in visited:
+                        visited.add(neighbor)
+                        rec_stack.add(neighbor)
+                        stack.append((neighbor, iter(graph.get(neighbor, []))))
+                        break
+                else:
+                    rec_stack.remove(node)
+                    stack.pop()
                     
         return False
\ No newline at end of file
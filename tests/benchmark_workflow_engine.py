@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the CCC workflow engine
+Times parsing, validation, scheduling and execution of generated workflows from 10 to 10,000 stages.
+
+Not collected by pytest - run it directly:
+    python tests/benchmark_workflow_engine.py
+    python tests/benchmark_workflow_engine.py --sizes 10,100 --shapes chain,fanout
+    python tests/benchmark_workflow_engine.py --baseline output/benchmarks/engine_previous.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# Add CCC lib to path
+CCC_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(CCC_ROOT / "bin" / "lib"))
+
+from config_manager import ConfigManager
+from workflow_parser import WorkflowParser
+from workflow_validator import WorkflowValidator
+from workflow_scheduler import StageGraph, StageScheduler
+from workflow_cancellation import CancellationToken
+from workflow_clock import VirtualClock, InlinePool
+from workflow_simulation import SYNTHETIC_SHAPES, synthetic_workflow, simulate_workflow
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+TIME_METRICS = ['parse_seconds', 'validate_seconds', 'schedule_ms_per_stage', 'engine_overhead_ms_per_stage']
+# Slowdowns adding up to less than this per case are timer noise, not regressions
+MIN_REGRESSION_SECONDS = 0.05
+
+def render_markdown(workflow) -> str:
+    """Suggested-workflow markdown for a generated definition, in the format parse_suggested reads"""
+    
+    lines = [f"# {workflow.name}", "", "## Description", workflow.description, "",
+             "## Goal", workflow.goal, "", "## Parameters",
+             f"- client_slug: {workflow.client_slug} (required)", "", "## Stages", ""]
+             
+    for num, stage in enumerate(workflow.stages, 1):
+        lines.extend([
+            f"### Stage {num}: {stage.name}",
+            f"**Description**: {stage.description}",
+            f"**Dependencies**: {', '.join(stage.dependencies) or 'None'}",
+            f"**Recommended Agents**: {', '.join(stage.recommended_agents)}"
+        ])
+        if stage.suggested_mcps:
+            lines.append(f"**Suggested MCPs**: {', '.join(stage.suggested_mcps)}")
+        lines.append("")
+        
+    return '\n'.join(lines)
+
+def timed(func, repeat: int = 1):
+    """Best-of-`repeat` wall time of func(); returns (seconds, last result)"""
+    
+    best, result = None, None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def bench_schedule(workflow, workers: int) -> float:
+    """Scheduler bookkeeping per stage (ms) with no-op stages on a virtual clock"""
+    
+    clock = VirtualClock()
+    scheduler = StageScheduler(StageGraph(workflow.stages), max_workers=workers, error_handling='stop',
+                               cancel_token=CancellationToken(clock=clock),
+                               pool=InlinePool(clock, workers), clock=clock)
+                               
+    def execute(num, token):
+        clock.sleep(1.0)
+        return {'success': True, 'stage_num': num}
+        
+    elapsed, outcome = timed(lambda: scheduler.run(execute))
+    if outcome.failed or len(outcome.completed) != len(workflow.stages):
+        raise RuntimeError(f"Scheduler benchmark did not complete all stages ({len(outcome.completed)}/{len(workflow.stages)})")
+    return elapsed / len(workflow.stages) * 1000
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    
+    # VmHWM resets on exec; ru_maxrss on Linux keeps the parent's peak from before the exec
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+        
+    import resource
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    
+def bench_execute(config_file: str, workflow_path: str, workers: int) -> dict:
+    """Full executor run on a virtual clock; runs in a fresh process so peak RSS is its own"""
+    
+    config_manager = ConfigManager(config_file)
+    workflow = WorkflowParser(config_manager).parse_suggested(Path(workflow_path))
+    rss_before = peak_rss_mb()
+    
+    stats = simulate_workflow(config_manager, workflow, workers=workers, jitter=0.0)
+    peak_rss = peak_rss_mb()
+    
+    return {
+        'execute_success': stats['success'],
+        'execute_wall_seconds': stats['wall_time'],
+        'engine_overhead_ms_per_stage': stats['overhead_per_stage_ms'],
+        'simulated_seconds': stats['simulated_time'],
+        'critical_path_seconds': stats['critical_path'],
+        'peak_rss_mb': peak_rss,
+        'rss_growth_mb': peak_rss - rss_before
+    }
+
+def run_case(shape: str, size: int, work_dir: Path, config_file: Path, workers: int,
+             process_pool: ProcessPoolExecutor, execute: bool) -> dict:
+    """Benchmark one generated workflow"""
+    
+    workflow = synthetic_workflow(size, shape=shape, name=f'bench-{shape}-{size}')
+    workflow_path = work_dir / f'{workflow.name}.md'
+    workflow_path.write_text(render_markdown(workflow), encoding='utf-8')
+    
+    config_manager = ConfigManager(str(config_file))
+    parser = WorkflowParser(config_manager)
+    validator = WorkflowValidator(config_manager)
+    # Repeat small cases so timer resolution doesn't dominate
+    repeat = max(1, min(5, 1000 // size))
+    
+    parse_seconds, parsed = timed(lambda: parser.parse_suggested(workflow_path), repeat)
+    validate_seconds, validation = timed(lambda: validator.validate_workflow(workflow_path), repeat)
+    if len(parsed.stages) != size:
+        raise RuntimeError(f"Parsed {len(parsed.stages)} stages from a {size}-stage workflow")
+        
+    result = {
+        'shape': shape,
+        'stages': size,
+        'dependencies': sum(len(stage.dependencies) for stage in parsed.stages),
+        'markdown_bytes': workflow_path.stat().st_size,
+        'parse_seconds': parse_seconds,
+        'validate_seconds': validate_seconds,
+        'validation_valid': validation.is_valid,
+        'validation_errors': validation.errors[:3],
+        'schedule_ms_per_stage': bench_schedule(parsed, workers)
+    }
+    
+    if execute:
+        result.update(process_pool.submit(bench_execute, str(config_file), str(workflow_path), workers).result())
+        
+    return result
+
+def compare(results: list, baseline_path: Path, threshold: float) -> list:
+    """Time metrics that got slower than `threshold` x their baseline value"""
+    
+    with open(baseline_path, 'r') as f:
+        baseline = {(entry['shape'], entry['stages']): entry for entry in json.load(f)['results']}
+        
+    regressions = []
+    for entry in results:
+        previous = baseline.get((entry['shape'], entry['stages']))
+        if not previous:
+            continue
+        for metric in TIME_METRICS:
+            before, after = previous.get(metric), entry.get(metric)
+            if not (before and after):
+                continue
+            # Per-stage metrics are in ms; compare their total cost over the case
+            scale = entry['stages'] / 1000 if metric.endswith('_ms_per_stage') else 1
+            if after / before > threshold and (after - before) * scale >= MIN_REGRESSION_SECONDS:
+                regressions.append(f"{entry['shape']}/{entry['stages']} {metric}: "
+                                   f"{before:.4g} -> {after:.4g} ({after / before:.2f}x)")
+    return regressions
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=CCC_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Workflow engine scalability benchmarks')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Comma-separated stage counts')
+    parser.add_argument('--shapes', default=','.join(SYNTHETIC_SHAPES),
+                        help=f"Comma-separated dependency shapes ({', '.join(SYNTHETIC_SHAPES)})")
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Stage workers for scheduling and execution')
+    parser.add_argument('--no-execute', action='store_true',
+                        help='Only benchmark parsing, validation and scheduling')
+    parser.add_argument('--output',
+                        help='Results file (default: output/benchmarks/engine_<timestamp>.json)')
+    parser.add_argument('--baseline',
+                        help='Earlier results file to compare against; exits 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Slowdown ratio reported as a regression (default: 1.25)')
+    args = parser.parse_args()
+    
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    shapes = [shape.strip() for shape in args.shapes.split(',') if shape.strip()]
+    output = Path(args.output) if args.output else \
+        CCC_ROOT / 'output' / 'benchmarks' / f"engine_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        
+    results = []
+    with tempfile.TemporaryDirectory(prefix='ccc-bench-') as tmp:
+        work_dir = Path(tmp)
+        config_file = work_dir / 'benchmark.yaml'
+        config_file.write_text(json.dumps({
+            'execution': {'max_parallel_tasks': args.workers, 'error_handling': 'stop'},
+            'storage': {'reports_base_dir': str(work_dir / 'reports'), 'temp_dir': str(work_dir / 'tmp')}
+        }))
+        
+        print(f"⏱️  Benchmarking {len(shapes)} shapes x {len(sizes)} sizes on {args.workers} workers")
+        print(f"{'shape':<9}{'stages':>7}{'parse':>10}{'validate':>10}{'sched/stg':>11}{'exec/stg':>10}{'peak RSS':>10}")
+        
+        # A fresh spawned process per execution keeps each case's peak RSS separate
+        spawn = multiprocessing.get_context('spawn')
+        for shape in shapes:
+            for size in sizes:
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as process_pool:
+                    entry = run_case(shape, size, work_dir, config_file, args.workers, process_pool,
+                                     execute=not args.no_execute)
+                results.append(entry)
+                
+                execution = (f"{entry['engine_overhead_ms_per_stage']:>8.2f}ms{entry['peak_rss_mb']:>8.0f}MB"
+                             if 'peak_rss_mb' in entry else f"{'-':>10}{'-':>10}")
+                print(f"{shape:<9}{size:>7}{entry['parse_seconds'] * 1000:>8.1f}ms"
+                      f"{entry['validate_seconds'] * 1000:>8.1f}ms{entry['schedule_ms_per_stage']:>9.3f}ms{execution}")
+                      
+    report = {
+        'benchmark': 'workflow_engine',
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': args.workers,
+        'results': results
+    }
+    
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📁 Results saved to: {output}")
+    
+    if args.baseline:
+        regressions = compare(results, Path(args.baseline), args.threshold)
+        for line in regressions:
+            print(f"   ❌ {line}")
+        print(f"{'❌' if regressions else '✅'} {len(regressions)} regressions against {args.baseline}")
+        return 1 if regressions else 0
+        
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
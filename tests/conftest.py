@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Shared fixtures for the CCC workflow tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from config_manager import ConfigManager
+
+@pytest.fixture
+def config_manager(tmp_path):
+    """ConfigManager whose reports, caches and indexes all live under tmp_path"""
+    
+    config = {
+        'execution': {'max_parallel_tasks': 3, 'timeout_seconds': 300, 'max_retries': 1,
+                      'retry_delay': 0.1, 'error_handling': 'retry'},
+        'storage': {'reports_base_dir': str(tmp_path / 'reports'), 'temp_dir': str(tmp_path / 'tmp')},
+        'events': {'enabled': False}
+    }
+    config_file = tmp_path / 'config.yaml'
+    config_file.write_text(yaml.safe_dump(config))
+    return ConfigManager(str(config_file))
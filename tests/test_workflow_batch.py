@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for fanning one workflow out across many clients
+"""
+
+import sys
+import json
+import time
+import _thread
+import threading
+from pathlib import Path
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_batch import BatchExecutor, parse_client_list
+from workflow_executor import WorkflowExecutor
+
+WORKFLOW = """# batch_test
+
+## Description
+Batch fan-out
+
+## Goal
+test
+
+## Parameters
+- client_slug: placeholder (required)
+
+## Stages
+
+### Stage 1: Prepare
+**Description**: prepare
+**Dependencies**: None
+**Recommended Agents**: DataPipelineAgent
+
+### Stage 2: Summarise
+**Description**: summarise
+**Dependencies**: Stage 1
+**Recommended Agents**: DataPipelineAgent
+"""
+
+def write_workflow(tmp_path):
+    path = tmp_path / 'batch_test.md'
+    path.write_text(WORKFLOW)
+    return path
+
+def test_client_list_merges_arguments_and_file(tmp_path):
+    """Comma lists and files combine in first-seen order without duplicates or comments"""
+    
+    clients_file = tmp_path / 'clients.txt'
+    clients_file.write_text("# nightly\nglobex\ninitech, acme  # shared\n\n")
+    
+    assert parse_client_list('acme, umbrella,,acme', str(clients_file)) == ['acme', 'umbrella', 'globex', 'initech']
+
+def test_every_client_gets_its_own_run_on_a_shared_pool(config_manager, tmp_path):
+    """Each client runs in its own reports tree; the batch writes one summary"""
+    
+    batch = BatchExecutor(config_manager, config_manager.custom_config_file)
+    workflow_path = write_workflow(tmp_path)
+    
+    summary = batch.execute(workflow_path, ['acme', 'globex', 'initech'], use_cache=False)
+    
+    assert summary['succeeded'] == 3 and not summary['interrupted']
+    directories = {entry['client_slug']: Path(entry['output_directory']) for entry in summary['clients']}
+    for slug, directory in directories.items():
+        assert slug in directory.parts
+        assert (directory / 'manifest.json').exists()
+    # Clients share the batch's breakers and limits, not copies of them
+    assert all(executor.circuit_breakers is batch.circuit_breakers for executor in batch.executors.values())
+    assert all(executor.rate_limiter is batch.rate_limiter for executor in batch.executors.values())
+    assert all(executor.mcp_hedger is batch.mcp_hedger for executor in batch.executors.values())
+    assert json.loads(Path(summary['summary_file']).read_text())['total_clients'] == 3
+
+def test_interrupt_cancels_every_client_run(config_manager, tmp_path):
+    """Ctrl-C during a batch cancels all client runs instead of waiting for them"""
+    
+    batch = BatchExecutor(config_manager, config_manager.custom_config_file)
+    workflow_path = write_workflow(tmp_path)
+    workflow_path.write_text(WORKFLOW.replace('Stage 1: Prepare', 'Stage 1: Data Collection'))
+    threading.Timer(0.5, _thread.interrupt_main).start()
+    
+    started = time.monotonic()
+    summary = batch.execute(workflow_path, ['acme', 'globex'], use_cache=False)
+    
+    assert time.monotonic() - started < 5
+    assert summary['interrupted']
+    assert summary['succeeded'] == 0
+    assert all(executor.cancel_token.cancelled for executor in batch.executors.values())
+
+def test_interrupt_during_setup_cancels_the_run(config_manager, tmp_path, monkeypatch):
+    """Ctrl-C while clients are still archiving inputs stops them before any stage starts"""
+    
+    archive = WorkflowExecutor._archive_input_files
+    
+    def slow_archive(executor, workflow):
+        time.sleep(1.0)  # e.g. hashing large inputs
+        archive(executor, workflow)
+        
+    monkeypatch.setattr(WorkflowExecutor, '_archive_input_files', slow_archive)
+    batch = BatchExecutor(config_manager, config_manager.custom_config_file)
+    threading.Timer(0.3, _thread.interrupt_main).start()
+    
+    started = time.monotonic()
+    summary = batch.execute(write_workflow(tmp_path), ['acme', 'globex'], use_cache=False)
+    
+    assert time.monotonic() - started < 5
+    assert summary['interrupted'] and summary['succeeded'] == 0
+    for entry in summary['clients']:
+        assert entry['status'] != 'completed'
+        assert entry.get('stages_completed', 0) == 0
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed stage result cache
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_cache import StageResultCache
+from workflow_executor import WorkflowExecutor
+from test_workflow_scheduler import make_stages
+from test_workflow_resume import Steps, write_workflow
+
+def test_key_changes_with_stage_parameters_inputs_and_client():
+    """Anything that can change a stage's output changes its key"""
+    
+    stage = make_stages({1: []})[0]
+    key = StageResultCache.key_for(stage, {'depth': 1}, {'inputs/a.csv': 'aaa'}, 'acme')
+    
+    assert key == StageResultCache.key_for(stage, {'depth': 1}, {'inputs/a.csv': 'aaa'}, 'acme')
+    assert key != StageResultCache.key_for(stage, {'depth': 2}, {'inputs/a.csv': 'aaa'}, 'acme')
+    assert key != StageResultCache.key_for(stage, {'depth': 1}, {'inputs/a.csv': 'bbb'}, 'acme')
+    assert key != StageResultCache.key_for(stage, {'depth': 1}, {'inputs/a.csv': 'aaa'}, 'globex')
+    
+    stage.description = 'changed'
+    assert key != StageResultCache.key_for(stage, {'depth': 1}, {'inputs/a.csv': 'aaa'}, 'acme')
+
+def test_get_returns_what_put_stored(tmp_path):
+    """A put entry is served back by key"""
+    
+    cache = StageResultCache(tmp_path / 'cache')
+    
+    assert cache.get('ab' * 32) is None
+    cache.put('ab' * 32, {'success': True, 'outputs': ['x']}, 'wf', 'Stage 1')
+    
+    assert cache.get('ab' * 32) == {'success': True, 'outputs': ['x']}
+    assert cache.stats()['entries'] == 1
+
+def test_corrupt_entries_are_dropped_as_misses(tmp_path):
+    """An unreadable entry is a miss and is removed"""
+    
+    cache = StageResultCache(tmp_path / 'cache')
+    cache.put('cd' * 32, {'success': True}, 'wf', 'Stage 1')
+    cache._entry_path('cd' * 32).write_text('{not json')
+    
+    assert cache.get('cd' * 32) is None
+    assert cache.stats()['entries'] == 0
+
+def test_eviction_removes_least_recently_used_entries(tmp_path):
+    """Over the size budget, the entries read longest ago go first"""
+    
+    cache = StageResultCache(tmp_path / 'cache')
+    payload = {'success': True, 'outputs': ['x' * 1000]}
+    keys = [f'{n:02d}' * 32 for n in range(4)]
+    for age, key in enumerate(keys):
+        cache.put(key, payload, 'wf', key)
+        os.utime(cache._entry_path(key), (1000 + age, 1000 + age))
+        
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get(keys[0]) is not None
+    cache.max_bytes = cache.stats()['total_bytes']
+    cache.put('99' * 32, payload, 'wf', 'newest')
+    
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(key) is not None for key in keys[2:])
+    assert cache.stats()['total_bytes'] <= cache.max_bytes
+
+def test_invalidate_by_workflow_and_stage(tmp_path):
+    """invalidate() removes only the entries matching its filters"""
+    
+    cache = StageResultCache(tmp_path / 'cache')
+    cache.put('01' * 32, {'success': True}, 'audit', 'Fetch')
+    cache.put('02' * 32, {'success': True}, 'audit', 'Report')
+    cache.put('03' * 32, {'success': True}, 'other', 'Fetch')
+    
+    assert cache.invalidate(workflow_name='audit', stage_name='Fetch') == 1
+    assert cache.invalidate(workflow_name='audit') == 1
+    assert cache.get('03' * 32) is not None
+    assert cache.invalidate() == 1
+
+def test_executor_reuses_cached_results_across_runs(config_manager, tmp_path):
+    """A second run of an unchanged workflow is served from the cache"""
+    
+    workflow_path = write_workflow(tmp_path)
+    steps = Steps()
+    
+    for _ in range(2):
+        executor = WorkflowExecutor(config_manager)
+        executor.handlers.register('step', steps)
+        assert executor.execute_workflow(workflow_path).success
+        
+    assert steps.calls == [1, 2, 3]
+
+def test_cached_results_are_not_shared_between_clients(config_manager, tmp_path):
+    """The same workflow for another client runs its stages again"""
+    
+    steps = Steps()
+    for client in ('acme', 'globex'):
+        workflow_path = write_workflow(tmp_path)
+        workflow_path.write_text(workflow_path.read_text().replace('client_slug: acme', f'client_slug: {client}'))
+        executor = WorkflowExecutor(config_manager)
+        executor.handlers.register('step', steps)
+        result = executor.execute_workflow(workflow_path)
+        assert result.success
+        assert client in result.output_directory.parts
+        
+    assert steps.calls == [1, 2, 3, 1, 2, 3]
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for cooperative cancellation tokens
+"""
+
+import gc
+import sys
+import time
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_cancellation import CancellationToken, StageCancelled
+from workflow_clock import VirtualClock
+from workflow_executor import WorkflowExecutor
+from test_workflow_batch import WORKFLOW
+
+def test_cancel_propagates_to_children_with_the_reason():
+    """Children (and their children) are cancelled with the parent's reason"""
+    
+    run = CancellationToken()
+    stage = run.child()
+    call = stage.child()
+    
+    run.cancel('interrupted')
+    
+    assert stage.cancelled and call.cancelled
+    assert call.reason == 'interrupted'
+    
+def test_cancelling_a_child_leaves_the_parent_running():
+    """A stage timeout must not cancel the whole run"""
+    
+    run = CancellationToken()
+    stage = run.child()
+    
+    stage.cancel('timeout')
+    
+    assert stage.cancelled
+    assert not run.cancelled
+    
+def test_child_of_a_cancelled_token_starts_cancelled():
+    """Stages submitted after cancellation see it immediately"""
+    
+    run = CancellationToken()
+    run.cancel('interrupted')
+    
+    assert run.child().cancelled
+    assert run.child().reason == 'interrupted'
+    
+def test_finished_children_are_not_kept_alive():
+    """A long-lived run token must not accumulate the tokens of finished stages"""
+    
+    run = CancellationToken()
+    kept = run.child()
+    for _ in range(100):
+        run.child()
+    gc.collect()
+    
+    assert list(run._children) == [kept]
+    run.cancel('interrupted')
+    assert kept.cancelled
+    
+def test_first_reason_wins():
+    """Cancelling again does not overwrite the original reason"""
+    
+    token = CancellationToken()
+    token.cancel('timeout')
+    token.cancel('interrupted')
+    
+    assert token.reason == 'timeout'
+    
+def test_sleep_wakes_and_raises_when_cancelled():
+    """token.sleep() returns control as soon as another thread cancels the token"""
+    
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel, args=('timeout',)).start()
+    
+    started = time.monotonic()
+    with pytest.raises(StageCancelled, match='timeout'):
+        token.sleep(30)
+    assert time.monotonic() - started < 5
+    
+def test_sleep_advances_a_virtual_clock():
+    """Under a virtual clock sleep() moves time forward instead of blocking"""
+    
+    clock = VirtualClock(start=0.0)
+    token = CancellationToken(clock=clock).child()
+    
+    token.sleep(3600)
+    
+    assert clock.time() == pytest.approx(3600)
+    
+def test_raise_if_cancelled():
+    """Handlers doing CPU work poll the token between chunks"""
+    
+    token = CancellationToken()
+    token.raise_if_cancelled()
+    
+    token.cancel()
+    with pytest.raises(StageCancelled, match='cancelled'):
+        token.raise_if_cancelled()
+
+def test_timed_out_stage_reports_one_terminal_event(config_manager, tmp_path):
+    """A stage timeout emits a single stage_finished (status timeout) and is not retried"""
+    
+    workflow_path = tmp_path / 'timeout_test.md'
+    workflow_path.write_text(WORKFLOW.replace('**Recommended Agents**: DataPipelineAgent\n',
+                                              '**Recommended Agents**: DataPipelineAgent\n'
+                                              '**Handler**: slow\n**Timeout**: 1s\n', 1))
+    executor = WorkflowExecutor(config_manager)
+    executor.use_cache = False
+    attempts = []
+    executor.handlers.register('slow', lambda context, config: attempts.append(1) or context.token.sleep(30))
+    events = []
+    executor.events.emit = lambda event_type, **data: events.append((event_type, data))
+    
+    result = executor.execute_workflow(workflow_path)
+    
+    assert not result.success
+    finished = [data for event_type, data in events if event_type == 'stage_finished' and data['stage'] == 1]
+    assert [data['status'] for data in finished] == ['timeout']
+    assert attempts == [1]
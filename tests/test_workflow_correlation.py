@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for reading the tabular inputs of analysis stages
+"""
+
+import sys
+import gzip
+from pathlib import Path
+
+import pytest
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_correlation import CorrelationEngine, is_tabular, correlation_available
+from workflow_anomaly import AnomalyDetector
+from workflow_artifacts import zstd_available
+
+pytestmark = pytest.mark.skipif(not correlation_available(), reason="needs numpy")
+
+def write_inputs(tmp_path):
+    """One correlated CSV (gzip compressed) plus files that can't be read"""
+    
+    rows = ['clicks,impressions,position'] + [f"{i},{i * 10 + i % 3},{50 - i % 7}" for i in range(1, 60)]
+    good = tmp_path / 'gsc.csv.gz'
+    with gzip.open(good, 'wt') as f:
+        f.write('\n'.join(rows) + '\n')
+    binary = tmp_path / 'export.csv'
+    binary.write_bytes(b'\xff\xfe\x00\x81' * 64)
+    broken = tmp_path / 'crawl.json'
+    broken.write_text('{"rows": [{"a": 1}')
+    return [good, binary, broken]
+
+def test_zst_inputs_need_zstandard(tmp_path):
+    """.zst files only count as tabular when they can be decompressed"""
+    
+    assert is_tabular(tmp_path / 'keywords.csv.gz')
+    assert is_tabular(tmp_path / 'keywords.csv.zst') == zstd_available()
+    assert not is_tabular(tmp_path / 'notes.txt')
+
+def test_unreadable_files_are_skipped_not_fatal(tmp_path):
+    """A file that fails to decode or parse is reported; the other tables are still analysed"""
+    
+    discovery = CorrelationEngine().discover(write_inputs(tmp_path))
+    
+    assert [table['source'] for table in discovery['tables']] == ['gsc.csv.gz']
+    assert discovery['correlations']
+    skipped = {entry['source']: entry['error'] for entry in discovery['skipped_files']}
+    assert set(skipped) == {'export.csv', 'crawl.json'}
+    assert skipped['export.csv'].startswith('UnicodeDecodeError')
+
+def test_anomaly_detection_skips_unreadable_files(tmp_path):
+    """The anomaly detector shares the reader and skips the same files"""
+    
+    detection = AnomalyDetector().detect(write_inputs(tmp_path)[1:])
+    
+    assert detection['tables'] == []
+    assert len(detection['skipped_files']) == 2
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Tests for the stage coordinator's leases
+Dispatch to workers, expiry and re-dispatch of leases whose worker went
+quiet, cancellation and closing a run while its stages are queued.
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_parser import WorkflowDefinition
+from workflow_scheduler import StageGraph
+from workflow_distributed import StageCoordinator, _Lease
+from workflow_cancellation import CancellationToken
+from test_workflow_scheduler import make_stages
+
+def make_run(tmp_path):
+    """Executor stand-in with the attributes the coordinator reads, plus its workflow"""
+    
+    stages = make_stages({1: [], 2: [1]})
+    workflow = WorkflowDefinition(name='audit', description='', goal='', context='', requirements=[],
+                                  expected_challenges=[], parameters={}, inputs={}, stages=stages,
+                                  expected_outputs=[], template_selection=None, client_slug='acme',
+                                  estimated_time=None)
+    executor = SimpleNamespace(current_workflow=workflow, stage_graph=StageGraph(stages), output_dir=tmp_path,
+                               input_hashes={}, use_cache=False, manifest=SimpleNamespace(stage=lambda num: None),
+                               events=SimpleNamespace(emit=lambda *args, **kwargs: None),
+                               stage_demand=lambda stage: {'cpu': 1.0}, _record_output=lambda *args: None)
+    return executor, workflow
+
+def start_stage(coordinator, executor, workflow, stage_num, token=None):
+    """run_stage() on a background thread, as the scheduler calls it; returns the thread and its result"""
+    
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(
+        coordinator.run_stage(executor, workflow, stage_num, token or CancellationToken())), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not coordinator._queue and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return thread, result
+
+def start_reaper(coordinator):
+    """Expire leases in the background without opening a listening socket"""
+    
+    thread = threading.Thread(target=coordinator._expire_leases, daemon=True)
+    thread.start()
+    return thread
+
+def test_worker_result_completes_the_stage(tmp_path):
+    """A leased stage carries its dependencies and demand; the worker's result is returned"""
+    
+    coordinator = StageCoordinator('unix:' + str(tmp_path / 'c.sock'))
+    executor, workflow = make_run(tmp_path)
+    coordinator.open_run(executor, workflow)
+    thread, result = start_stage(coordinator, executor, workflow, 2)
+    
+    lease = coordinator.handle({'op': 'lease', 'worker': 'a', 'wait': 1})['lease']
+    
+    assert lease['stage_num'] == 2 and lease['dependencies'] == {1: None}
+    assert lease['demand'] == {'cpu': 1.0}
+    assert coordinator.handle({'op': 'run', 'run_id': lease['run_id']})['run']['client_slug'] == 'acme'
+    assert coordinator.handle({'op': 'complete', 'worker': 'a', 'lease_id': lease['lease_id'],
+                               'result': {'success': True, 'stage_num': 2}})['accepted']
+    thread.join(5)
+    assert result == {'success': True, 'stage_num': 2}
+
+def test_expired_lease_is_redispatched_and_the_late_result_dropped(tmp_path):
+    """A worker that stops heartbeating loses its lease to the next worker"""
+    
+    coordinator = StageCoordinator('unix:' + str(tmp_path / 'c.sock'), lease_ttl=0.3)
+    executor, workflow = make_run(tmp_path)
+    coordinator.open_run(executor, workflow)
+    thread, result = start_stage(coordinator, executor, workflow, 1)
+    start_reaper(coordinator)
+    
+    try:
+        first = coordinator._lease('a', wait=1)
+        second = coordinator._lease('b', wait=3)
+        
+        assert second is not None and second['lease_id'] == first['lease_id']
+        assert coordinator._leases[first['lease_id']].dispatches == 2
+        assert coordinator._heartbeat('a', [first['lease_id']]) == {first['lease_id']: 'lease_lost'}
+        assert not coordinator._complete('a', first['lease_id'], {'success': True, 'worker': 'a'}, [])
+        assert coordinator._complete('b', second['lease_id'], {'success': True, 'worker': 'b'}, [])
+        thread.join(5)
+        assert result['worker'] == 'b'
+    finally:
+        coordinator.shutdown()
+
+def test_stage_fails_after_max_dispatches(tmp_path):
+    """Once every allowed dispatch has expired the stage fails instead of queueing forever"""
+    
+    coordinator = StageCoordinator('unix:' + str(tmp_path / 'c.sock'), lease_ttl=0.2, max_dispatches=1)
+    executor, workflow = make_run(tmp_path)
+    coordinator.open_run(executor, workflow)
+    thread, result = start_stage(coordinator, executor, workflow, 1)
+    start_reaper(coordinator)
+    
+    try:
+        coordinator._lease('a', wait=1)
+        thread.join(5)
+        
+        assert not result['success']
+        assert 'Lease expired on 1 workers' in result['error']
+        assert not coordinator._queue and not coordinator._leases
+    finally:
+        coordinator.shutdown()
+
+def test_cancelled_stage_tells_its_worker_why(tmp_path):
+    """Cancelling a leased stage returns at once; the worker learns the reason on its next heartbeat"""
+    
+    coordinator = StageCoordinator('unix:' + str(tmp_path / 'c.sock'))
+    executor, workflow = make_run(tmp_path)
+    coordinator.open_run(executor, workflow)
+    token = CancellationToken()
+    thread, result = start_stage(coordinator, executor, workflow, 1, token)
+    lease = coordinator._lease('a', wait=1)
+    
+    token.cancel('timeout')
+    thread.join(5)
+    
+    assert result['cancelled']
+    assert coordinator._heartbeat('a', [lease['lease_id']]) == {lease['lease_id']: 'timeout'}
+    assert not coordinator._complete('a', lease['lease_id'], {'success': True}, [])
+
+def test_closed_runs_leave_nothing_to_lease(tmp_path):
+    """close_run() drops its queued and running leases; stale queue entries are skipped"""
+    
+    coordinator = StageCoordinator('unix:' + str(tmp_path / 'c.sock'))
+    closed, workflow = make_run(tmp_path)
+    coordinator.open_run(closed, workflow)
+    token = CancellationToken()
+    start_stage(coordinator, closed, workflow, 1, token)
+    running = coordinator._lease('a', wait=1)
+    start_stage(coordinator, closed, workflow, 2, token)
+    
+    coordinator.close_run(closed)
+    
+    try:
+        assert not coordinator._queue and not coordinator._leases
+        assert coordinator._heartbeat('a', [running['lease_id']]) == {running['lease_id']: 'lease_lost'}
+        assert coordinator._lease('b', wait=0.1) is None
+        
+        live, live_workflow = make_run(tmp_path)
+        coordinator.open_run(live, live_workflow)
+        # A lease of the closed run that was already on its way back into the queue
+        coordinator._queue.append(_Lease('stale', running['run_id'], closed, 1, CancellationToken()))
+        start_stage(coordinator, live, live_workflow, 1, token)
+        
+        lease = coordinator._lease('b', wait=1)
+        assert lease['lease_id'] != 'stale'
+        assert lease['run_id'] != running['run_id']
+    finally:
+        token.cancel('test finished')
+
+def test_open_addresses_need_a_token(tmp_path):
+    """Listening beyond loopback without a token is refused before the socket is bound"""
+    
+    with pytest.raises(ValueError, match='without a token'):
+        StageCoordinator('0.0.0.0:0').start()
+    with pytest.raises(ValueError, match='without a token'):
+        StageCoordinator(':0').start()
+        
+    for coordinator in (StageCoordinator('127.0.0.1:0'), StageCoordinator('0.0.0.0:0', token='secret')):
+        coordinator.start()
+        coordinator.shutdown()
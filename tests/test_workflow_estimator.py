@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests for stage duration history and workflow time estimates
+"""
+
+import sys
+from pathlib import Path
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_estimator import DurationHistory
+from workflow_interview import WorkflowInterview
+
+def test_history_keeps_the_latest_records_per_stage(tmp_path):
+    """Older durations of a stage are dropped and compacted out of the file"""
+    
+    path = tmp_path / 'history.jsonl'
+    history = DurationHistory(path, max_per_stage=3)
+    for seconds in range(10):
+        history.record('audit', {'name': 'Crawl'}, seconds)
+    history.record('audit', {'name': 'Report'}, 99)
+    
+    reloaded = DurationHistory(path, max_per_stage=3).records()
+    assert [r['seconds'] for r in reloaded if r['stage_name'] == 'Crawl'] == [7, 8, 9]
+    assert [r['seconds'] for r in reloaded if r['stage_name'] == 'Report'] == [99]
+    assert len(path.read_text().splitlines()) == 4
+
+def test_history_compacts_while_recording(tmp_path):
+    """A loaded history rewrites its file once dropped lines outnumber the kept ones"""
+    
+    path = tmp_path / 'history.jsonl'
+    history = DurationHistory(path, max_per_stage=2)
+    history.records()
+    for seconds in range(20):
+        history.record('audit', {'name': 'Crawl'}, seconds)
+        
+    assert len(path.read_text().splitlines()) <= 4
+    assert [r['seconds'] for r in history.records()][-2:] == [18, 19]
+
+def test_interview_estimate_overlaps_independent_stages(config_manager):
+    """Stages without dependencies on each other count once, as in the dry run"""
+    
+    history = DurationHistory.from_config(config_manager.get_storage_config())
+    for name in ('Crawl', 'Keywords', 'Report'):
+        for _ in range(3):
+            history.record('audit', {'name': name}, 600)
+    stages = [{'name': 'Crawl'}, {'name': 'Keywords'}, {'name': 'Report', 'dependencies': ['Stage 1', 'Stage 2']}]
+    
+    assert WorkflowInterview(config_manager)._estimate_execution_time(stages, {}) == "20-20"
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Tests for the stage handler registry's template commands
+"""
+
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+import workflow_handlers
+from workflow_handlers import HandlerRegistry, CommandCache
+
+def test_command_cache_imports_once_across_registries(tmp_path, monkeypatch):
+    """Registries sharing a cache import a command once, and again only after its file changes"""
+    
+    command = tmp_path / 'seo' / 'commands' / 'audit.py'
+    command.parent.mkdir(parents=True)
+    command.write_text("def execute(context, config):\n    return 1\n")
+    loaded = []
+    real = workflow_handlers.load_command
+    monkeypatch.setattr(workflow_handlers, 'load_command', lambda name, path: loaded.append(name) or real(name, path))
+    cache = CommandCache()
+    stage = SimpleNamespace(name='Audit', handler='seo/audit')
+    
+    for _ in range(2):
+        assert HandlerRegistry(tmp_path, command_cache=cache).resolve(stage)(None, {})['data'] == 1
+    assert loaded == ['seo/audit']
+    
+    command.write_text("def execute(context, config):\n    return 2\n")
+    os.utime(command, (command.stat().st_atime, command.stat().st_mtime + 5))
+    assert HandlerRegistry(tmp_path, command_cache=cache).resolve(stage)(None, {})['data'] == 2
+    assert loaded == ['seo/audit', 'seo/audit']
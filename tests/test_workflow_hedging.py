@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Tests for hedged MCP calls
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_hedging import MCPHedger, LatencyTracker, HedgePolicy
+from workflow_ratelimit import MCPRateLimiter
+from workflow_cancellation import CancellationToken, StageCancelled
+from workflow_executor import WorkflowExecutor
+from test_workflow_ratelimit import MCPConfig
+
+def make_hedger(tmp_path, mcps):
+    """Hedger over a rate limiter with the given [mcps.<name>] sections"""
+    return MCPHedger(MCPRateLimiter(MCPConfig(mcps)), LatencyTracker(tmp_path / 'latency.json'))
+
+def slow_first_attempt(seconds=5.0):
+    """MCP call whose first attempt hangs and every later one answers at once"""
+    
+    attempts = []
+    
+    def call(attempt_token):
+        attempts.append(attempt_token)
+        if len(attempts) == 1:
+            attempt_token.sleep(seconds)
+            return 'primary'
+        return 'hedge'
+        
+    return call, attempts
+
+def test_policy_is_opt_in():
+    """Only MCPs with hedge = true get a policy; hedge_after_ms is a fixed delay"""
+    
+    assert HedgePolicy.from_config({}) is None
+    policy = HedgePolicy.from_config({'hedge': True, 'hedge_after_ms': 250, 'hedge_max_ratio': 0.5})
+    assert policy.after == pytest.approx(0.25)
+    assert policy.max_ratio == 0.5
+
+def test_slow_call_is_hedged_and_the_loser_cancelled(tmp_path):
+    """Past the hedge delay a duplicate goes out; the first answer wins"""
+    
+    hedger = make_hedger(tmp_path, {'serp': {'hedge': True, 'hedge_after_ms': 50, 'hedge_max_ratio': 1.0}})
+    call, attempts = slow_first_attempt()
+    outcome = {}
+    
+    started = time.monotonic()
+    assert hedger.call('serp', call, CancellationToken(), outcome) == 'hedge'
+    
+    assert time.monotonic() - started < 2
+    assert outcome['hedged'] and outcome['hedge_won']
+    assert attempts[0].cancelled and attempts[0].reason == 'hedge lost'
+    assert hedger.summary()['serp']['hedge_wins'] == 1
+    # The sample is what the primary would have taken so far, not the hedge's own latency
+    assert hedger.latency.samples('serp')[0] >= 0.05
+
+def test_fast_calls_are_not_hedged(tmp_path):
+    """Calls answering before the delay go out once"""
+    
+    hedger = make_hedger(tmp_path, {'serp': {'hedge': True, 'hedge_after_ms': 500, 'hedge_max_ratio': 1.0}})
+    outcome = {}
+    
+    assert hedger.call('serp', lambda attempt_token: 'ok', CancellationToken(), outcome) == 'ok'
+    
+    assert not outcome['hedged']
+    assert hedger.summary()['serp']['calls'] == 1
+
+def test_hedges_respect_the_concurrency_cap(tmp_path):
+    """With the only slot held by the primary the hedge is skipped, not queued"""
+    
+    hedger = make_hedger(tmp_path, {'serp': {'hedge': True, 'hedge_after_ms': 20, 'hedge_max_ratio': 1.0,
+                                             'max_concurrent': 1}})
+    outcome = {}
+    
+    value = hedger.call('serp', lambda attempt_token: attempt_token.sleep(0.2) or 'primary',
+                        CancellationToken(), outcome)
+                        
+    assert value == 'primary'
+    assert not outcome['hedged']
+    assert hedger.summary()['serp']['hedge_skipped'] == 1
+
+def test_hedge_ratio_caps_the_share_of_hedged_calls(tmp_path):
+    """hedge_max_ratio = 0 turns duplicates off while still tracking latency"""
+    
+    hedger = make_hedger(tmp_path, {'serp': {'hedge': True, 'hedge_after_ms': 20, 'hedge_max_ratio': 0.0}})
+    call, attempts = slow_first_attempt(seconds=0.2)
+    
+    assert hedger.call('serp', call, CancellationToken()) == 'primary'
+    assert len(attempts) == 1
+
+def test_learned_delay_waits_for_enough_samples(tmp_path):
+    """Without a fixed delay, calls are hedged at the learned percentile once min_samples are on record"""
+    
+    hedger = make_hedger(tmp_path, {'serp': {'hedge': True, 'hedge_min_samples': 20}})
+    
+    for _ in range(19):
+        hedger.call('serp', lambda attempt_token: None, CancellationToken())
+    assert hedger.hedge_delay('serp') is None
+    
+    hedger.latency.record('serp', 1.0)
+    assert hedger.hedge_delay('serp') == pytest.approx(hedger.latency.percentile('serp', 95))
+    assert hedger.hedge_delay('plain') is None
+
+def test_primary_error_before_the_delay_is_raised(tmp_path):
+    """A primary that fails fast is left to the retry policy rather than hedged"""
+    
+    hedger = make_hedger(tmp_path, {'serp': {'hedge': True, 'hedge_after_ms': 500, 'hedge_max_ratio': 1.0}})
+    attempts = []
+    
+    def failing(attempt_token):
+        attempts.append(attempt_token)
+        raise ConnectionError("refused")
+        
+    with pytest.raises(ConnectionError):
+        hedger.call('serp', failing, CancellationToken())
+    assert len(attempts) == 1
+
+def test_cancelled_stage_stops_waiting(tmp_path):
+    """A stage timeout ends a hedged call promptly"""
+    
+    hedger = make_hedger(tmp_path, {'serp': {'hedge': True, 'hedge_after_ms': 5000}})
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel, args=('timeout',)).start()
+    
+    started = time.monotonic()
+    with pytest.raises(StageCancelled):
+        hedger.call('serp', lambda attempt_token: attempt_token.sleep(30), token)
+    assert time.monotonic() - started < 5
+
+def test_calls_stuck_behind_the_limits_are_not_counted(config_manager, tmp_path):
+    """A call cancelled while waiting for a concurrency slot never ran, so it adds no hedging stats"""
+    
+    executor = WorkflowExecutor(config_manager)
+    executor.mcp_hedger = make_hedger(tmp_path, {'serp': {'hedge': True, 'hedge_after_ms': 50, 'max_concurrent': 1}})
+    held = executor.mcp_hedger.rate_limiter.acquire('serp', CancellationToken())
+    token = CancellationToken()
+    threading.Timer(0.2, token.cancel, args=('interrupted',)).start()
+    metrics = {}
+    
+    try:
+        with pytest.raises(StageCancelled):
+            executor._call_mcp('serp', lambda attempt_token: 'ok', token, metrics)
+    finally:
+        held.release_slot()
+        
+    assert 'mcp_hedging' not in metrics
+    executor._call_mcp('serp', lambda attempt_token: 'ok', CancellationToken(), metrics)
+    assert metrics['mcp_hedging']['serp']['calls'] == 1
+    
+def test_latency_windows_persist_across_runs(tmp_path):
+    """Only the most recent `window` samples are kept and saved"""
+    
+    tracker = LatencyTracker(tmp_path / 'latency.json', window=3)
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        tracker.record('serp', seconds)
+    tracker.save()
+    
+    assert LatencyTracker(tmp_path / 'latency.json', window=3).samples('serp') == [0.2, 0.3, 0.4]
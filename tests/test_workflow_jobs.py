@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite job queue and the workflow daemon's job handling
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_jobs import JobQueue
+from workflow_daemon import WorkflowDaemon
+from test_workflow_batch import WORKFLOW
+
+def test_claims_follow_priority_then_client_fairness(tmp_path):
+    """Higher priority first; within a priority the client with fewer running jobs goes first"""
+    
+    queue = JobQueue(tmp_path / 'jobs.db')
+    first = queue.submit('audit', 'acme')
+    second = queue.submit('keywords', 'acme')
+    other_client = queue.submit('audit', 'globex')
+    urgent = queue.submit('report', 'initech', priority=5)
+    
+    claimed = [queue.claim_next(worker_pid=1)['id'] for _ in range(4)]
+    
+    assert claimed == [urgent, first, other_client, second]
+    assert queue.claim_next() is None
+    assert queue.counts() == {'running': 4}
+
+def test_same_workflow_and_client_never_run_concurrently(tmp_path):
+    """A second run of a workflow for a client waits until the first one finishes"""
+    
+    queue = JobQueue(tmp_path / 'jobs.db')
+    running = queue.submit('audit', 'acme')
+    duplicate = queue.submit('audit', 'acme')
+    other = queue.submit('audit', 'globex')
+    
+    assert queue.claim_next()['id'] == running
+    assert queue.claim_next()['id'] == other
+    assert queue.claim_next() is None
+    
+    queue.finish(running, 'completed', result={'success': True})
+    assert queue.claim_next()['id'] == duplicate
+    assert queue.get(running)['result'] == {'success': True}
+
+def test_cancel_removes_queued_jobs_and_flags_running_ones(tmp_path):
+    """Queued jobs are cancelled outright; running ones are left for the daemon to stop"""
+    
+    queue = JobQueue(tmp_path / 'jobs.db')
+    running = queue.submit('audit', 'acme')
+    queued = queue.submit('audit', 'globex', priority=-1)
+    queue.claim_next()
+    
+    assert queue.cancel(queued) == 'cancelled'
+    assert queue.cancel(running) == 'running'
+    assert queue.cancel_requested() == [running]
+    assert queue.claim_next() is None
+
+def test_jobs_of_a_dead_worker_are_requeued_for_resume(tmp_path):
+    """recover_stale() puts jobs whose worker process is gone back in the queue"""
+    
+    queue = JobQueue(tmp_path / 'jobs.db')
+    job_id = queue.submit('audit', 'acme', options={'use_cache': False})
+    queue.claim_next(worker_pid=2 ** 22 + 12345)  # beyond pid_max, so never alive
+    
+    assert queue.recover_stale() == [job_id]
+    job = queue.get(job_id)
+    assert job['status'] == 'queued'
+    assert job['options'] == {'use_cache': False, 'resume': True}
+
+def test_daemon_cancels_a_running_job_on_request(config_manager, tmp_path):
+    """`jobs cancel` on a running job stops its executor and records it as cancelled"""
+    
+    daemon = WorkflowDaemon(config_manager.custom_config_file, workers=1)
+    daemon.active_dir = tmp_path / 'active'
+    daemon.active_dir.mkdir()
+    (daemon.active_dir / 'slow.md').write_text(WORKFLOW.replace('Stage 1: Prepare', 'Stage 1: Data Collection'))
+    
+    try:
+        job_id = daemon.queue.submit('slow', 'acme')
+        daemon._start(daemon.queue.claim_next())
+        deadline = time.monotonic() + 5
+        while job_id not in daemon._running and time.monotonic() < deadline:
+            time.sleep(0.01)
+            
+        daemon.queue.cancel(job_id)
+        daemon._apply_cancellations()
+        daemon._threads[job_id].join(10)
+        
+        assert not daemon._threads[job_id].is_alive()
+        assert daemon.queue.get(job_id)['status'] == 'cancelled'
+    finally:
+        daemon._shutdown()
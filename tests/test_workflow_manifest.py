@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the run manifest and its append-only stage journal
+"""
+
+import sys
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_manifest import RunManifest, find_latest_run, hash_file, JOURNAL_FILE, MANIFEST_FILE
+from workflow_scheduler import StageGraph
+from test_workflow_scheduler import make_stages
+
+INPUTS = {'keywords.csv': 'abc123'}
+
+def make_workflow():
+    """Parsed-workflow stand-in with a three stage chain"""
+    return SimpleNamespace(name='audit', client_slug='acme', parameters={'depth': 2},
+                           stages=make_stages({1: [], 2: [1], 3: [2]}))
+
+def write_artifact(manifest, stage_num, text='{"success": true}'):
+    """Write a stage artifact and register it the way the executor does"""
+    
+    path = manifest.output_dir / 'artifacts' / f'stage_{stage_num}.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    relative = str(path.relative_to(manifest.output_dir))
+    manifest.record_file(relative, path.stat().st_size, hash_file(path), stage_num)
+    return path
+
+def completed_run(tmp_path, stages=(1, 2, 3)):
+    """Fresh manifest with the given stages checkpointed (journaled, not yet saved)"""
+    
+    workflow = make_workflow()
+    manifest = RunManifest.create(tmp_path, workflow, INPUTS)
+    for num in stages:
+        manifest.record_stage(num, workflow.stages[num - 1], 'completed', artifact=write_artifact(manifest, num))
+    return workflow, manifest
+
+def test_stage_records_are_journaled_not_rewritten(tmp_path):
+    """Checkpoints append to the journal; manifest.json is only rewritten on full saves"""
+    
+    workflow, manifest = completed_run(tmp_path, stages=(1, 2))
+    
+    on_disk = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert on_disk['stages'] == {}
+    assert len((tmp_path / JOURNAL_FILE).read_text().splitlines()) == 2
+    
+    manifest.set_status('completed')
+    
+    on_disk = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert set(on_disk['stages']) == {'1', '2'}
+    assert on_disk['status'] == 'completed'
+    assert 'artifacts/stage_1.json' in on_disk['files']
+    assert not (tmp_path / JOURNAL_FILE).exists()
+
+def test_load_replays_the_journal_after_a_crash(tmp_path):
+    """A run killed between full saves resumes from its journaled checkpoints"""
+    
+    workflow, _ = completed_run(tmp_path, stages=(1, 2))
+    
+    manifest = RunManifest.load(tmp_path)
+    
+    assert manifest.stage(2)['status'] == 'completed'
+    assert manifest.files['artifacts/stage_2.json']['stage'] == 2
+    graph = StageGraph(workflow.stages)
+    assert sorted(manifest.valid_checkpoints(workflow, graph, INPUTS)) == [1, 2]
+
+def test_torn_journal_line_is_ignored(tmp_path):
+    """A partially written final record is dropped, earlier ones still count"""
+    
+    completed_run(tmp_path, stages=(1, 2))
+    with open(tmp_path / JOURNAL_FILE, 'a') as f:
+        f.write('{"stage": "3", "entry": {"sta')
+        
+    manifest = RunManifest.load(tmp_path)
+    
+    assert manifest.stage(2) is not None
+    assert manifest.stage(3) is None
+
+def test_changed_parameters_or_inputs_invalidate_every_checkpoint(tmp_path):
+    """Checkpoints are only reused for the same parameters and input bytes"""
+    
+    workflow, manifest = completed_run(tmp_path)
+    graph = StageGraph(workflow.stages)
+    
+    assert sorted(manifest.valid_checkpoints(workflow, graph, INPUTS)) == [1, 2, 3]
+    assert manifest.valid_checkpoints(workflow, graph, {'keywords.csv': 'changed'}) == {}
+    workflow.parameters['depth'] = 3
+    assert manifest.valid_checkpoints(workflow, graph, INPUTS) == {}
+
+def test_checkpoints_need_intact_files_and_valid_dependencies(tmp_path):
+    """A truncated artifact invalidates its stage and every stage after it"""
+    
+    workflow, manifest = completed_run(tmp_path)
+    (tmp_path / 'artifacts' / 'stage_2.json').write_text('{}')
+    
+    assert list(manifest.valid_checkpoints(workflow, StageGraph(workflow.stages), INPUTS)) == [1]
+
+def test_failed_stages_are_not_checkpoints(tmp_path):
+    """Only completed stages can be skipped on resume"""
+    
+    workflow, manifest = completed_run(tmp_path, stages=(1,))
+    manifest.record_stage(2, workflow.stages[1], 'failed', error='boom')
+    
+    assert list(manifest.valid_checkpoints(workflow, StageGraph(workflow.stages), INPUTS)) == [1]
+
+def test_find_latest_run_matches_only_this_workflow(tmp_path):
+    """Run directories of a workflow whose name merely starts with this one are ignored"""
+    
+    for name in ('audit_2026_10_01', 'audit_2026_10_02', 'audit_full_2026_10_03', 'audit_2026_10_04'):
+        (tmp_path / name).mkdir()
+    for name in ('audit_2026_10_01', 'audit_2026_10_02', 'audit_full_2026_10_03'):
+        RunManifest.create(tmp_path / name, make_workflow(), INPUTS)
+        
+    assert find_latest_run(tmp_path, 'audit').name == 'audit_2026_10_02'
+    assert find_latest_run(tmp_path, 'keywords') is None
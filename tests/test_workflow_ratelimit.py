@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared per-MCP rate limiter
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_ratelimit import TokenBucket, MCPRateLimiter
+from workflow_cancellation import CancellationToken, StageCancelled
+
+class MCPConfig:
+    """Stands in for ConfigManager.get_mcp_config()"""
+    
+    def __init__(self, mcps):
+        self.mcps = mcps
+        
+    def get_mcp_config(self, name):
+        return self.mcps.get(name, {})
+        
+    def get(self, key, default=None):
+        return self.mcps if key == 'mcps' else default
+
+def test_bucket_allows_a_burst_then_refills_at_its_rate():
+    """Up to `capacity` requests go straight through, the next waits for a refill"""
+    
+    bucket = TokenBucket(rate=20.0, capacity=2)
+    
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    
+    started = time.monotonic()
+    bucket.acquire()
+    assert 0.02 <= time.monotonic() - started < 1.0
+
+def test_limits_come_from_config_with_per_minute_rates_and_mcp_suffixes():
+    """requests_per_minute is converted, and 'gsc-mcp' finds the limits of 'gsc'"""
+    
+    limiter = MCPRateLimiter(MCPConfig({'gsc': {'requests_per_minute': 120, 'burst': 5, 'max_concurrent': 2}}))
+    
+    limit = limiter.get('gsc-mcp')
+    assert limit.rate_per_second == pytest.approx(2.0)
+    assert limit.bucket.capacity == 5
+    assert limit.max_concurrent == 2
+    assert not limiter.has_limits('firecrawl')
+
+def test_concurrency_cap_is_shared_by_all_callers():
+    """No more than max_concurrent calls of one MCP run at once"""
+    
+    limiter = MCPRateLimiter(MCPConfig({'firecrawl': {'max_concurrent': 2}}))
+    lock = threading.Lock()
+    running = {'now': 0, 'peak': 0}
+    
+    def call():
+        with limiter.limit('firecrawl'):
+            with lock:
+                running['now'] += 1
+                running['peak'] = max(running['peak'], running['now'])
+            time.sleep(0.05)
+            with lock:
+                running['now'] -= 1
+                
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+        
+    assert running['peak'] == 2
+    assert limiter.wait_time['firecrawl'] > 0
+
+def test_waiting_for_a_request_token_is_cancellable():
+    """A stage cancelled while throttled stops waiting and gives its slot back"""
+    
+    limiter = MCPRateLimiter(MCPConfig({'gsc': {'requests_per_second': 0.01, 'burst': 1, 'max_concurrent': 1}}))
+    assert limiter.try_acquire('gsc') is not None
+    limiter.get('gsc').release_slot()
+    
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel, args=('timeout',)).start()
+    started = time.monotonic()
+    with pytest.raises(StageCancelled):
+        limiter.acquire('gsc', token)
+        
+    assert time.monotonic() - started < 5
+    # The slot was released, so a caller that finds a request token can proceed
+    limiter.get('gsc').bucket.tokens = 1.0
+    assert limiter.try_acquire('gsc') is not None
+
+def test_try_acquire_never_waits():
+    """Hedged duplicates only go out when a slot and a request token are free right now"""
+    
+    limiter = MCPRateLimiter(MCPConfig({'gsc': {'requests_per_second': 0.01, 'burst': 1, 'max_concurrent': 2}}))
+    
+    assert limiter.try_acquire('gsc') is not None
+    assert limiter.try_acquire('gsc') is None
+    # The refused attempt did not keep its concurrency slot
+    assert limiter.get('gsc').slots.acquire(blocking=False)
+
+def test_client_limits_a_shared_limiter_ignores_are_named():
+    """Client [mcps] sections that differ from the shared limiter's config are reported"""
+    
+    limiter = MCPRateLimiter(MCPConfig({'gsc': {'max_concurrent': 2}, 'serp': {'max_concurrent': 4}}))
+    client = MCPConfig({'gsc': {'max_concurrent': 2}, 'serp': {'max_concurrent': 1}, 'fetch': {'burst': 3}})
+    
+    assert limiter.ignored_overrides(client) == ['fetch', 'serp']
+    assert limiter.ignored_overrides(MCPConfig({})) == []
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-MCP circuit breakers
+State transitions on an injected clock, and per-MCP attribution of call outcomes.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_resilience import CircuitBreaker, CircuitBreakerRegistry
+from workflow_executor import WorkflowExecutor
+from workflow_clock import VirtualClock
+from workflow_cancellation import CancellationToken, StageCancelled
+
+class FakeTime:
+    """Manually advanced monotonic clock"""
+    
+    def __init__(self):
+        self.now = 100.0
+        
+    def __call__(self) -> float:
+        return self.now
+
+def test_breaker_opens_after_consecutive_failures():
+    """The threshold counts consecutive failures; a success resets the count"""
+    
+    breaker = CircuitBreaker('gsc', failure_threshold=3, reset_timeout=60, clock=FakeTime())
+    
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_breaker_half_opens_after_reset_timeout_with_a_single_trial():
+    """After reset_timeout on the breaker's clock exactly one trial call is let through"""
+    
+    clock = FakeTime()
+    breaker = CircuitBreaker('gsc', failure_threshold=1, reset_timeout=60, clock=clock)
+    breaker.record_failure()
+    
+    clock.now += 59
+    assert not breaker.allow()
+    
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    
+    # An unused trial slot can be handed back
+    breaker.release()
+    assert breaker.allow()
+    
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+def test_failed_trial_reopens_the_breaker():
+    """A failing half-open trial opens the breaker for another full reset_timeout"""
+    
+    clock = FakeTime()
+    breaker = CircuitBreaker('gsc', failure_threshold=3, reset_timeout=60, clock=clock)
+    for _ in range(3):
+        breaker.record_failure()
+        
+    clock.now += 60
+    assert breaker.allow()
+    breaker.record_failure()
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 30
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+def test_registry_releases_trials_when_a_stage_is_blocked():
+    """A stage blocked by one MCP must not hold the half-open trial of another"""
+    
+    clock = FakeTime()
+    registry = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=60, clock=clock)
+    registry.get('gsc').record_failure()
+    clock.now += 60
+    registry.get('firecrawl').record_failure()
+    
+    # gsc is half-open and grants its trial, firecrawl is still open
+    assert registry.blocked(['gsc', 'firecrawl']) == ['firecrawl']
+    assert registry.get('gsc').allow()
+    
+    assert registry.states() == {'gsc': 'half_open', 'firecrawl': 'open'}
+
+def test_executor_records_failures_against_the_failing_mcp_only(config_manager):
+    """Breakers run on the executor's clock and count each MCP's own call outcomes"""
+    
+    clock = VirtualClock(start=0.0)
+    executor = WorkflowExecutor(config_manager, clock=clock)
+    token = CancellationToken(clock=clock)
+    threshold = executor.circuit_breakers.failure_threshold
+    reset = executor.circuit_breakers.reset_timeout
+    
+    def fail(attempt_token):
+        raise ConnectionError("gsc is down")
+        
+    for _ in range(threshold):
+        with pytest.raises(ConnectionError):
+            executor._call_mcp('gsc', fail, token)
+    assert executor._call_mcp('dataforseo', lambda attempt_token: 'ok', token) == 'ok'
+    
+    assert executor.circuit_breakers.blocked(['gsc', 'dataforseo']) == ['gsc']
+    
+    # Reset in virtual time, then a successful trial closes the breaker
+    clock.sleep(reset)
+    assert executor.circuit_breakers.blocked(['gsc']) == []
+    executor.circuit_breakers.release(['gsc'])
+    executor._call_mcp('gsc', lambda attempt_token: 'ok', token)
+    assert executor.circuit_breakers.get('gsc').state == CircuitBreaker.CLOSED
+
+def test_interrupted_calls_do_not_count_against_the_mcp(config_manager):
+    """A call cancelled because the run was interrupted is not the MCP's failure"""
+    
+    executor = WorkflowExecutor(config_manager, clock=VirtualClock(start=0.0))
+    token = CancellationToken()
+    
+    def interrupted(attempt_token):
+        raise StageCancelled('interrupted')
+        
+    for _ in range(executor.circuit_breakers.failure_threshold):
+        with pytest.raises(StageCancelled):
+            executor._call_mcp('gsc', interrupted, token)
+            
+    assert executor.circuit_breakers.get('gsc').consecutive_failures == 0
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests for resource-aware stage admission
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_resources import (ResourceBudget, ResourceEstimator, parse_resources, HANDLER_FOOTPRINTS,
+                                DEFAULT_FOOTPRINT, USAGE_MONITOR)
+from workflow_estimator import DurationHistory
+from workflow_executor import WorkflowExecutor
+from workflow_scheduler import StageGraph, StageScheduler
+from workflow_clock import VirtualClock, InlinePool
+from test_workflow_scheduler import make_stages
+from test_workflow_batch import write_workflow
+
+def test_parse_resources_units():
+    """Cores, memory units (GiB reads as GB) and I/O slots; unknown keys are ignored"""
+    
+    assert parse_resources('cpu=2, memory=1.5GB, io=1') == {'cpu': 2.0, 'memory_mb': 1536.0, 'io': 1.0}
+    assert parse_resources('cores: 0.5; mem=512MiB') == {'cpu': 0.5, 'memory_mb': 512.0}
+    assert parse_resources('gpu=1, memory=lots') == {}
+
+def test_budget_admits_while_footprints_fit():
+    """Footprints add up until one resource would overflow; release frees them again"""
+    
+    budget = ResourceBudget(cpu=2, memory_mb=1000, io=1)
+    
+    assert budget.admit({'cpu': 1, 'memory_mb': 600}) == []
+    assert budget.admit({'cpu': 1, 'memory_mb': 600}) == ['memory_mb']
+    assert budget.admit({'cpu': 1, 'memory_mb': 100, 'io': 1}) == []
+    assert budget.admit({'cpu': 0.5}) == ['cpu']
+    
+    budget.release({'cpu': 1, 'memory_mb': 600})
+    assert budget.admit({'cpu': 1, 'memory_mb': 600}) == []
+    assert budget.running == 2
+
+def test_oversized_stage_runs_alone():
+    """A footprint larger than the whole budget is admitted once nothing else runs"""
+    
+    budget = ResourceBudget(cpu=2, memory_mb=1000)
+    
+    assert budget.admit({'cpu': 8}) == []
+    assert budget.admit({'cpu': 0.1}) == ['cpu']
+
+def test_budget_config():
+    """execution.resource_budget sets capacities; resource_admission = false turns admission off"""
+    
+    assert ResourceBudget.from_config({'resource_admission': False}) is None
+    budget = ResourceBudget.from_config({'resource_budget': {'cpu': 3, 'memory': '2GB', 'io': 2}})
+    assert budget.capacity == {'cpu': 3.0, 'memory_mb': 2048.0, 'io': 2.0}
+
+def history_with(tmp_path, stage, samples):
+    """Duration history holding one record per usage sample of a stage"""
+    history = DurationHistory(tmp_path / 'history.jsonl')
+    for usage in samples:
+        history.record('audit', stage, 1.0, usage)
+    return history
+
+def test_declared_resources_win(tmp_path):
+    """**Resources** override learned values key by key"""
+    
+    stage = make_stages({1: []})[0]
+    stage.resources = {'cpu': 3.0}
+    history = history_with(tmp_path, stage, [{'cpu': 1.5, 'memory_mb': 900}] * 5)
+    
+    demand = ResourceEstimator(history).demand(stage, 'analysis')
+    
+    assert demand['cpu'] == 3.0
+    assert demand['memory_mb'] == pytest.approx(900 * 1.25)
+
+def test_learned_footprint_never_drops_below_the_handler_default(tmp_path):
+    """Idle-looking samples (I/O-bound stages, reused RSS) must not shrink a footprint to ~0"""
+    
+    stage = make_stages({1: []})[0]
+    idle = [{'cpu': 0.0, 'memory_mb': 0.0}] * 3 + [{'cpu': 0.05, 'memory_mb': 10}] * 3
+    history = history_with(tmp_path, stage, idle)
+    
+    demand = ResourceEstimator(history).demand(stage, 'analysis')
+    
+    assert demand == HANDLER_FOOTPRINTS['analysis']
+
+def test_unknown_stages_use_the_default_footprint(tmp_path):
+    """Without a handler footprint or history the default applies"""
+    
+    stage = make_stages({1: []})[0]
+    assert ResourceEstimator(DurationHistory(tmp_path / 'none.jsonl')).demand(stage) == DEFAULT_FOOTPRINT
+
+def test_scheduler_holds_stages_that_do_not_fit_and_backfills_smaller_ones():
+    """A stage that does not fit waits; a smaller ready stage behind it may start first"""
+    
+    clock = VirtualClock(start=0.0)
+    demands = {1: {'cpu': 1.5}, 2: {'cpu': 1.0}, 3: {'cpu': 0.5}}
+    budget = ResourceBudget(cpu=2, memory_mb=1000)
+    scheduler = StageScheduler(StageGraph(make_stages({1: [], 2: [], 3: []})), max_workers=3, clock=clock,
+                               pool=InlinePool(clock, 3), budget=budget)
+    started = {}
+    waited = []
+    
+    def execute(num, token):
+        started[num] = clock.time()
+        clock.sleep(10.0)
+        return {'success': True}
+        
+    outcome = scheduler.run(execute, demand_for=demands.get,
+                            on_wait=lambda num, short: waited.append((num, short)))
+                            
+    assert outcome.completed == [1, 2, 3]
+    assert started[1] == started[3] == 0.0
+    assert started[2] == pytest.approx(10.0)
+    assert waited == [(2, ['cpu'])]
+    assert budget.running == 0 and budget.used['cpu'] == 0.0
+
+def test_stage_blocked_by_an_open_circuit_leaves_no_usage_probe(config_manager):
+    """Fail-fast stages must not leave the RSS sampler running"""
+    
+    executor = WorkflowExecutor(config_manager)
+    stage = make_stages({1: []})[0]
+    stage.suggested_mcps = ['gsc']
+    for _ in range(executor.circuit_breakers.failure_threshold):
+        executor.circuit_breakers.get('gsc').record_failure()
+    probes = len(USAGE_MONITOR._probes)
+    
+    result = executor._run_stage(stage, 1, None)
+    
+    assert not result['success'] and 'Circuit open' in result['error']
+    assert len(USAGE_MONITOR._probes) == probes
+
+def test_dry_run_shows_the_budget(config_manager, tmp_path, capsys):
+    """The dry run reports the capacity stages will be admitted against"""
+    
+    executor = WorkflowExecutor(config_manager)
+    executor.resource_budget = ResourceBudget(cpu=2, memory_mb=1024, io=3)
+    
+    assert executor.execute_workflow(write_workflow(tmp_path), dry_run=True).success
+    assert "Resource budget: 2 cores, 1024 MB, 3 I/O slots" in capsys.readouterr().out
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for resuming workflow runs from stage checkpoints
+"""
+
+import sys
+from pathlib import Path
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_executor import WorkflowExecutor
+from workflow_manifest import RunManifest
+from workflow_scheduler import StageGraph, StageScheduler
+from test_workflow_scheduler import make_stages
+
+WORKFLOW = """# resume_test
+
+## Description
+Checkpoint resume
+
+## Goal
+test
+
+## Parameters
+- client_slug: acme (required)
+
+## Stages
+
+### Stage 1: Fetch
+**Description**: {fetch}
+**Dependencies**: None
+**Recommended Agents**: DataPipelineAgent
+**Handler**: step
+
+### Stage 2: Crunch
+**Description**: crunch
+**Dependencies**: Stage 1
+**Recommended Agents**: DataPipelineAgent
+**Handler**: step
+
+### Stage 3: Publish
+**Description**: publish
+**Dependencies**: Stage 2
+**Recommended Agents**: DataPipelineAgent
+**Handler**: step
+"""
+
+class Steps:
+    """Stage handler that records which stages ran and fails the ones asked to"""
+    
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+        
+    def __call__(self, context, config):
+        self.calls.append(context.stage_num)
+        if context.stage_num in self.failing:
+            raise RuntimeError("stage failed")
+        return {'outputs': [f"stage {context.stage_num} output"]}
+
+def run(config_manager, workflow_path, steps, resume):
+    executor = WorkflowExecutor(config_manager)
+    executor.use_cache = False  # only checkpoints may skip stages here
+    executor.handlers.register('step', steps)
+    return executor, executor.execute_workflow(workflow_path, resume=resume)
+
+def write_workflow(tmp_path, fetch='fetch'):
+    path = tmp_path / 'resume_test.md'
+    path.write_text(WORKFLOW.format(fetch=fetch))
+    return path
+
+def test_resume_skips_valid_checkpoints(config_manager, tmp_path):
+    """Completed stages are reused; the failed stage and its dependents run again"""
+    
+    workflow_path = write_workflow(tmp_path)
+    steps = Steps()
+    steps.failing = {2}
+    _, first = run(config_manager, workflow_path, steps, resume=False)
+    assert not first.success
+    assert set(steps.calls) == {1, 2}
+    
+    steps.calls, steps.failing = [], set()
+    _, resumed = run(config_manager, workflow_path, steps, resume=True)
+    
+    assert resumed.success
+    assert resumed.stages_completed == 3
+    assert steps.calls == [2, 3]
+    assert resumed.output_directory == first.output_directory
+
+def test_changed_stage_definition_invalidates_its_checkpoint_and_dependents(config_manager, tmp_path):
+    """Editing stage 1 reruns it and everything downstream"""
+    
+    steps = Steps()
+    run(config_manager, write_workflow(tmp_path), steps, resume=False)
+    
+    steps.calls = []
+    _, resumed = run(config_manager, write_workflow(tmp_path, fetch='fetch more'), steps, resume=True)
+    
+    assert resumed.success
+    assert steps.calls == [1, 2, 3]
+
+def test_missing_artifact_invalidates_the_checkpoint(config_manager, tmp_path):
+    """A checkpoint whose artifact was deleted is run again, with its dependents"""
+    
+    workflow_path = write_workflow(tmp_path)
+    steps = Steps()
+    _, first = run(config_manager, workflow_path, steps, resume=False)
+    
+    manifest = RunManifest.load(first.output_directory)
+    (first.output_directory / manifest.stage(2)['artifact']).unlink()
+    
+    steps.calls = []
+    run(config_manager, workflow_path, steps, resume=True)
+    
+    assert steps.calls == [2, 3]
+
+def test_precompleted_stages_unlock_their_dependents():
+    """The scheduler runs only stages without a checkpoint and reports the rest as resumed"""
+    
+    scheduler = StageScheduler(StageGraph(make_stages({1: [], 2: [1], 3: [2], 4: []})))
+    started = []
+    
+    outcome = scheduler.run(lambda num, token: started.append(num) or {'success': True},
+                            precompleted={1: {'success': True}, 2: {'success': True}})
+                            
+    assert sorted(started) == [3, 4]
+    assert outcome.resumed == [1, 2]
+    assert outcome.completed == [1, 2, 3, 4]
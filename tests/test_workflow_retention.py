@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for reports retention and run compaction
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_retention import RetentionService, _in_use
+from workflow_manifest import RunManifest, MANIFEST_FILE, JOURNAL_FILE
+from test_workflow_manifest import make_workflow, INPUTS
+
+DEAD_PID = 2 ** 22 + 12345  # beyond pid_max, so never alive
+
+def write_run(config_manager, name='audit_2025_01_01', **manifest_fields):
+    """Month-old run directory under the acme reports tree, manifest overridden by `manifest_fields`"""
+    
+    reports_dir = Path(config_manager.get_storage_config()['reports_base_dir'])
+    run_dir = reports_dir / 'acme' / 'reports' / name
+    run_dir.mkdir(parents=True)
+    manifest = RunManifest.create(run_dir, make_workflow(), INPUTS)
+    manifest.data.update({'created': '2025-01-01T09:00:00', 'updated': '2025-01-01T09:05:00', **manifest_fields})
+    manifest.save()
+    (run_dir / 'execution_summary.json').write_text('{}')
+    old = time.time() - 60 * 86400
+    os.utime(run_dir / MANIFEST_FILE, (old, old))
+    return run_dir
+
+def test_completed_runs_are_compressed(config_manager):
+    """Runs older than compress_after_days become one tarball"""
+    
+    run_dir = write_run(config_manager, status='completed')
+    
+    stats = RetentionService(config_manager.custom_config_file).collect()
+    
+    assert stats['compressed'] == 1
+    assert not run_dir.exists()
+    assert list(run_dir.parent.glob(run_dir.name + '.tar.*'))
+
+def test_running_run_whose_process_died_is_collected(config_manager):
+    """A manifest left at 'running' by a killed run does not pin the run forever"""
+    
+    run_dir = write_run(config_manager, status='running', pid=DEAD_PID)
+    
+    stats = RetentionService(config_manager.custom_config_file).collect()
+    
+    assert stats['compressed'] == 1 and stats['skipped'] == 0
+    assert not run_dir.exists()
+
+def test_live_run_is_left_alone(config_manager):
+    """A run whose process is still alive is skipped"""
+    
+    run_dir = write_run(config_manager, status='running', pid=os.getpid())
+    
+    stats = RetentionService(config_manager.custom_config_file).collect()
+    
+    assert stats['compressed'] == 0 and stats['skipped'] == 1
+    assert run_dir.exists()
+
+def test_other_hosts_runs_go_stale_after_inactivity(config_manager):
+    """Without a pid to check, a run counts as live until its checkpoints stop for stale_after"""
+    
+    run_dir = write_run(config_manager, status='running', host='elsewhere', pid=DEAD_PID)
+    assert not _in_use(run_dir, stale_after=3600)
+    
+    (run_dir / JOURNAL_FILE).write_text('')  # a checkpoint just now
+    assert _in_use(run_dir, stale_after=3600)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the template workflow runner
+Steps start as soon as the steps named in `depends_on` complete, failures
+skip only what depends on them, and command modules load through the
+handler registry's loader.
+"""
+
+import sys
+import json
+from pathlib import Path
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+import workflow_runner
+from workflow_runner import WorkflowRunner, create_workflow_context
+from workflow_engine import WorkflowEngine
+
+COMMAND = '''
+import time
+
+def execute(context, config):
+    started = time.time()
+    time.sleep(config.get('sleep', 0))
+    if config.get('fail'):
+        raise RuntimeError('boom')
+    return {'started': started, 'finished': time.time()}
+'''
+
+def make_template(tmp_path, steps):
+    """Template 'demo' with one workflow 'build' whose commands all run COMMAND"""
+    
+    template = tmp_path / 'demo'
+    (template / 'commands').mkdir(parents=True)
+    for step in steps:
+        (template / 'commands' / f"{step['command']}.py").write_text(COMMAND)
+    config = {'workflows': {'build': {'steps': steps}},
+              'default_config': {'output_directory': 'output/demo'}}
+    (template / 'template-config.json').write_text(json.dumps(config))
+    return template
+
+def run(tmp_path, steps, **kwargs):
+    template = make_template(tmp_path, steps)
+    runner = WorkflowRunner(str(template), output_root=str(tmp_path))
+    context = create_workflow_context(str(template))
+    return runner.run_workflow('build', context, **kwargs), context
+
+def test_independent_steps_overlap_and_dependents_wait(tmp_path):
+    """Steps without dependencies run together; a dependent starts after both finish"""
+    
+    summary, context = run(tmp_path, [
+        {'command': 'a', 'config': {'sleep': 0.3}},
+        {'command': 'b', 'config': {'sleep': 0.3}},
+        {'command': 'report', 'depends_on': ['a', 'b']}
+    ])
+    a, b, report = (context.results[name] for name in ('a', 'b', 'report'))
+    
+    assert summary['success']
+    assert a['started'] < b['finished'] and b['started'] < a['finished']
+    assert report['started'] >= max(a['finished'], b['finished'])
+
+def test_failed_step_skips_only_its_dependents(tmp_path):
+    """Without stop_on_failure independent steps still run; dependents of the failure are skipped"""
+    
+    summary, context = run(tmp_path, [
+        {'command': 'a', 'config': {'fail': True}},
+        {'command': 'b'},
+        {'command': 'report', 'depends_on': ['a']}
+    ], stop_on_failure=False)
+    statuses = {step['command']: step['status'] for step in summary['steps']}
+    
+    assert not summary['success']
+    assert statuses == {'a': 'failed', 'b': 'completed', 'report': 'skipped'}
+    assert summary['steps'][2]['reason'] == 'dependency failed'
+
+def test_artifacts_dir_defaults_under_the_output_root(tmp_path, monkeypatch):
+    """Relative output directories resolve against output_root, not the working directory"""
+    
+    monkeypatch.chdir(tmp_path / '..')
+    summary, context = run(tmp_path, [{'command': 'a'}])
+    
+    assert context.artifacts_dir.parent == tmp_path / 'output' / 'demo'
+    assert (context.artifacts_dir / '01_a.json').exists()
+    assert (context.artifacts_dir / workflow_runner.RESULTS_FILE).exists()
+
+def test_commands_load_through_the_handler_loader(tmp_path, monkeypatch):
+    """The runner imports command modules with workflow_handlers.load_command, once per runner"""
+    
+    loaded = []
+    real = workflow_runner.load_command
+    monkeypatch.setattr(workflow_runner, 'load_command', lambda name, path: loaded.append(name) or real(name, path))
+    runner = WorkflowRunner(str(make_template(tmp_path, [{'command': 'a'}])))
+    
+    assert runner.load_command('a') is runner.load_command('a')
+    assert loaded == ['demo/a']
+
+def test_engine_rejects_unknown_dependencies(tmp_path):
+    """validate_workflow() fails a workflow whose depends_on names no step"""
+    
+    engine = WorkflowEngine(str(make_template(tmp_path, [{'command': 'a', 'depends_on': ['missing']}])))
+    
+    assert engine.list_available_workflows() == ['build']
+    assert not engine.validate_workflow('build')
+    assert not engine.validate_workflow('absent')
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Tests for the workflow stage scheduler
+Dependency ordering, bounded concurrency, the stop/continue error modes,
+non-blocking retry backoff, stage timeouts and cancelling a whole run.
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add CCC lib to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
+
+from workflow_parser import WorkflowStage
+from workflow_scheduler import StageGraph, StageScheduler
+from workflow_clock import VirtualClock, InlinePool
+from workflow_resilience import RetryPolicy
+from workflow_cancellation import CancellationToken
+
+def make_stages(dependencies):
+    """Stages named Stage 1..N; `dependencies` maps stage number -> list of stage numbers"""
+    
+    count = max(list(dependencies) + [dep for deps in dependencies.values() for dep in deps])
+    return [WorkflowStage(name=f"Stage {num}", description='',
+                          dependencies=[f"Stage {dep}" for dep in dependencies.get(num, [])],
+                          recommended_agents=[], suggested_mcps=[], parallel_tasks=[], success_criteria=[],
+                          expected_outputs=[], expected_correlations=[], warnings=[])
+            for num in range(1, count + 1)]
+
+def virtual_scheduler(dependencies, workers=3, **kwargs):
+    """Scheduler driven by a VirtualClock, so stage sleeps cost no real time"""
+    
+    clock = VirtualClock(start=0.0)
+    scheduler = StageScheduler(StageGraph(make_stages(dependencies)), max_workers=workers,
+                               clock=clock, pool=InlinePool(clock, workers), **kwargs)
+    return scheduler, clock
+
+def test_graph_resolves_names_and_numbers():
+    """Dependencies may name a stage or use its number"""
+    
+    stages = make_stages({1: [], 2: [1], 3: [1]})
+    stages[2].dependencies = ['stage 2']
+    stages[1].dependencies = ['Stage 1']
+    graph = StageGraph(stages)
+    
+    assert graph.dependencies == {1: set(), 2: {1}, 3: {2}}
+    assert graph.topological_order() == [1, 2, 3]
+    assert graph.descendants(1) == {2, 3}
+
+def test_graph_rejects_cycles_and_unknown_stages():
+    """Cycles, self-references and missing stages fail when the graph is built"""
+    
+    with pytest.raises(ValueError, match="Circular"):
+        StageGraph(make_stages({1: [3], 2: [1], 3: [2]}))
+    with pytest.raises(ValueError, match="itself"):
+        StageGraph(make_stages({1: [], 2: [2]}))
+    stages = make_stages({1: [], 2: [1]})
+    stages[1].dependencies = ['Stage 5']
+    with pytest.raises(ValueError, match="non-existent"):
+        StageGraph(stages)
+
+def test_stages_start_after_their_dependencies():
+    """Every stage starts only once all of its dependencies completed"""
+    
+    dependencies = {1: [], 2: [1], 3: [1], 4: [2, 3], 5: [], 6: [4, 5]}
+    scheduler, clock = virtual_scheduler(dependencies)
+    finished = {}
+    
+    def execute(num, token):
+        for dep in dependencies[num]:
+            assert dep in finished
+        clock.sleep(1.0 + num / 10)
+        finished[num] = clock.time()
+        return {'success': True, 'stage_num': num}
+        
+    outcome = scheduler.run(execute)
+    
+    assert outcome.completed == [1, 2, 3, 4, 5, 6]
+    assert outcome.failed == outcome.skipped == outcome.cancelled == []
+    assert not outcome.halted
+
+def test_independent_stages_run_in_parallel_up_to_the_worker_limit():
+    """Ready stages share the pool; concurrency never exceeds max_workers"""
+    
+    scheduler = StageScheduler(StageGraph(make_stages({num: [] for num in range(1, 7)})), max_workers=3)
+    lock = threading.Lock()
+    running = {'now': 0, 'peak': 0}
+    release = threading.Event()
+    
+    def execute(num, token):
+        with lock:
+            running['now'] += 1
+            running['peak'] = max(running['peak'], running['now'])
+            if running['peak'] == 3:
+                release.set()
+        release.wait(5)
+        with lock:
+            running['now'] -= 1
+        return {'success': True}
+        
+    outcome = scheduler.run(execute)
+    
+    assert outcome.completed == [1, 2, 3, 4, 5, 6]
+    assert running['peak'] == 3
+
+def test_virtual_run_overlaps_independent_branches():
+    """Two independent 10s chains on two workers take 20s of virtual time, not 40s"""
+    
+    scheduler, clock = virtual_scheduler({1: [], 2: [1], 3: [], 4: [3]}, workers=2)
+    
+    def execute(num, token):
+        clock.sleep(10.0)
+        return {'success': True}
+        
+    outcome = scheduler.run(execute)
+    
+    assert outcome.completed == [1, 2, 3, 4]
+    assert clock.time() == pytest.approx(20.0)
+
+def test_continue_mode_skips_only_dependents_of_a_failure():
+    """With error_handling=continue, independent branches still finish"""
+    
+    scheduler, _ = virtual_scheduler({1: [], 2: [1], 3: [2], 4: [], 5: [4]}, error_handling='continue')
+    
+    outcome = scheduler.run(lambda num, token: {'success': num != 2, 'error': 'boom'})
+    
+    assert outcome.completed == [1, 4, 5]
+    assert outcome.failed == [2]
+    assert outcome.skipped == [3]
+    assert not outcome.halted
+
+def test_stop_mode_halts_after_the_first_failure():
+    """With error_handling=stop nothing new starts after a failure"""
+    
+    scheduler, _ = virtual_scheduler({1: [], 2: [1], 3: [2]}, workers=1, error_handling='stop')
+    started = []
+    
+    def execute(num, token):
+        started.append(num)
+        return {'success': num != 1, 'error': 'boom'}
+        
+    outcome = scheduler.run(execute)
+    
+    assert started == [1]
+    assert outcome.failed == [1]
+    assert outcome.skipped == [2, 3]
+    assert outcome.halted
+
+def test_stage_exceptions_become_failed_results():
+    """An exception raised by a stage is reported as that stage's failure"""
+    
+    scheduler, _ = virtual_scheduler({1: []}, error_handling='stop')
+    
+    def execute(num, token):
+        raise RuntimeError("stage exploded")
+        
+    outcome = scheduler.run(execute)
+    
+    assert outcome.failed == [1]
+    assert outcome.results[1]['error'] == "stage exploded"
+
+def test_retries_back_off_without_blocking_other_stages():
+    """A failed stage is retried after its backoff while independent stages keep running"""
+    
+    scheduler, clock = virtual_scheduler({1: [], 2: []}, workers=1,
+                                         retry_policy=RetryPolicy(max_retries=3, base_delay=10.0, jitter=0.0))
+    attempts = {1: 0, 2: 0}
+    finished = {}
+    retries = []
+    
+    def execute(num, token):
+        attempts[num] += 1
+        clock.sleep(1.0)
+        if num == 1 and attempts[1] < 3:
+            return {'success': False, 'error': 'flaky'}
+        finished[num] = clock.time()
+        return {'success': True}
+        
+    outcome = scheduler.run(execute, on_retry=lambda num, attempt, delay: retries.append((num, attempt, delay)))
+    
+    assert outcome.completed == [1, 2]
+    assert outcome.retried == {1}
+    assert retries == [(1, 1, 10.0), (1, 2, 20.0)]
+    # Stage 2 used the only worker during stage 1's first backoff
+    assert finished[2] == pytest.approx(2.0)
+    # 1s attempt + 10s backoff + 1s attempt + 20s backoff + 1s attempt
+    assert finished[1] == pytest.approx(33.0)
+    
+def test_exhausted_retries_fail_the_run():
+    """Once max_retries is used up the stage fails and the run halts"""
+    
+    scheduler, _ = virtual_scheduler({1: [], 2: [1]},
+                                     retry_policy=RetryPolicy(max_retries=2, base_delay=1.0, jitter=0.0))
+    attempts = []
+    
+    outcome = scheduler.run(lambda num, token: attempts.append(num) or {'success': False, 'error': 'down'})
+    
+    assert attempts == [1, 1, 1]
+    assert outcome.failed == [1]
+    assert outcome.skipped == [2]
+    assert outcome.halted
+    
+def test_non_retryable_failures_are_not_retried():
+    """Results marked retryable=False fail straight away"""
+    
+    scheduler, _ = virtual_scheduler({1: []}, retry_policy=RetryPolicy(max_retries=3, base_delay=1.0, jitter=0.0))
+    attempts = []
+    
+    outcome = scheduler.run(lambda num, token: attempts.append(num) or {'success': False, 'retryable': False})
+    
+    assert attempts == [1]
+    assert outcome.failed == [1]
+    
+def test_retry_policy_delays_grow_exponentially_up_to_the_cap():
+    """Delays double per attempt, stop at max_delay and stay within the jitter band"""
+    
+    policy = RetryPolicy(base_delay=2.0, jitter=0.0, max_delay=10.0)
+    assert [policy.delay(attempt) for attempt in range(1, 5)] == [2.0, 4.0, 8.0, 10.0]
+    
+    jittered = RetryPolicy(base_delay=2.0, jitter=0.2)
+    assert all(1.6 <= jittered.delay(1) <= 2.4 for _ in range(50))
+
+def test_timed_out_stage_fails_and_its_token_is_cancelled():
+    """A stage still running at its timeout is abandoned, told to stop and failed"""
+    
+    scheduler, clock = virtual_scheduler({1: [], 2: [1]}, error_handling='stop')
+    tokens = {}
+    abandoned = []
+    
+    def execute(num, token):
+        tokens[num] = token
+        clock.sleep(50.0)
+        return {'success': True}
+        
+    outcome = scheduler.run(execute, timeout_for=lambda num: 10.0,
+                            on_abandon=lambda num, reason: abandoned.append((num, reason)))
+    
+    assert outcome.failed == [1]
+    assert outcome.skipped == [2]
+    assert outcome.results[1]['timed_out']
+    assert abandoned == [(1, 'timeout')]
+    assert tokens[1].cancelled and tokens[1].reason == 'timeout'
+    # The run gave up at the deadline instead of waiting for the stage
+    assert clock.time() < 50.0
+    
+def test_timed_out_stage_is_not_retried_by_default():
+    """The abandoned attempt may still be writing, so a timeout is final unless retry_timeouts is set"""
+    
+    scheduler, clock = virtual_scheduler({1: []},
+                                         retry_policy=RetryPolicy(max_retries=1, base_delay=1.0, jitter=0.0))
+    attempts = []
+    
+    def execute(num, token):
+        attempts.append(num)
+        clock.sleep(50.0)
+        return {'success': True}
+        
+    outcome = scheduler.run(execute, timeout_for=lambda num: 10.0)
+    
+    assert attempts == [1]
+    assert outcome.failed == [1]
+    
+def test_timed_out_stage_is_retried_when_enabled():
+    """With retry_timeouts, retry mode runs a timed-out stage again"""
+    
+    scheduler, clock = virtual_scheduler({1: []}, retry_timeouts=True,
+                                         retry_policy=RetryPolicy(max_retries=1, base_delay=1.0, jitter=0.0))
+    attempts = []
+    
+    def execute(num, token):
+        attempts.append(num)
+        clock.sleep(50.0 if len(attempts) == 1 else 1.0)
+        return {'success': True}
+        
+    outcome = scheduler.run(execute, timeout_for=lambda num: 10.0)
+    
+    assert attempts == [1, 1]
+    assert outcome.completed == [1]
+    assert outcome.retried == {1}
+    
+def test_timeout_stops_a_cooperative_stage_promptly():
+    """With real threads a stage sleeping on its token wakes as soon as it times out"""
+    
+    scheduler = StageScheduler(StageGraph(make_stages({1: []})), error_handling='stop', stage_timeout=0.2)
+    woke = threading.Event()
+    
+    def execute(num, token):
+        try:
+            token.sleep(30)
+        finally:
+            woke.set()
+        return {'success': True}
+        
+    started = time.monotonic()
+    outcome = scheduler.run(execute)
+    
+    assert outcome.failed == [1]
+    assert woke.wait(5)
+    assert time.monotonic() - started < 5
+
+@pytest.mark.parametrize('error_handling', ['retry', 'continue'])
+def test_cancelling_the_run_token_stops_the_run(error_handling):
+    """Cancelling the run's token (batch Ctrl-C, daemon cancel) cancels in-flight stages and starts nothing new"""
+    
+    run_token = CancellationToken()
+    scheduler = StageScheduler(StageGraph(make_stages({1: [], 2: [], 3: [1], 4: [2]})), max_workers=2,
+                               error_handling=error_handling, cancel_token=run_token, cancel_grace=5)
+    started = []
+    abandoned = []
+    
+    def execute(num, token):
+        started.append(num)
+        if num == 1:
+            return {'success': True}
+        if len(started) == 3:
+            run_token.cancel('cancel requested')
+        token.sleep(30)
+        return {'success': True}
+        
+    began = time.monotonic()
+    outcome = scheduler.run(execute, on_abandon=lambda num, reason: abandoned.append((num, reason)))
+    
+    assert time.monotonic() - began < 5
+    assert outcome.halted
+    assert outcome.completed == [1]
+    assert outcome.cancelled == [2, 3]
+    assert outcome.failed == []
+    assert outcome.skipped == [4]
+    assert sorted(abandoned) == [(2, 'cancel requested'), (3, 'cancel requested')]
+    
+def test_cancelling_the_run_drops_pending_retries():
+    """A stage backing off before a retry is cancelled, not retried"""
+    
+    run_token = CancellationToken()
+    scheduler = StageScheduler(StageGraph(make_stages({1: [], 2: []})), cancel_token=run_token,
+                               retry_policy=RetryPolicy(max_retries=3, base_delay=30.0, jitter=0.0))
+    attempts = []
+    
+    def execute(num, token):
+        attempts.append(num)
+        if num == 1:
+            return {'success': False, 'error': 'flaky'}
+        # Stage 2 cancels the run while stage 1 waits for its retry
+        while 1 not in attempts:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        run_token.cancel('interrupted')
+        return {'success': True}
+        
+    began = time.monotonic()
+    outcome = scheduler.run(execute)
+    
+    assert time.monotonic() - began < 5
+    assert attempts.count(1) == 1
+    assert outcome.completed == [2]
+    assert outcome.cancelled == [1]
@@ -10,6 +10,7 @@ from pathlib import Path
 
 # Add CCC to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "bin"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "bin" / "lib"))
 
 from workflow_engine import WorkflowEngine
 from lib.workflow_runner import WorkflowRunner, create_workflow_context